@@ -3,21 +3,24 @@
 Скрипт для додавання адміністратора в базу даних
 """
 
+import asyncio
 import sys
 from database import Database
 
-def add_admin_to_db():
+async def add_admin_to_db():
     print("=" * 50)
     print("👨‍💼 Додавання адміністратора")
     print("=" * 50)
     print()
     
+    db = Database()
     try:
-        db = Database()
+        await db.connect()
         print("✅ Підключено до бази даних")
         print()
     except Exception as e:
         print(f"❌ Помилка підключення до БД: {e}")
+        await db.close()
         sys.exit(1)
     
     print("Як отримати свій Telegram ID:")
@@ -39,7 +42,7 @@ def add_admin_to_db():
             username = f"admin_{user_id}"
         
         # Додаємо адміна
-        db.add_admin(user_id, username)
+        await db.add_admin(user_id, username)
         
         print()
         print("✅ Адміністратор успішно доданий!")
@@ -56,6 +59,8 @@ def add_admin_to_db():
     except Exception as e:
         print(f"\n❌ Помилка: {e}")
         sys.exit(1)
+    finally:
+        await db.close()
 
 if __name__ == "__main__":
-    add_admin_to_db()
+    asyncio.run(add_admin_to_db())
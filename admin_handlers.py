@@ -1,3 +1,7 @@
+import os
+import tempfile
+from datetime import datetime, timedelta
+
 import bcrypt
 from aiogram import F, Bot
 from aiogram.filters import Command
@@ -5,14 +9,22 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import Message, CallbackQuery
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
-from database import Database
-from config import ADMIN_PASSWORD_HASH
+from aiogram.types import FSInputFile
+from database import db
+from publishing import run_bounded, parse_slots, next_free_slots, build_media_group
+from send_scheduler import Priority, send_priority
+from config import ADMIN_PASSWORD_HASH, MODERATION_PAGE_SIZE, BULK_NOTIFY_CONCURRENCY, HISTORY_PAGE_SIZE
+from config import MODERATION_LEASE_SECONDS, PUBLISH_SLOTS, CHANNEL_DELETE_MODE
 
-db = Database()
+PUBLISH_SLOT_TIMES = parse_slots(PUBLISH_SLOTS)
+# Наскільки наперед шукати вільні слоти
+SLOT_HORIZON_DAYS = 60
 
 class AdminStates(StatesGroup):
     in_admin_panel = State()
     selecting_channel_for_requests = State()
+    entering_publish_time = State()
+    entering_history_filter = State()
 
 class ChannelManageStates(StatesGroup):
     choosing_action = State()
@@ -37,8 +49,9 @@ def get_admin_menu_keyboard():
     ]
     return ReplyKeyboardMarkup(keyboard=buttons, resize_keyboard=True)
 
-def get_channels_with_requests_keyboard():
-    channels = db.get_channels_with_pending_posts()
+async def get_channels_with_requests_keyboard(channels=None):
+    if channels is None:
+        channels = await db.get_pending_counts()
     if not channels:
         return None
     buttons = []
@@ -66,8 +79,8 @@ def get_channel_edit_actions_keyboard():
     ]
     return ReplyKeyboardMarkup(keyboard=buttons, resize_keyboard=True)
 
-def get_channels_list_keyboard():
-    channels = db.get_all_channels()
+async def get_channels_list_keyboard():
+    channels = await db.get_all_channels()
     buttons = []
     for channel_name in channels.keys():
         buttons.append([KeyboardButton(text=channel_name)])
@@ -90,21 +103,219 @@ def get_spam_protection_keyboard():
     ]
     return ReplyKeyboardMarkup(keyboard=buttons, resize_keyboard=True)
 
-def get_moderation_keyboard(post_id: int):
+def get_moderation_keyboard(post_id: int, selected: bool = False):
     buttons = [
         [
             InlineKeyboardButton(text="✅ Опублікувати", callback_data=f"approve_{post_id}"),
             InlineKeyboardButton(text="❌ Відхилити", callback_data=f"reject_{post_id}")
+        ],
+        [InlineKeyboardButton(text="✔️ Вибрано" if selected else "☑️ Вибрати", callback_data=f"select_{post_id}")]
+    ]
+    schedule_row = [InlineKeyboardButton(text="📅 На час", callback_data=f"schedule_{post_id}")]
+    if PUBLISH_SLOT_TIMES:
+        schedule_row.insert(0, InlineKeyboardButton(text="🕒 У слот", callback_data=f"slot_{post_id}"))
+    buttons.insert(1, schedule_row)
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+def get_page_actions_keyboard(has_next: bool):
+    buttons = [
+        [
+            InlineKeyboardButton(text="✅ Сторінку", callback_data="bulk_approve_page"),
+            InlineKeyboardButton(text="❌ Сторінку", callback_data="bulk_reject_page")
+        ],
+        [
+            InlineKeyboardButton(text="✅ Вибрані", callback_data="bulk_approve_selected"),
+            InlineKeyboardButton(text="❌ Вибрані", callback_data="bulk_reject_selected")
+        ],
+        [
+            InlineKeyboardButton(text="✅ Весь канал", callback_data="bulk_approve_channel"),
+            InlineKeyboardButton(text="❌ Весь канал", callback_data="bulk_reject_channel")
         ]
     ]
+    if PUBLISH_SLOT_TIMES:
+        buttons.append([
+            InlineKeyboardButton(text="🕒 Сторінку у слоти", callback_data="bulk_slot_page"),
+            InlineKeyboardButton(text="🕒 Вибрані у слоти", callback_data="bulk_slot_selected")
+        ])
+    if has_next:
+        buttons.append([InlineKeyboardButton(text="➡️ Наступна сторінка", callback_data="pending_next")])
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
+def get_bulk_confirm_keyboard(action: str):
+    buttons = [
+        [
+            InlineKeyboardButton(text="✅ Підтвердити", callback_data=f"bulkok_{action}_channel"),
+            InlineKeyboardButton(text="❌ Скасувати", callback_data="bulkcancel")
+        ]
+    ]
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+def get_history_keyboard(has_next: bool, filtered: bool):
+    buttons = []
+    if has_next:
+        buttons.append([InlineKeyboardButton(text="➡️ Далі", callback_data="history_next")])
+    filter_row = [InlineKeyboardButton(text="🔎 Фільтр", callback_data="history_filter")]
+    if filtered:
+        filter_row.append(InlineKeyboardButton(text="♻️ Скинути фільтр", callback_data="history_reset"))
+    buttons.append(filter_row)
+    buttons.append([
+        InlineKeyboardButton(text="📤 CSV", callback_data="history_export_csv"),
+        InlineKeyboardButton(text="📤 JSONL", callback_data="history_export_jsonl")
+    ])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+HISTORY_FILTER_HELP = (
+    "🔎 Фільтр історії, по одному на рядок:\n\n"
+    "канал: Назва каналу\n"
+    "статус: approved або rejected\n"
+    "користувач: 123456789\n"
+    "з: 01.01.2026\n"
+    "по: 31.01.2026\n"
+    "медіа: фото або відео\n\n"
+    "Надішліть «-», щоб скинути фільтр."
+)
+
+HISTORY_FILTER_KEYS = {
+    'канал': 'channel', 'статус': 'status', 'користувач': 'user_id',
+    'з': 'date_from', 'по': 'date_to', 'медіа': 'media'
+}
+
+def parse_history_filters(text: str) -> dict:
+    """Розібрати фільтр історії; ValueError з поясненням, якщо рядок невірний"""
+    filters = {}
+    if text.strip() == '-':
+        return filters
+    for line in text.strip().splitlines():
+        key, sep, value = line.partition(':')
+        key, value = key.strip().lower(), value.strip()
+        if not sep or key not in HISTORY_FILTER_KEYS or not value:
+            raise ValueError(f"Невідомий рядок: {line}")
+        field = HISTORY_FILTER_KEYS[key]
+        if field == 'status':
+            value = {'схвалено': 'approved', 'відхилено': 'rejected'}.get(value.lower(), value.lower())
+            if value not in ('approved', 'rejected'):
+                raise ValueError("Статус: approved або rejected")
+        elif field == 'media':
+            value = {'фото': 'photo', 'відео': 'video'}.get(value.lower(), value.lower())
+            if value not in ('photo', 'video'):
+                raise ValueError("Медіа: фото або відео")
+        elif field == 'user_id':
+            if not value.isdigit():
+                raise ValueError("Користувач: числовий Telegram ID")
+            value = int(value)
+        elif field in ('date_from', 'date_to'):
+            try:
+                value = datetime.strptime(value, '%d.%m.%Y').date().isoformat()
+            except ValueError:
+                raise ValueError(f"Дата у форматі ДД.ММ.РРРР: {value}")
+        filters[field] = value
+    return filters
+
+def format_history_filters(filters: dict) -> str:
+    names = {field: key for key, field in HISTORY_FILTER_KEYS.items()}
+    return ", ".join(f"{names[field]}: {value}" for field, value in filters.items())
+
+async def send_history_page(message: Message, state: FSMContext, filters: dict, after=None):
+    """Надіслати сторінку історії і запам'ятати курсор наступної"""
+    history, next_after = await db.get_posts_history(HISTORY_PAGE_SIZE, filters, after)
+    await state.update_data(history_filters=filters, history_after=next_after)
+    if not history:
+        text = "Історія порожня." if not after else "Більше записів немає."
+        if filters:
+            text += f"\n🔎 {format_history_filters(filters)}"
+        await message.answer(text, reply_markup=get_history_keyboard(False, bool(filters)))
+        return
+    text = "📊 Історія:\n"
+    if filters:
+        text += f"🔎 {format_history_filters(filters)}\n"
+    text += "\n"
+    for post in history:
+        status_emoji = "✅" if post[3] == "approved" else "❌"
+        text += f"{status_emoji} #{post[0]} | @{post[1]} → {post[2]} | {post[5][:16]}\n"
+    await message.answer(text, reply_markup=get_history_keyboard(next_after is not None, bool(filters)))
+
+async def send_post_for_moderation(message: Message, post):
+    with send_priority(Priority.PREVIEW):
+        await _send_preview(message, post)
+
+async def _send_preview(message: Message, post):
+    post_id, user_id, username, channel, post_message, created_at = post
+    text = f"🆔 #{post_id}\n👤 @{username}\n📢 {channel}\n🕒 {created_at}"
+    media, post_text = post_message['media'], post_message['text']
+    full_text = text + ("\n\n" + post_text if post_text else "")
+    
+    if len(media) > 1:
+        await message.answer_media_group(media=build_media_group(media, full_text))
+        await message.answer("Дії:", reply_markup=get_moderation_keyboard(post_id))
+    elif media and media[0]['type'] == 'photo':
+        await message.answer_photo(media[0]['file_id'], caption=full_text, reply_markup=get_moderation_keyboard(post_id))
+    elif media:
+        await message.answer_video(media[0]['file_id'], caption=full_text, reply_markup=get_moderation_keyboard(post_id))
+    else:
+        await message.answer(full_text, reply_markup=get_moderation_keyboard(post_id))
+
+def moderator_id(user_id: int) -> str:
+    """Власник оренди заявок для адміна"""
+    return f"admin:{user_id}"
+
+async def send_pending_page(message: Message, state: FSMContext, channel: str, owner: str) -> int:
+    """Взяти в оренду і надіслати одну сторінку черги модерації.
+    Інші модератори цю сторінку не побачать, доки не мине оренда."""
+    posts = await db.claim_pending_posts(channel, MODERATION_PAGE_SIZE, owner, MODERATION_LEASE_SECONDS)
+    for post in posts:
+        await send_post_for_moderation(message, post)
+    
+    await state.update_data(
+        queue_channel=channel,
+        queue_page_ids=[post[0] for post in posts]
+    )
+    if posts:
+        # Неповна сторінка — черга вичерпана; інакше перевірити, чи лишились вільні заявки
+        has_next = len(posts) == MODERATION_PAGE_SIZE and await db.has_claimable_posts(channel)
+        text = "Дії зі сторінкою (є ще заявки):" if has_next else "Дії зі сторінкою:"
+        await message.answer(text, reply_markup=get_page_actions_keyboard(has_next))
+    return len(posts)
+
+def parse_publish_time(text: str, now: datetime = None):
+    """'ГГ:ХХ' (сьогодні або завтра, якщо час минув) чи 'ДД.ММ ГГ:ХХ'; None — не розпізнано"""
+    now = now or datetime.now()
+    try:
+        if ' ' in text:
+            moment = datetime.strptime(text, '%d.%m %H:%M').replace(year=now.year)
+            if moment <= now:
+                moment = moment.replace(year=now.year + 1)
+        else:
+            moment = datetime.combine(now.date(), datetime.strptime(text, '%H:%M').time())
+            if moment <= now:
+                moment += timedelta(days=1)
+    except ValueError:
+        return None
+    return moment
+
+def format_publish_time(moment) -> str:
+    return moment.strftime('%d.%m %H:%M') if moment else "зараз"
+
+async def assign_slots(post_ids: list, owner: str) -> dict:
+    """Взяти заявки в оренду і розподілити їх по найближчих вільних слотах їхніх каналів.
+    Повертає {post_id: секунд до публікації}; недоступні заявки пропускаються."""
+    posts = await db.claim_posts_by_ids(post_ids, owner, MODERATION_LEASE_SECONDS)
+    by_channel = {}
+    for post in posts:
+        by_channel.setdefault(post[3], []).append(post[0])
+    delays = {}
+    now = datetime.now()
+    for channel, ids in by_channel.items():
+        taken = await db.get_scheduled_delays(channel, SLOT_HORIZON_DAYS * 86400)
+        slots = next_free_slots(PUBLISH_SLOT_TIMES, taken, len(ids), now, max_days=SLOT_HORIZON_DAYS)
+        delays.update(zip(sorted(ids), slots))
+    return delays
+
 def setup_admin_handlers(dp, bot: Bot, load_channels_func):
     
     @dp.message(Command("admin"))
     async def cmd_admin(message: Message, state: FSMContext):
         user_id = message.from_user.id
-        if not db.is_admin(user_id):
+        if not await db.is_admin(user_id):
             await message.answer("❌ Немає доступу!")
             return
         parts = message.text.strip().split(maxsplit=1)
@@ -128,87 +339,138 @@ def setup_admin_handlers(dp, bot: Bot, load_channels_func):
 
     @dp.message(AdminStates.in_admin_panel, F.text == "📋 Заявки на модерацію")
     async def show_pending_posts_channels(message: Message, state: FSMContext):
-        keyboard = get_channels_with_requests_keyboard()
+        counts = await db.get_pending_counts()
+        keyboard = await get_channels_with_requests_keyboard(counts)
         if not keyboard:
             await message.answer("Немає заявок на модерацію.")
             return
         
-        await message.answer("Оберіть канал для перегляду заявок:", reply_markup=keyboard)
+        lines = [f"• {channel}: {count}" for channel, count in counts.items()]
+        await message.answer(
+            f"📋 Заявок на модерацію: {sum(counts.values())}\n\n" + "\n".join(lines)
+            + "\n\nОберіть канал для перегляду заявок:",
+            reply_markup=keyboard
+        )
         await state.set_state(AdminStates.selecting_channel_for_requests)
 
     @dp.message(AdminStates.selecting_channel_for_requests, F.text == "🔙 Назад")
     async def back_to_admin_menu_from_channels(message: Message, state: FSMContext):
+        await db.release_claims(moderator_id(message.from_user.id))
         await message.answer("Адмін панель:", reply_markup=get_admin_menu_keyboard())
         await state.set_state(AdminStates.in_admin_panel)
 
     @dp.message(AdminStates.selecting_channel_for_requests)
     async def show_pending_posts_by_channel(message: Message, state: FSMContext):
-        from aiogram.types import InputMediaPhoto, InputMediaVideo
         import logging
         
         selected_channel = message.text
         logger = logging.getLogger(__name__)
         logger.info(f"Обрано канал: '{selected_channel}'")
         
-        channels = db.get_all_channels()
+        channels = await db.get_all_channels()
         logger.info(f"Всі канали: {list(channels.keys())}")
         
         if selected_channel not in channels:
             logger.warning(f"Канал '{selected_channel}' не знайдено в БД")
-            await message.answer("❌ Оберіть канал зі списку:", reply_markup=get_channels_with_requests_keyboard())
+            await message.answer("❌ Оберіть канал зі списку:", reply_markup=await get_channels_with_requests_keyboard())
             return
         
-        pending_posts = db.get_pending_posts_by_channel(selected_channel)
-        logger.info(f"Знайдено {len(pending_posts) if pending_posts else 0} заявок")
+        pending_count = await db.count_pending_posts(selected_channel)
+        logger.info(f"Знайдено {pending_count} заявок")
         
-        if not pending_posts:
-            await message.answer(f"Немає заявок для каналу '{selected_channel}'.", reply_markup=get_channels_with_requests_keyboard())
+        if not pending_count:
+            await message.answer(f"Немає заявок для каналу '{selected_channel}'.", reply_markup=await get_channels_with_requests_keyboard())
             return
         
-        await message.answer(f"📋 Заявки для каналу: <b>{selected_channel}</b>", parse_mode="HTML", reply_markup=get_admin_menu_keyboard())
+        await message.answer(f"📋 Заявки для каналу: <b>{selected_channel}</b> ({pending_count})", parse_mode="HTML", reply_markup=get_admin_menu_keyboard())
+        # Свої необроблені заявки з попереднього перегляду знову стають доступними
+        owner = moderator_id(message.from_user.id)
+        await db.release_claims(owner)
+        if not await send_pending_page(message, state, selected_channel, owner):
+            await message.answer(f"Усі заявки каналу '{selected_channel}' зараз переглядають інші модератори.")
+        await state.set_state(AdminStates.in_admin_panel)
+
+    @dp.callback_query(F.data == "pending_next")
+    async def show_next_pending_page(callback: CallbackQuery, state: FSMContext):
+        data = await state.get_data()
+        channel = data.get('queue_channel')
+        await callback.message.edit_reply_markup(reply_markup=None)
         
-        for post in pending_posts:
-            post_id, user_id, username, channel, msg_data, created_at = post
-            text = f"🆔 #{post_id}\n👤 @{username}\n📢 {channel}\n🕒 {created_at}"
-            
-            if msg_data.get('media_group'):
-                media_group = []
-                caption_text = msg_data.get('caption', '')
-                
-                for idx, item in enumerate(msg_data['media_group']):
-                    caption = (text + "\n\n" + caption_text) if idx == 0 else None
-                    if item['type'] == 'photo':
-                        media_group.append(InputMediaPhoto(media=item['file_id'], caption=caption))
-                    elif item['type'] == 'video':
-                        media_group.append(InputMediaVideo(media=item['file_id'], caption=caption))
-                
-                await message.answer_media_group(media=media_group)
-                await message.answer("Дії:", reply_markup=get_moderation_keyboard(post_id))
-            elif msg_data.get('photo'):
-                caption_text = msg_data.get('caption', '')
-                full_text = text + ("\n\n" + caption_text if caption_text else "")
-                await message.answer_photo(msg_data['photo'], caption=full_text, reply_markup=get_moderation_keyboard(post_id))
-            elif msg_data.get('video'):
-                caption_text = msg_data.get('caption', '')
-                full_text = text + ("\n\n" + caption_text if caption_text else "")
-                await message.answer_video(msg_data['video'], caption=full_text, reply_markup=get_moderation_keyboard(post_id))
-            else:
-                full_text = text + "\n\n" + msg_data.get('text', '')
-                await message.answer(full_text, reply_markup=get_moderation_keyboard(post_id))
+        if not channel:
+            await callback.answer("Більше заявок немає.")
+            return
         
-        await state.set_state(AdminStates.in_admin_panel)
+        await callback.answer()
+        if not await send_pending_page(callback.message, state, channel, moderator_id(callback.from_user.id)):
+            await callback.message.answer(f"Немає заявок для каналу '{channel}'.")
 
     @dp.message(AdminStates.in_admin_panel, F.text == "📊 Історія заявок")
-    async def show_history(message: Message):
-        history = db.get_posts_history(limit=20)
-        if not history:
-            await message.answer("Історія порожня.")
+    async def show_history(message: Message, state: FSMContext):
+        await send_history_page(message, state, {})
+
+    @dp.callback_query(F.data == "history_next")
+    async def show_next_history_page(callback: CallbackQuery, state: FSMContext):
+        data = await state.get_data()
+        await callback.message.edit_reply_markup(reply_markup=None)
+        await callback.answer()
+        if not data.get('history_after'):
+            await callback.message.answer("Більше записів немає.")
+            return
+        await send_history_page(callback.message, state, data.get('history_filters') or {}, data['history_after'])
+
+    @dp.callback_query(F.data == "history_reset")
+    async def reset_history_filter(callback: CallbackQuery, state: FSMContext):
+        await callback.answer()
+        await send_history_page(callback.message, state, {})
+
+    @dp.callback_query(F.data == "history_filter")
+    async def history_filter_requested(callback: CallbackQuery, state: FSMContext):
+        await callback.answer()
+        await state.set_state(AdminStates.entering_history_filter)
+        await callback.message.answer(HISTORY_FILTER_HELP, reply_markup=get_confirm_keyboard_simple())
+
+    @dp.message(AdminStates.entering_history_filter, F.text == "❌ Скасувати")
+    async def cancel_history_filter(message: Message, state: FSMContext):
+        await state.set_state(AdminStates.in_admin_panel)
+        await message.answer("Скасовано.", reply_markup=get_admin_menu_keyboard())
+
+    @dp.message(AdminStates.entering_history_filter)
+    async def history_filter_entered(message: Message, state: FSMContext):
+        try:
+            filters = parse_history_filters(message.text or '')
+        except ValueError as e:
+            await message.answer(f"❌ {e}")
+            return
+        await state.set_state(AdminStates.in_admin_panel)
+        await message.answer("🔎 Фільтр застосовано." if filters else "Фільтр скинуто.", reply_markup=get_admin_menu_keyboard())
+        await send_history_page(message, state, filters)
+
+    @dp.callback_query(F.data.startswith("history_export_"))
+    async def export_history(callback: CallbackQuery, state: FSMContext):
+        fmt = callback.data.rsplit("_", 1)[1]
+        if fmt not in ('csv', 'jsonl'):
+            await callback.answer()
             return
-        text = "📊 Історія:\n\n"
-        for post in history:
-            status_emoji = "✅" if post[3] == "approved" else "❌"
-            text += f"{status_emoji} #{post[0]} | @{post[1]} → {post[2]}\n"
-        await message.answer(text)
+        data = await state.get_data()
+        filters = data.get('history_filters') or {}
+        await callback.answer("⏳ Готую файл...")
+        # Рядки пишуться у файл пачками серверного курсора, а не збираються в пам'яті
+        fd, path = tempfile.mkstemp(suffix=f'.{fmt}')
+        os.close(fd)
+        try:
+            count = await db.export_posts_history(path, fmt, filters)
+            if count < 0:
+                await callback.message.answer("❌ Помилка експорту історії.")
+            elif count == 0:
+                await callback.message.answer("Немає записів для експорту.")
+            else:
+                filename = f"history_{datetime.now():%Y%m%d_%H%M}.{fmt}"
+                await callback.message.answer_document(
+                    FSInputFile(path, filename=filename),
+                    caption=f"📤 Записів: {count}"
+                )
+        finally:
+            os.remove(path)
 
     # ============= КЕРУВАННЯ КАНАЛАМИ =============
 
@@ -246,7 +508,7 @@ def setup_admin_handlers(dp, bot: Bot, load_channels_func):
     @dp.message(ChannelManageStates.adding_channel_name)
     async def add_channel_name_entered(message: Message, state: FSMContext):
         channel_name = message.text.strip()
-        channels = db.get_all_channels()
+        channels = await db.get_all_channels()
         
         if channel_name in channels:
             await message.answer("❌ Канал з такою назвою вже існує! Введіть іншу назву:")
@@ -281,8 +543,8 @@ def setup_admin_handlers(dp, bot: Bot, load_channels_func):
         data = await state.get_data()
         new_channel_name = data['new_channel_name']
         
-        if db.add_channel(new_channel_name, channel_id):
-            load_channels_func()
+        if await db.add_channel(new_channel_name, channel_id):
+            await load_channels_func()
             
             await message.answer(
                 f"✅ <b>Канал додано!</b>\n\n"
@@ -304,7 +566,7 @@ def setup_admin_handlers(dp, bot: Bot, load_channels_func):
 
     @dp.message(ChannelManageStates.choosing_action, F.text == "🗑 Видалити канал")
     async def delete_channel_start(message: Message, state: FSMContext):
-        channels = db.get_all_channels()
+        channels = await db.get_all_channels()
         if not channels:
             await message.answer("❌ Немає каналів для видалення.")
             return
@@ -312,7 +574,7 @@ def setup_admin_handlers(dp, bot: Bot, load_channels_func):
         await message.answer(
             "🗑 <b>Видалити канал</b>\n\n"
             "Оберіть канал для видалення:",
-            reply_markup=get_channels_list_keyboard(),
+            reply_markup=await get_channels_list_keyboard(),
             parse_mode="HTML"
         )
         await state.update_data(action_type='delete')
@@ -345,7 +607,7 @@ def setup_admin_handlers(dp, bot: Bot, load_channels_func):
             await message.answer("❌ Помилка: канал не обрано")
             return
             
-        channels = db.get_all_channels()
+        channels = await db.get_all_channels()
         
         await message.answer(
             f"Канал: <b>{channel_name}</b>\n"
@@ -367,10 +629,10 @@ def setup_admin_handlers(dp, bot: Bot, load_channels_func):
     @dp.message(ChannelManageStates.selecting_channel)
     async def channel_selected(message: Message, state: FSMContext):
         channel_name = message.text
-        channels = db.get_all_channels()
+        channels = await db.get_all_channels()
         
         if channel_name not in channels:
-            await message.answer("❌ Оберіть канал зі списку:", reply_markup=get_channels_list_keyboard())
+            await message.answer("❌ Оберіть канал зі списку:", reply_markup=await get_channels_list_keyboard())
             return
         
         data = await state.get_data()
@@ -380,14 +642,19 @@ def setup_admin_handlers(dp, bot: Bot, load_channels_func):
             await state.update_data(channel_to_delete=channel_name)
             
             # Перевіряємо кількість заявок
-            pending_count = len(db.get_pending_posts_by_channel(channel_name))
+            pending_count = await db.count_pending_posts(channel_name)
             
             warning_text = f"❗️ <b>Підтвердження видалення</b>\n\n" \
                           f"Ви впевнені, що хочете видалити канал:\n" \
-                          f"<b>{channel_name}</b> ({channels[channel_name]})\n\n" \
-                          f"⚠️ Це не видалить пости з БД, але канал буде недоступний для нових заявок."
+                          f"<b>{channel_name}</b> ({channels[channel_name]})\n\n"
+            if CHANNEL_DELETE_MODE == 'soft':
+                warning_text += "⚠️ Історія постів залишиться в БД, але канал буде недоступний для нових заявок."
+            else:
+                warning_text += "⚠️ Разом з каналом з БД буде видалено всі його пости."
             
-            if pending_count > 0:
+            if pending_count > 0 and CHANNEL_DELETE_MODE == 'soft':
+                warning_text += f"\n\n❌ <b>УВАГА:</b> Буде відхилено {pending_count} заявок на модерацію!"
+            elif pending_count > 0:
                 warning_text += f"\n\n🗑 <b>УВАГА:</b> Буде видалено {pending_count} заявок на модерацію!"
             
             await message.answer(
@@ -416,13 +683,15 @@ def setup_admin_handlers(dp, bot: Bot, load_channels_func):
             channel_name = data.get('channel_to_delete')
             if channel_name:
                 # Перевіряємо кількість заявок для цього каналу
-                pending_count = len(db.get_pending_posts_by_channel(channel_name))
+                pending_count = await db.count_pending_posts(channel_name)
                 
-                if db.delete_channel(channel_name):
-                    load_channels_func()
+                if await db.delete_channel(channel_name):
+                    await load_channels_func()
                     
                     message_text = f"✅ Канал <b>{channel_name}</b> видалено!"
-                    if pending_count > 0:
+                    if pending_count > 0 and CHANNEL_DELETE_MODE == 'soft':
+                        message_text += f"\n\n❌ Також відхилено {pending_count} заявок на модерацію."
+                    elif pending_count > 0:
                         message_text += f"\n\n🗑 Також видалено {pending_count} заявок на модерацію."
                     
                     await message.answer(
@@ -440,8 +709,8 @@ def setup_admin_handlers(dp, bot: Bot, load_channels_func):
             old_name = data.get('channel_to_edit')
             new_name = data.get('new_channel_name')
             
-            if db.rename_channel(old_name, new_name):
-                load_channels_func()
+            if await db.rename_channel(old_name, new_name):
+                await load_channels_func()
                 await message.answer(
                     f"✅ Назву каналу змінено!\n\n"
                     f"Стара назва: <b>{old_name}</b>\n"
@@ -459,8 +728,8 @@ def setup_admin_handlers(dp, bot: Bot, load_channels_func):
             channel_name = data.get('channel_to_edit')
             new_id = data.get('new_channel_id')
             
-            if db.update_channel(channel_name, new_id):
-                load_channels_func()
+            if await db.update_channel(channel_name, new_id):
+                await load_channels_func()
                 await message.answer(
                     f"✅ ID каналу змінено!\n\n"
                     f"Канал: <b>{channel_name}</b>\n"
@@ -502,7 +771,7 @@ def setup_admin_handlers(dp, bot: Bot, load_channels_func):
 
     @dp.message(ChannelManageStates.choosing_action, F.text == "📝 Редагувати канал")
     async def edit_channel_start(message: Message, state: FSMContext):
-        channels = db.get_all_channels()
+        channels = await db.get_all_channels()
         if not channels:
             await message.answer("❌ Немає каналів для редагування.")
             return
@@ -510,7 +779,7 @@ def setup_admin_handlers(dp, bot: Bot, load_channels_func):
         await message.answer(
             "📝 <b>Редагувати канал</b>\n\n"
             "Оберіть канал:",
-            reply_markup=get_channels_list_keyboard(),
+            reply_markup=await get_channels_list_keyboard(),
             parse_mode="HTML"
         )
         await state.update_data(action_type='edit')
@@ -522,7 +791,7 @@ def setup_admin_handlers(dp, bot: Bot, load_channels_func):
             return
             
         new_name = message.text.strip()
-        channels = db.get_all_channels()
+        channels = await db.get_all_channels()
         
         if new_name in channels:
             await message.answer("❌ Канал з такою назвою вже існує! Введіть іншу назву:")
@@ -559,7 +828,7 @@ def setup_admin_handlers(dp, bot: Bot, load_channels_func):
         
         data = await state.get_data()
         channel_name = data.get('channel_to_edit')
-        channels = db.get_all_channels()
+        channels = await db.get_all_channels()
         
         await state.update_data(new_channel_id=channel_id)
         await message.answer(
@@ -584,7 +853,7 @@ def setup_admin_handlers(dp, bot: Bot, load_channels_func):
         elif current_state in [ChannelManageStates.entering_new_channel_name.state, ChannelManageStates.entering_new_channel_id.state]:
             data = await state.get_data()
             channel_name = data.get('channel_to_edit')
-            channels = db.get_all_channels()
+            channels = await db.get_all_channels()
             await message.answer(
                 f"📝 <b>Редагувати канал:</b> {channel_name}\n\n"
                 f"Поточний ID: {channels[channel_name]}\n\n"
@@ -601,14 +870,19 @@ def setup_admin_handlers(dp, bot: Bot, load_channels_func):
 
     @dp.message(ChannelManageStates.choosing_action, F.text == "📋 Список каналів")
     async def show_channels_list(message: Message):
-        channels = db.get_all_channels()
+        channels = await db.get_all_channels()
         if not channels:
             await message.answer("❌ Немає каналів у базі даних.")
             return
         
+        counts = await db.get_channel_counts()
         text = "📋 <b>Список каналів:</b>\n\n"
         for idx, (name, channel_id) in enumerate(channels.items(), 1):
-            text += f"{idx}. <b>{name}</b>\n   ID: {channel_id}\n\n"
+            text += f"{idx}. <b>{name}</b>\n   ID: {channel_id}\n"
+            if name in counts:
+                c = counts[name]
+                text += f"   ⏳ {c['pending']} | ✅ {c['approved']} | ❌ {c['rejected']}\n"
+            text += "\n"
         
         await message.answer(text, parse_mode="HTML")
 
@@ -616,7 +890,7 @@ def setup_admin_handlers(dp, bot: Bot, load_channels_func):
 
     @dp.message(ChannelManageStates.choosing_action, F.text == "🧹 Очистити сирітські заявки")
     async def cleanup_orphaned_posts_handler(message: Message):
-        orphaned_count = db.cleanup_orphaned_posts()
+        orphaned_count = await db.cleanup_orphaned_posts()
         
         if orphaned_count > 0:
             await message.answer(
@@ -634,7 +908,7 @@ def setup_admin_handlers(dp, bot: Bot, load_channels_func):
 
     @dp.message(AdminStates.in_admin_panel, F.text == "🛡 Захист від спаму")
     async def spam_protection_menu(message: Message, state: FSMContext):
-        settings = db.get_spam_settings()
+        settings = await db.get_spam_settings()
         status = "✅ Увімкнено" if settings['enabled'] else "❌ Вимкнено"
         
         await message.answer(
@@ -649,7 +923,7 @@ def setup_admin_handlers(dp, bot: Bot, load_channels_func):
 
     @dp.message(SpamProtectionStates.in_spam_menu, F.text == "📊 Поточний статус")
     async def show_spam_status(message: Message):
-        settings = db.get_spam_settings()
+        settings = await db.get_spam_settings()
         status = "✅ Увімкнено" if settings['enabled'] else "❌ Вимкнено"
         
         await message.answer(
@@ -662,10 +936,10 @@ def setup_admin_handlers(dp, bot: Bot, load_channels_func):
 
     @dp.message(SpamProtectionStates.in_spam_menu, F.text == "🔄 Увімкнути/Вимкнути")
     async def toggle_spam_protection(message: Message):
-        settings = db.get_spam_settings()
+        settings = await db.get_spam_settings()
         new_status = not settings['enabled']
         
-        if db.set_spam_protection_enabled(new_status):
+        if await db.set_spam_protection_enabled(new_status):
             status_text = "✅ увімкнено" if new_status else "❌ вимкнено"
             await message.answer(
                 f"🔄 Захист від спаму {status_text}!",
@@ -676,7 +950,7 @@ def setup_admin_handlers(dp, bot: Bot, load_channels_func):
 
     @dp.message(SpamProtectionStates.in_spam_menu, F.text == "⏱ Змінити затримку")
     async def change_spam_delay_start(message: Message, state: FSMContext):
-        settings = db.get_spam_settings()
+        settings = await db.get_spam_settings()
         await message.answer(
             f"⏱ <b>Зміна затримки</b>\n\n"
             f"Поточна затримка: {settings['minutes']} хв.\n\n"
@@ -694,7 +968,7 @@ def setup_admin_handlers(dp, bot: Bot, load_channels_func):
                 await message.answer("❌ Введіть число від 1 до 1440 (24 години):")
                 return
             
-            if db.set_spam_protection_minutes(minutes):
+            if await db.set_spam_protection_minutes(minutes):
                 await message.answer(
                     f"✅ Затримку змінено на {minutes} хв.!",
                     reply_markup=get_spam_protection_keyboard()
@@ -710,63 +984,186 @@ def setup_admin_handlers(dp, bot: Bot, load_channels_func):
     @dp.message(AdminStates.in_admin_panel, F.text == "🚪 Вийти з адмінки")
     async def exit_admin(message: Message, state: FSMContext):
         from aiogram.types import ReplyKeyboardRemove
+        await db.release_claims(moderator_id(message.from_user.id))
         await message.answer("👋 Вийшли.", reply_markup=ReplyKeyboardRemove())
         await state.clear()
 
     # ============= КОЛБЕКИ МОДЕРАЦІЇ =============
 
-    @dp.callback_query(F.data.startswith("approve_"))
-    async def approve_post(callback: CallbackQuery):
-        from aiogram.types import InputMediaPhoto, InputMediaVideo
+    async def run_bulk_action(message: Message, owner: str, action: str, channel: str, post_ids=None):
+        """Масово схвалити/відхилити/розкласти по слотах заявки: список ID або
+        (post_ids=None) всю чергу каналу. Заявки, орендовані іншими модераторами,
+        пропускаються. Схвалені ставляться в чергу публікації, авторів відхилених
+        сповіщаємо одразу."""
+        if action == 'slot':
+            delays = await assign_slots(post_ids, owner)
+            rows = await db.approve_posts(list(delays), owner, delays)
+            result_text = f"🕒 Заплановано: {len(rows)}"
+            if rows:
+                moments = sorted(row['scheduled_at'] for row in rows)
+                result_text += f" ({format_publish_time(moments[0])} — {format_publish_time(moments[-1])})"
+        elif action == 'approve':
+            if post_ids is None:
+                rows = await db.approve_channel_queue(channel, owner)
+            else:
+                rows = await db.approve_posts(post_ids, owner)
+            result_text = f"✅ Поставлено в чергу публікації: {len(rows)}"
+        else:
+            if post_ids is None:
+                rows = await db.reject_channel_queue(channel, owner)
+            else:
+                rows = await db.set_posts_status(post_ids, 'rejected', owner)
+            result_text = f"❌ Відхилено: {len(rows)}"
         
+        if post_ids is not None and len(rows) < len(post_ids):
+            result_text += f"\n⚠️ Пропущено (вже оброблені або в роботі іншого модератора): {len(post_ids) - len(rows)}"
+        await message.answer(result_text)
+        
+        if action == 'reject':
+            async def notify(row):
+                with send_priority(Priority.NOTIFY):
+                    await bot.send_message(row['user_id'], "❌ Пост відхилено.")
+            await run_bounded(rows, notify, BULK_NOTIFY_CONCURRENCY)
+
+    @dp.callback_query(F.data.startswith("select_"))
+    async def toggle_post_selection(callback: CallbackQuery, state: FSMContext):
         post_id = int(callback.data.split("_")[1])
-        post_data = db.get_post_by_id(post_id)
-        if not post_data:
+        data = await state.get_data()
+        selected = set(data.get('selected_posts', []))
+        if post_id in selected:
+            selected.discard(post_id)
+        else:
+            selected.add(post_id)
+        await state.update_data(selected_posts=sorted(selected))
+        await callback.message.edit_reply_markup(reply_markup=get_moderation_keyboard(post_id, post_id in selected))
+        await callback.answer(f"Вибрано: {len(selected)}")
+
+    @dp.callback_query(F.data.startswith("bulk_"))
+    async def bulk_action_requested(callback: CallbackQuery, state: FSMContext):
+        _, action, scope = callback.data.split("_")
+        data = await state.get_data()
+        channel = data.get('queue_channel')
+        
+        if not channel:
+            await callback.answer("❌ Спочатку оберіть канал у черзі модерації.")
             return
-        _, user_id, username, channel, msg_data, _ = post_data
         
-        channels = db.get_all_channels()
-        channel_id = channels.get(channel)
+        if scope == 'channel':
+            pending_count = await db.count_pending_posts(channel)
+            verb = "Опублікувати" if action == 'approve' else "Відхилити"
+            await callback.message.answer(
+                f"❗️ {verb} всі {pending_count} заявок каналу <b>{channel}</b>?",
+                reply_markup=get_bulk_confirm_keyboard(action),
+                parse_mode="HTML"
+            )
+            await callback.answer()
+            return
         
-        if not channel_id:
-            await callback.answer(f"❌ Канал '{channel}' не знайдено в БД!")
+        post_ids = data.get('queue_page_ids', []) if scope == 'page' else data.get('selected_posts', [])
+        if not post_ids:
+            await callback.answer("Немає вибраних заявок." if scope == 'selected' else "Сторінка порожня.")
             return
         
-        try:
-            if msg_data.get('media_group'):
-                media_group = []
-                caption_text = msg_data.get('caption', '')
-                for idx, item in enumerate(msg_data['media_group']):
-                    if item['type'] == 'photo':
-                        media_group.append(InputMediaPhoto(media=item['file_id'], caption=caption_text if idx == 0 else None))
-                    elif item['type'] == 'video':
-                        media_group.append(InputMediaVideo(media=item['file_id'], caption=caption_text if idx == 0 else None))
-                await bot.send_media_group(chat_id=channel_id, media=media_group)
-            elif msg_data.get('photo'):
-                await bot.send_photo(channel_id, msg_data['photo'], caption=msg_data.get('caption', ''))
-            elif msg_data.get('video'):
-                await bot.send_video(channel_id, msg_data['video'], caption=msg_data.get('caption', ''))
-            else:
-                await bot.send_message(channel_id, msg_data.get('text', ''))
-            
-            db.update_post_status(post_id, 'approved')
-            await bot.send_message(user_id, f"✅ Пост опубліковано в '{channel}'!")
-            await callback.message.edit_reply_markup(reply_markup=None)
-            await callback.answer("✅ Опубліковано!")
-        except Exception as e:
-            await callback.answer(f"❌ Помилка: {e}")
+        await callback.answer()
+        await run_bulk_action(callback.message, moderator_id(callback.from_user.id), action, channel, post_ids)
+        if scope == 'selected':
+            await state.update_data(selected_posts=[])
+
+    @dp.callback_query(F.data.startswith("bulkok_"))
+    async def bulk_channel_confirmed(callback: CallbackQuery, state: FSMContext):
+        _, action, _ = callback.data.split("_")
+        data = await state.get_data()
+        channel = data.get('queue_channel')
+        await callback.message.edit_reply_markup(reply_markup=None)
+        if not channel:
+            await callback.answer("❌ Спочатку оберіть канал у черзі модерації.")
+            return
+        await callback.answer()
+        await run_bulk_action(callback.message, moderator_id(callback.from_user.id), action, channel)
+
+    @dp.callback_query(F.data == "bulkcancel")
+    async def bulk_channel_cancelled(callback: CallbackQuery):
+        await callback.message.edit_reply_markup(reply_markup=None)
+        await callback.answer("Скасовано.")
+
+    @dp.callback_query(F.data.startswith("approve_"))
+    async def approve_post(callback: CallbackQuery):
+        post_id = int(callback.data.split("_")[1])
+        # Перехід pending → approved і задача публікації — одним запитом;
+        # повторне натискання вже не знайде заявку в pending
+        rows = await db.approve_posts([post_id], moderator_id(callback.from_user.id))
+        if not rows:
+            await callback.answer("⏳ Заявку вже оброблено, її обробляє інший модератор або канал видалено.")
+            return
+        # Публікує PublishWorker, автор отримає сповіщення після виходу посту
+        await callback.answer("✅ Поставлено в чергу публікації!")
+        await callback.message.edit_reply_markup(reply_markup=None)
+
+    @dp.callback_query(F.data.startswith("slot_"))
+    async def schedule_post_into_slot(callback: CallbackQuery):
+        post_id = int(callback.data.split("_")[1])
+        owner = moderator_id(callback.from_user.id)
+        delays = await assign_slots([post_id], owner)
+        rows = await db.approve_posts([post_id], owner, delays) if delays else []
+        if not rows:
+            await callback.answer("⏳ Заявку вже оброблено, її обробляє інший модератор або вільних слотів немає.")
+            return
+        await callback.answer(f"🕒 Заплановано на {format_publish_time(rows[0]['scheduled_at'])}")
+        await callback.message.edit_reply_markup(reply_markup=None)
+
+    @dp.callback_query(F.data.startswith("schedule_"))
+    async def schedule_post_requested(callback: CallbackQuery, state: FSMContext):
+        post_id = int(callback.data.split("_")[1])
+        await state.update_data(schedule_post_id=post_id)
+        await state.set_state(AdminStates.entering_publish_time)
+        await callback.answer()
+        await callback.message.answer(
+            f"📅 Коли опублікувати заявку #{post_id}?\n"
+            f"Введіть час у форматі ГГ:ХХ або ДД.ММ ГГ:ХХ:",
+            reply_markup=get_confirm_keyboard_simple()
+        )
+
+    @dp.message(AdminStates.entering_publish_time, F.text == "❌ Скасувати")
+    async def cancel_publish_time(message: Message, state: FSMContext):
+        await state.update_data(schedule_post_id=None)
+        await state.set_state(AdminStates.in_admin_panel)
+        await message.answer("Скасовано.", reply_markup=get_admin_menu_keyboard())
+
+    @dp.message(AdminStates.entering_publish_time)
+    async def publish_time_entered(message: Message, state: FSMContext):
+        moment = parse_publish_time((message.text or '').strip())
+        if moment is None:
+            await message.answer("❌ Невірний формат. Приклад: 18:30 або 25.12 09:00")
+            return
+        data = await state.get_data()
+        post_id = data.get('schedule_post_id')
+        await state.update_data(schedule_post_id=None)
+        await state.set_state(AdminStates.in_admin_panel)
+        # У БД передається затримка, а не час: часові пояси бота і БД можуть різнитись
+        delay = (moment - datetime.now()).total_seconds()
+        rows = await db.approve_posts([post_id], moderator_id(message.from_user.id), {post_id: delay})
+        if not rows:
+            await message.answer(
+                "⏳ Заявку вже оброблено, її обробляє інший модератор або канал видалено.",
+                reply_markup=get_admin_menu_keyboard()
+            )
+            return
+        await message.answer(
+            f"📅 Заявку #{post_id} буде опубліковано {format_publish_time(moment)}.",
+            reply_markup=get_admin_menu_keyboard()
+        )
 
     @dp.callback_query(F.data.startswith("reject_"))
     async def reject_post(callback: CallbackQuery):
         post_id = int(callback.data.split("_")[1])
-        post_data = db.get_post_by_id(post_id)
-        if not post_data:
+        post = await db.transition_post_status(post_id, 'rejected', moderator_id(callback.from_user.id))
+        if not post:
+            await callback.answer("⏳ Заявку вже оброблено або її обробляє інший модератор.")
             return
-        _, user_id, _, channel, _, _ = post_data
-        db.update_post_status(post_id, 'rejected')
+        await callback.answer("❌ Відхилено!")
+        await callback.message.edit_reply_markup(reply_markup=None)
         try:
-            await bot.send_message(user_id, f"❌ Пост відхилено.")
+            with send_priority(Priority.NOTIFY):
+                await bot.send_message(post['user_id'], f"❌ Пост відхилено.")
         except:
             pass
-        await callback.message.edit_reply_markup(reply_markup=None)
-        await callback.answer("❌ Відхилено!")
@@ -0,0 +1,147 @@
+"""
+Збирання альбомів (media group) з окремих повідомлень.
+
+Telegram надсилає кожен елемент альбому окремим оновленням, тому елементи
+накопичуються, доки не мине пауза без нових частин. Пауза підлаштовується
+під фактичні інтервали між частинами, кількість альбомів у пам'яті
+обмежена, а альбоми, що «тягнуться» довше за TTL, відкидаються.
+"""
+
+import asyncio
+import logging
+import sys
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Telegram не дозволяє більше 10 елементів в одному альбомі
+MAX_ALBUM_ITEMS = 10
+
+
+class Album:
+    __slots__ = ('key', 'user_id', 'context', 'items', 'caption', 'created_at', 'last_at', 'timer')
+
+    def __init__(self, key, user_id: int, context, now: float):
+        self.key = key
+        self.user_id = user_id
+        self.context = context
+        self.items = []
+        self.caption = ''
+        self.created_at = now
+        self.last_at = now
+        self.timer = None
+
+
+class AlbumAggregator:
+    def __init__(self, on_complete, max_albums: int = 10_000, ttl: float = 30.0,
+                 min_delay: float = 0.3, max_delay: float = 2.0, gap_factor: float = 3.0):
+        """on_complete(album) — корутина, що викликається один раз на зібраний альбом"""
+        self.on_complete = on_complete
+        self.max_albums = max_albums
+        self.ttl = ttl
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.gap_factor = gap_factor
+
+        self._albums = OrderedDict()
+        # Нещодавно завершені альбоми: запізнілі частини не створюють новий альбом
+        self._closed = OrderedDict()
+        # Згладжений інтервал між частинами одного альбому; старт — колишня фіксована 1 с
+        self._gap = 1.0 / gap_factor
+        self._completed = 0
+        self._evicted = 0
+        self._dropped_items = 0
+        self._tasks = set()
+
+    @property
+    def delay(self) -> float:
+        return min(self.max_delay, max(self.min_delay, self._gap * self.gap_factor))
+
+    def _observe_gap(self, gap: float):
+        self._gap += 0.2 * (min(gap, self.max_delay) - self._gap)
+
+    def _forget_closed(self, now: float):
+        while self._closed:
+            key, closed_at = next(iter(self._closed.items()))
+            if closed_at >= now - self.ttl and len(self._closed) <= self.max_albums:
+                break
+            self._closed.popitem(last=False)
+
+    def _close(self, album: Album, now: float):
+        if album.timer is not None:
+            album.timer.cancel()
+        self._albums.pop(album.key, None)
+        self._closed[album.key] = now
+        self._forget_closed(now)
+
+    def _evict(self, album: Album, now: float, reason: str):
+        self._close(album, now)
+        self._evicted += 1
+        logger.warning(f"Альбом {album.key} відкинуто: {reason}")
+
+    def add(self, key, user_id: int, context, item: dict, caption: str = None):
+        """Додати частину альбому; виклик синхронний, тому гонок між частинами немає"""
+        now = time.monotonic()
+        if key in self._closed:
+            self._dropped_items += 1
+            return
+
+        album = self._albums.get(key)
+        if album is None:
+            while len(self._albums) >= self.max_albums:
+                _, oldest = next(iter(self._albums.items()))
+                self._evict(oldest, now, "перевищено ліміт альбомів у пам'яті")
+            album = Album(key, user_id, context, now)
+            self._albums[key] = album
+        elif now - album.created_at > self.ttl:
+            self._evict(album, now, f"збирається довше {self.ttl:.0f} с")
+            self._dropped_items += 1
+            return
+        else:
+            self._observe_gap(now - album.last_at)
+
+        album.items.append(item)
+        if caption:
+            album.caption = caption
+        album.last_at = now
+
+        if album.timer is not None:
+            album.timer.cancel()
+        if len(album.items) >= MAX_ALBUM_ITEMS:
+            # Більше частин не буде — не чекаємо паузи
+            self._finish(album)
+        else:
+            album.timer = asyncio.get_running_loop().call_later(self.delay, self._finish, album)
+
+    def _finish(self, album: Album):
+        if self._albums.get(album.key) is not album:
+            return
+        self._close(album, time.monotonic())
+        self._completed += 1
+        task = asyncio.create_task(self._complete(album))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _complete(self, album: Album):
+        try:
+            await self.on_complete(album)
+        except Exception as e:
+            logger.error(f"Помилка обробки альбому {album.key}: {e}")
+
+    def stats(self) -> dict:
+        pending_items = sum(len(album.items) for album in self._albums.values())
+        memory = sys.getsizeof(self._albums) + sys.getsizeof(self._closed) + sum(
+            sys.getsizeof(album) + sys.getsizeof(album.items)
+            + sum(sys.getsizeof(item) for item in album.items)
+            for album in self._albums.values()
+        )
+        return {
+            'pending_albums': len(self._albums),
+            'pending_items': pending_items,
+            'memory_bytes': memory,
+            'completed': self._completed,
+            'evicted': self._evicted,
+            'dropped_items': self._dropped_items,
+            'delay_ms': round(self.delay * 1000),
+        }
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк методів Database на великій схемі, заповненій seed_benchmark.py.
+
+Кожен метод виконується кілька разів; у звіт потрапляють min/медіана/p95/max
+часу виклику і EXPLAIN кожного його запиту з позначкою Seq Scan по великих
+таблицях. Методи, що змінюють дані (rename_channel, delete_channel,
+cleanup_orphaned_posts), виконуються в транзакції з відкатом, тож набір даних
+однаковий для всіх запусків. Звіт зберігається в JSON; з --compare звіт
+порівнюється з попереднім за медіаною.
+
+Приклад:
+    python benchmark.py --json before.json
+    python benchmark.py --json after.json --compare before.json
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from datetime import datetime
+
+from config import DB_CONFIG
+from database import Database
+from check_indexes import ExplainCursor, find_seq_scans, large_relations
+from seed_benchmark import SCHEMA
+
+# Зміна медіани, яку порівняння позначає як регресію чи прискорення
+SIGNIFICANT_CHANGE = 0.10
+
+
+class BenchmarkDatabase(Database):
+    """Database, що за потреби записує плани запитів і відкочує зміни"""
+
+    def __init__(self, dsn: dict):
+        super().__init__(dsn)
+        self.plans = None
+        self.rollback = False
+
+    async def run(self, fn, *args):
+        if self.pool is None:
+            await self.connect()
+        plans, rollback = self.plans, self.rollback
+
+        def job(conn):
+            if rollback:
+                conn.autocommit = False
+            try:
+                with conn.cursor(cursor_factory=ExplainCursor) as cursor:
+                    cursor.plans = plans
+                    return fn(cursor, *args)
+            finally:
+                if rollback:
+                    conn.rollback()
+                    conn.autocommit = True
+
+        return await self.pool.run(job)
+
+
+async def pick_targets(db: Database) -> dict:
+    """Параметри викликів: найбільший канал і найактивніший користувач"""
+    channel = await db.fetchone("""
+        SELECT c.channel_name, n.total, n.pending
+        FROM channel_post_counts n
+        JOIN channels c ON c.id = n.channel_ref
+        WHERE c.deleted_at IS NULL
+        ORDER BY n.total DESC
+        LIMIT 1
+    """)
+    user = await db.fetchone("""
+        SELECT user_id, total FROM user_post_counts ORDER BY total DESC LIMIT 1
+    """)
+    if not channel or not user:
+        raise RuntimeError("Схема порожня: спершу запустіть seed_benchmark.py")
+    return {
+        'channel': channel['channel_name'],
+        'channel_posts': channel['total'],
+        'channel_pending': channel['pending'],
+        'user_id': user['user_id'],
+        'user_posts': user['total'],
+    }
+
+
+async def dataset_summary(db: Database) -> dict:
+    row = await db.fetchone("""
+        SELECT
+            (SELECT COALESCE(SUM(total), 0) FROM user_post_counts) AS posts,
+            (SELECT COUNT(*) FROM users) AS users,
+            (SELECT COUNT(*) FROM channels) AS channels,
+            (SELECT COALESCE(SUM(pending), 0) FROM user_post_counts) AS pending,
+            (SELECT reltuples::BIGINT FROM pg_class WHERE oid = 'post_media'::regclass) AS media,
+            current_setting('server_version') AS server_version
+    """)
+    return {key: (int(value) if key != 'server_version' else value) for key, value in row.items()}
+
+
+def benchmarks(db: BenchmarkDatabase, targets: dict) -> dict:
+    """name -> (фабрика корутини, чи змінює дані)"""
+    channel, user_id = targets['channel'], targets['user_id']
+    return {
+        'get_pending_posts_by_channel': (lambda: db.get_pending_posts_by_channel(channel), False),
+        'get_posts_history': (lambda: db.get_posts_history(20), False),
+        'get_posts_history (канал)': (lambda: db.get_posts_history(20, {'channel': channel}), False),
+        'get_posts_history (користувач)': (lambda: db.get_posts_history(20, {'user_id': user_id}), False),
+        'get_posts_history (сторінка 50)': (
+            lambda: db.get_posts_history(20, None, [targets['deep_page'], 0]), False
+        ),
+        'get_last_post_time': (lambda: db.get_last_post_time(user_id), False),
+        'cleanup_orphaned_posts': (lambda: db.cleanup_orphaned_posts(), True),
+        'rename_channel': (lambda: db.rename_channel(channel, f"{channel} (нова назва)"), True),
+        'delete_channel (soft)': (lambda: db.delete_channel(channel, soft=True), True),
+        'delete_channel (cascade)': (lambda: db.delete_channel(channel, soft=False), True),
+    }
+
+
+async def measure(db: BenchmarkDatabase, make_call, writes: bool, runs: int, warmup: int, tables: set) -> dict:
+    db.rollback = writes
+    # План — окремим проходом: EXPLAIN не має потрапляти в заміри
+    db.plans = []
+    await make_call()
+    plans, db.plans = db.plans, None
+
+    for _ in range(warmup):
+        await make_call()
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        await make_call()
+        timings.append((time.perf_counter() - started) * 1000)
+    db.rollback = False
+
+    timings.sort()
+    return {
+        'runs': runs,
+        'min_ms': round(timings[0], 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(timings[max(0, -(-95 * runs // 100) - 1)], 3),
+        'max_ms': round(timings[-1], 3),
+        'rollback': writes,
+        'seq_scans': sorted({table for _, plan in plans for table in find_seq_scans(plan, tables)}),
+        'plans': [{'query': ' '.join(query.split()), 'plan': plan} for query, plan in plans],
+    }
+
+
+def compare(report: dict, baseline: dict):
+    print()
+    print(f"📊 Порівняння з {baseline.get('created_at', 'попереднім звітом')} (медіана, мс)")
+    for name, result in report['benchmarks'].items():
+        old = baseline.get('benchmarks', {}).get(name)
+        if not old:
+            print(f"  {name}: {result['median_ms']} (немає в базовому звіті)")
+            continue
+        change = (result['median_ms'] - old['median_ms']) / old['median_ms'] if old['median_ms'] else 0.0
+        mark = '🔴' if change > SIGNIFICANT_CHANGE else '🟢' if change < -SIGNIFICANT_CHANGE else '⚪'
+        print(f"  {mark} {name}: {old['median_ms']} → {result['median_ms']} ({change:+.0%})")
+    if baseline.get('dataset') != report['dataset']:
+        print("⚠️ Набори даних звітів різняться, порівняння орієнтовне")
+
+
+async def benchmark(args):
+    db = BenchmarkDatabase({**DB_CONFIG, 'options': f'-c search_path={args.schema}'})
+    try:
+        targets = await pick_targets(db)
+        # Курсор 50-ї сторінки історії: глибока keyset-пагінація
+        row = await db.fetchone("""
+            SELECT processed_at FROM posts
+            WHERE status IN ('approved', 'rejected')
+            ORDER BY processed_at DESC, id DESC
+            OFFSET %s LIMIT 1
+        """, (50 * 20,))
+        targets['deep_page'] = row['processed_at'].isoformat() if row else '2100-01-01T00:00:00'
+        report = {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'schema': args.schema,
+            'dataset': await dataset_summary(db),
+            'targets': targets,
+            'benchmarks': {},
+        }
+        tables = await large_relations(db)
+
+        print(f"⏱ {report['dataset']['posts']} постів; канал '{targets['channel']}' "
+              f"({targets['channel_posts']} постів), користувач {targets['user_id']} "
+              f"({targets['user_posts']} постів)")
+        selected = benchmarks(db, targets)
+        for name, (make_call, writes) in selected.items():
+            if args.only and not any(part in name for part in args.only):
+                continue
+            result = await measure(db, make_call, writes, args.runs, args.warmup, tables)
+            report['benchmarks'][name] = result
+            scans = f" ❌ Seq Scan: {', '.join(result['seq_scans'])}" if result['seq_scans'] else ""
+            print(f"  {name}: медіана {result['median_ms']} мс, p95 {result['p95_ms']} мс{scans}")
+    finally:
+        await db.close()
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+        print(f"📄 Звіт збережено у {args.json}")
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--schema', default=SCHEMA)
+    parser.add_argument('--runs', type=int, default=10, help="замірів на метод")
+    parser.add_argument('--warmup', type=int, default=2, help="викликів перед замірами")
+    parser.add_argument('--only', nargs='*', help="лише методи, назва яких містить один з підрядків")
+    parser.add_argument('--json', help="зберегти звіт у JSON")
+    parser.add_argument('--compare', help="JSON попереднього запуску для порівняння")
+    args = parser.parse_args()
+    if args.runs < 1:
+        sys.exit("--runs має бути додатним")
+    asyncio.run(benchmark(args))
@@ -1,35 +1,125 @@
 import asyncio
 import logging
+import math
+import time
 from aiogram import Bot, Dispatcher, F
 from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.types import Message, BotCommand
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove
-from datetime import datetime, timedelta
-from database import Database
-from config import BOT_TOKEN
+from database import db
+from channel_resolver import ChannelResolver
+from rate_limiter import RateLimiter, CooldownPolicy, build_policy
+from send_scheduler import SendScheduler
+from album_aggregator import AlbumAggregator
+from fsm_storage import PostgresStorage
+from webhook import run_webhook
+from publishing import PublishWorker
+from retention import PostsRetention
+from config import BOT_TOKEN, RATE_LIMIT_POLICY, RATE_LIMIT_BURST, RATE_LIMIT_MAX_USERS
+from config import (
+    SEND_GLOBAL_RATE, SEND_PRIVATE_CHAT_RATE, SEND_PRIVATE_CHAT_BURST,
+    SEND_GROUP_CHAT_PER_MINUTE, SEND_GROUP_CHAT_BURST, SEND_MAX_RETRIES
+)
+from config import ALBUM_MAX_PENDING, ALBUM_TTL, ALBUM_STATS_INTERVAL
+from config import FSM_CACHE_SIZE, FSM_SESSION_TTL, FSM_FLUSH_INTERVAL
+from config import PUBLISH_WORKERS, PUBLISH_MAX_ATTEMPTS, PUBLISH_JOB_LEASE_SECONDS, PUBLISH_POLL_INTERVAL
+from config import POSTS_PARTITIONS_AHEAD, POSTS_RETENTION_MONTHS, POSTS_ARCHIVE_DIR
+from config import (
+    BOT_MODE, WEBHOOK_BASE_URL, WEBHOOK_PATH, WEBHOOK_SECRET,
+    WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_QUEUE_SIZE, WEBHOOK_WORKERS
+)
 from admin_handlers import setup_admin_handlers
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 bot = Bot(token=BOT_TOKEN)
-storage = MemoryStorage()
+# Усі вихідні запити бота проходять через спільні ліміти Telegram
+send_scheduler = SendScheduler(
+    global_rate=SEND_GLOBAL_RATE,
+    private_rate=SEND_PRIVATE_CHAT_RATE,
+    private_burst=SEND_PRIVATE_CHAT_BURST,
+    group_per_minute=SEND_GROUP_CHAT_PER_MINUTE,
+    group_burst=SEND_GROUP_CHAT_BURST,
+    max_retries=SEND_MAX_RETRIES
+)
+bot.session.middleware(send_scheduler)
+storage = PostgresStorage(db, max_sessions=FSM_CACHE_SIZE, ttl=FSM_SESSION_TTL, flush_interval=FSM_FLUSH_INTERVAL)
 dp = Dispatcher(storage=storage)
-db = Database()
+
+publish_worker = PublishWorker(
+    db, bot,
+    workers=PUBLISH_WORKERS,
+    max_attempts=PUBLISH_MAX_ATTEMPTS,
+    lease_seconds=PUBLISH_JOB_LEASE_SECONDS,
+    poll_interval=PUBLISH_POLL_INTERVAL
+)
+# Воркери зупиняються до закриття сесії бота, щоб дописати поточні публікації
+dp.shutdown.register(publish_worker.stop)
+
+posts_retention = PostsRetention(
+    db,
+    retention_months=POSTS_RETENTION_MONTHS,
+    archive_dir=POSTS_ARCHIVE_DIR,
+    months_ahead=POSTS_PARTITIONS_AHEAD
+)
+dp.shutdown.register(posts_retention.stop)
 
 CHANNELS = {}
+channel_resolver = ChannelResolver({})
 
-album_data = {}
+rate_limiter = RateLimiter(build_policy(RATE_LIMIT_POLICY, 15 * 60, RATE_LIMIT_BURST), RATE_LIMIT_MAX_USERS)
 
-def load_channels_from_db():
+async def load_channels_from_db():
     """Завантажує канали з БД в глобальний словник"""
-    global CHANNELS
-    CHANNELS = db.get_all_channels()
+    global CHANNELS, channel_resolver
+    channels = await db.get_all_channels()
+    # Індекс будується окремо і підміняється одним присвоєнням
+    resolver = await asyncio.to_thread(ChannelResolver, channels)
+    CHANNELS, channel_resolver = channels, resolver
     logger.info(f"📡 Завантажено {len(CHANNELS)} каналів з БД")
 
+async def warm_rate_limiter():
+    """Завантажує в пам'ять пости, що ще впливають на обмеження частоти"""
+    spam_settings = await db.get_spam_settings()
+    rate_limiter.configure(build_policy(RATE_LIMIT_POLICY, spam_settings['minutes'] * 60, RATE_LIMIT_BURST))
+    policy = rate_limiter.policy
+    history = await db.get_recent_post_times(policy.ttl, policy.history_size)
+    if history is None:
+        return
+    rate_limiter.complete = True
+    # За часом останнього посту: записи лягають у кінець без перестановок
+    for user_id, timestamps in sorted(history.items(), key=lambda item: max(item[1], default=0)):
+        rate_limiter.load(user_id, timestamps)
+    logger.info(f"⏱ Обмежувач частоти: {rate_limiter.stats()}")
+
+async def get_post_wait_minutes(user_id: int) -> int:
+    """Скільки хвилин користувач має зачекати до наступного посту (0 - можна)"""
+    spam_settings = await db.get_spam_settings()
+    if not spam_settings['enabled']:
+        return 0
+    
+    rate_limiter.configure(build_policy(RATE_LIMIT_POLICY, spam_settings['minutes'] * 60, RATE_LIMIT_BURST))
+    rate_limiter.purge()
+    wait = rate_limiter.retry_after(user_id)
+    if wait is None:
+        policy = rate_limiter.policy
+        history = await db.get_recent_post_times(policy.ttl, policy.history_size, user_id)
+        if history is None:
+            return 0
+        rate_limiter.load(user_id, history.get(user_id, []))
+        wait = rate_limiter.retry_after(user_id) or 0
+    return math.ceil(wait / 60)
+
+async def get_db_cooldown_seconds() -> float:
+    """Затримка, яку БД перевіряє атомарно при вставці (лише для політики cooldown)"""
+    spam_settings = await db.get_spam_settings()
+    if spam_settings['enabled'] and isinstance(rate_limiter.policy, CooldownPolicy):
+        return rate_limiter.policy.window
+    return 0
+
 class UserStates(StatesGroup):
     waiting_for_post = State()
     confirming_post = State()
@@ -51,24 +141,15 @@ def get_confirm_keyboard():
 async def cmd_start(message: Message, state: FSMContext, command: CommandObject):
     user_id = message.from_user.id
     username = message.from_user.username or "без_ніка"
-    db.add_user(user_id, username)
+    await db.add_user(user_id, username)
     
     if command.args:
-        channel_param_raw = command.args.strip()
-        channel_found = None
-        
-        channel_param_name = channel_param_raw.replace('_', ' ')
-        for channel_name in CHANNELS.keys():
-            if channel_name.lower() == channel_param_name.lower() or channel_param_name.lower() in channel_name.lower():
-                channel_found = channel_name
-                break
-        
-        if not channel_found:
-            search_id = channel_param_raw if channel_param_raw.startswith('@') else f'@{channel_param_raw}'
-            for channel_name, channel_id in CHANNELS.items():
-                if channel_id.lower() == search_id.lower():
-                    channel_found = channel_name
-                    break
+        channel_found = channel_resolver.resolve(command.args)
+        stats = channel_resolver.stats()
+        logger.debug(
+            f"🔎 Пошук каналу '{command.args}' → {channel_found} "
+            f"(середнє {stats['avg_ms']:.3f} мс, макс {stats['max_ms']:.3f} мс)"
+        )
         
         if channel_found:
             await state.update_data(channel=channel_found)
@@ -108,19 +189,13 @@ async def write_another_post_button(message: Message, state: FSMContext):
         await message.answer("❌ Помилка: канал не знайдено.")
         return
     
-    spam_settings = db.get_spam_settings()
-    
-    if spam_settings['enabled']:
-        last_post_time = db.get_last_post_time(user_id)
-        if last_post_time:
-            time_diff = datetime.now() - last_post_time
-            if time_diff < timedelta(minutes=spam_settings['minutes']):
-                remaining = spam_settings['minutes'] - int(time_diff.total_seconds() / 60)
-                await message.answer(
-                    f"⏳ Зачекайте ще {remaining} хв. перед наступним постом.",
-                    reply_markup=get_write_another_post_keyboard()
-                )
-                return
+    remaining = await get_post_wait_minutes(user_id)
+    if remaining > 0:
+        await message.answer(
+            f"⏳ Зачекайте ще {remaining} хв. перед наступним постом.",
+            reply_markup=get_write_another_post_keyboard()
+        )
+        return
     
     await message.answer(
         f"📢 <b>{channel}</b>\n\nНадішліть пост:",
@@ -129,76 +204,71 @@ async def write_another_post_button(message: Message, state: FSMContext):
     )
     await state.set_state(UserStates.waiting_for_post)
 
+def media_item(media_type: str, file) -> dict:
+    """Файл поста: file_unique_id однаковий для повторних надсилань того самого файлу"""
+    return {'type': media_type, 'file_id': file.file_id, 'file_unique_id': file.file_unique_id}
+
+async def finish_album(album):
+    """Альбом зібрано: зберегти його в стані й запропонувати дії"""
+    photos = sum(1 for m in album.items if m['type'] == 'photo')
+    videos = sum(1 for m in album.items if m['type'] == 'video')
+    media_text = []
+    if photos > 0:
+        media_text.append(f"{photos} фото")
+    if videos > 0:
+        media_text.append(f"{videos} відео")
+    
+    state = album.context
+    await state.update_data(
+        post_media=album.items,
+        post_text=album.caption,
+        has_content=True
+    )
+    await bot.send_message(
+        album.user_id,
+        f"📸 Альбом: {' та '.join(media_text)}\n\nОбери дію:",
+        reply_markup=get_confirm_keyboard()
+    )
+    await state.set_state(UserStates.confirming_post)
+
+album_aggregator = AlbumAggregator(finish_album, max_albums=ALBUM_MAX_PENDING, ttl=ALBUM_TTL)
+
+async def log_album_stats():
+    """Періодично пише в лог незавершені альбоми і пам'ять, яку вони займають"""
+    while True:
+        await asyncio.sleep(ALBUM_STATS_INTERVAL)
+        logger.info(f"📸 Альбоми: {album_aggregator.stats()}")
+
 @dp.message(UserStates.waiting_for_post)
 async def handle_post_content(message: Message, state: FSMContext):
     user_id = message.from_user.id
     
     if message.media_group_id:
-        album_key = f"{user_id}_{message.media_group_id}"
-        
-        if album_key not in album_data:
-            album_data[album_key] = {
-                'items': [],
-                'caption': '',
-                'user_id': user_id,
-                'state': state,
-                'task': None
-            }
-        
         if message.photo:
-            album_data[album_key]['items'].append({'type': 'photo', 'file_id': message.photo[-1].file_id})
+            item = media_item('photo', message.photo[-1])
         elif message.video:
-            album_data[album_key]['items'].append({'type': 'video', 'file_id': message.video.file_id})
-        
-        if message.caption:
-            album_data[album_key]['caption'] = message.caption
-        
-        if album_data[album_key]['task']:
-            album_data[album_key]['task'].cancel()
-        
-        async def finish_album():
-            await asyncio.sleep(1.0)
-            if album_key in album_data:
-                data = album_data[album_key]
-                items = data['items']
-                photos = sum(1 for m in items if m['type'] == 'photo')
-                videos = sum(1 for m in items if m['type'] == 'video')
-                media_text = []
-                if photos > 0:
-                    media_text.append(f"{photos} фото")
-                if videos > 0:
-                    media_text.append(f"{videos} відео")
-                
-                await state.update_data(
-                    media_group=items,
-                    caption=data['caption'],
-                    has_content=True
-                )
-                await bot.send_message(
-                    user_id,
-                    f"📸 Альбом: {' та '.join(media_text)}\n\nОбери дію:",
-                    reply_markup=get_confirm_keyboard()
-                )
-                await state.set_state(UserStates.confirming_post)
-                del album_data[album_key]
-        
-        album_data[album_key]['task'] = asyncio.create_task(finish_album())
+            item = media_item('video', message.video)
+        else:
+            return
+        album_aggregator.add((user_id, message.media_group_id), user_id, state, item, message.caption)
         return
     
     if message.photo:
-        await state.update_data(photo=message.photo[-1].file_id, caption=message.caption or '', has_content=True)
+        await state.update_data(post_media=[media_item('photo', message.photo[-1])],
+                                post_text=message.caption or '', has_content=True)
         await message.answer("📸 Фото отримано!\n\nОбери дію:", reply_markup=get_confirm_keyboard())
         await state.set_state(UserStates.confirming_post)
         return
     
     if message.video:
-        await state.update_data(video=message.video.file_id, caption=message.caption or '', has_content=True)
+        await state.update_data(post_media=[media_item('video', message.video)],
+                                post_text=message.caption or '', has_content=True)
         await message.answer("🎥 Відео отримано!\n\nОбери дію:", reply_markup=get_confirm_keyboard())
         await state.set_state(UserStates.confirming_post)
         return
     
     if message.text:
-        await state.update_data(text_content=message.text, has_content=True)
+        await state.update_data(post_media=[], post_text=message.text, has_content=True)
         await message.answer("📝 Текст отримано!\n\nОбери дію:", reply_markup=get_confirm_keyboard())
         await state.set_state(UserStates.confirming_post)
         return
@@ -210,36 +280,55 @@ async def confirm_and_send_post(message: Message, state: FSMContext):
     user_id = message.from_user.id
     username = message.from_user.username or "без_ніка"
     
-    spam_settings = db.get_spam_settings()
+    remaining = await get_post_wait_minutes(user_id)
+    post_id = 0
     
-    if spam_settings['enabled']:
-        last_post_time = db.get_last_post_time(user_id)
-        if last_post_time:
-            time_diff = datetime.now() - last_post_time
-            if time_diff < timedelta(minutes=spam_settings['minutes']):
-                remaining = spam_settings['minutes'] - int(time_diff.total_seconds() / 60)
-                await message.answer(
-                    f"⏳ Зачекайте ще {remaining} хв. перед наступним постом.",
-                    reply_markup=get_write_another_post_keyboard()
-                )
-                await state.clear()
-                await state.update_data(channel=channel)
-                return
+    if remaining == 0:
+        post_message = {'text': data.get('post_text', ''), 'media': data.get('post_media', [])}
+        
+        # Остаточна перевірка затримки і вставка - один атомарний запит до БД
+        cooldown = await get_db_cooldown_seconds()
+        result = await db.add_post_rate_limited(user_id, username, channel, post_message, cooldown)
+        post_id = result['post_id']
+        if result['error']:
+            # Пост не збережено: лишаємо його в стані, щоб користувач міг повторити
+            await message.answer(
+                "❌ Не вдалося відправити пост, спробуйте ще раз.",
+                reply_markup=get_confirm_keyboard()
+            )
+            return
+        if result['channel_missing']:
+            # Канал перейменовано чи видалено, поки користувач писав пост
+            await message.answer(
+                f"❌ Канал '{channel}' більше недоступний, пост не відправлено.\n\n"
+                "💡 Зверніться до адміністратора за новим посиланням на канал.",
+                reply_markup=ReplyKeyboardRemove()
+            )
+            await state.clear()
+            return
+        if post_id:
+            rate_limiter.record(user_id)
+        elif result['retry_after'] > 0:
+            # Пост від іншого воркера, якого ще не було в пам'яті
+            rate_limiter.load(user_id, [time.time() - (cooldown - result['retry_after'])])
+            remaining = math.ceil(result['retry_after'] / 60)
+    
+    if remaining > 0:
+        await message.answer(
+            f"⏳ Зачекайте ще {remaining} хв. перед наступним постом.",
+            reply_markup=get_write_another_post_keyboard()
+        )
+        await state.clear()
+        await state.update_data(channel=channel)
+        return
     
-    msg_data = {}
-    if data.get('media_group'):
-        msg_data['media_group'] = data['media_group']
-        msg_data['caption'] = data.get('caption', '')
-    elif data.get('photo'):
-        msg_data['photo'] = data['photo']
-        msg_data['caption'] = data.get('caption', '')
-    elif data.get('video'):
-        msg_data['video'] = data['video']
-        msg_data['caption'] = data.get('caption', '')
-    elif data.get('text_content'):
-        msg_data['text'] = data['text_content']
+    if not post_id:
+        await message.answer(
+            "❌ Не вдалося відправити пост, спробуйте ще раз.",
+            reply_markup=get_confirm_keyboard()
+        )
+        return
     
-    post_id = db.add_post(user_id, username, channel, msg_data)
     await message.answer(
         f"✅ Відправлено! Заявка #{post_id}",
         reply_markup=get_write_another_post_keyboard(),
@@ -266,18 +355,46 @@ async def setup_bot_commands():
     ])
 
 async def main():
-    await db.create_tables()
+    await db.connect()
+    await db.migrate()
+    # Секції posts на найближчі місяці мають існувати до першої заявки
+    await posts_retention.start()
+    await storage.start()
+    await db.start_listener()
     
     # Очищення сирітських заявок при запуску
-    orphaned_count = db.cleanup_orphaned_posts()
+    orphaned_count = await db.cleanup_orphaned_posts()
     if orphaned_count > 0:
         logger.info(f"🧹 Очищено {orphaned_count} сирітських заявок")
     
-    load_channels_from_db()
+    await load_channels_from_db()
+    await warm_rate_limiter()
     setup_admin_handlers(dp, bot, load_channels_from_db)
     await setup_bot_commands()
+    await publish_worker.start()
+    album_stats_task = asyncio.create_task(log_album_stats()) if ALBUM_STATS_INTERVAL > 0 else None
     logger.info("🚀 Бот запущено!")
-    await dp.start_polling(bot)
+    try:
+        if BOT_MODE == 'webhook':
+            await run_webhook(
+                dp, bot, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_BASE_URL,
+                path=WEBHOOK_PATH,
+                secret=WEBHOOK_SECRET,
+                queue_size=WEBHOOK_QUEUE_SIZE,
+                workers=WEBHOOK_WORKERS,
+                extra_stats={'albums': album_aggregator.stats}
+            )
+        else:
+            await dp.start_polling(bot)
+    finally:
+        if album_stats_task is not None:
+            album_stats_task.cancel()
+        logger.info(f"📸 Альбоми: {album_aggregator.stats()}")
+        for row in db.query_stats()[:10]:
+            if row['calls']:
+                logger.info(f"🗄 {row['name']}: {row['calls']} викликів, "
+                            f"{row['total_ms']} мс (сер. {row['avg_ms']}, макс. {row['max_ms']})")
+        await db.close()
 
 if __name__ == '__main__':
     asyncio.run(main())
@@ -0,0 +1,95 @@
+"""
+Індекс каналів для розбору параметра deep-link у /start
+"""
+
+import time
+
+# Підрядки довші за цей ліміт не індексуються і шукаються перебором
+MAX_INDEXED_SUBSTRING = 64
+
+
+def normalize_name(value: str) -> str:
+    return ' '.join(value.replace('_', ' ').split()).casefold()
+
+
+def normalize_id(value: str) -> str:
+    value = value.strip()
+    if 't.me/' in value:
+        value = value.split('t.me/')[-1].strip('/')
+    if not value.startswith('@'):
+        value = f'@{value}'
+    return value.casefold()
+
+
+class ChannelResolver:
+    """Незмінний індекс: при зміні каналів будується новий екземпляр"""
+
+    def __init__(self, channels: dict):
+        self.channels = dict(channels)
+        self._by_name = {}
+        self._by_id = {}
+        self._by_substring = {}
+        self._lookups = 0
+        self._total_time = 0.0
+        self._max_time = 0.0
+
+        for channel_name, channel_id in self.channels.items():
+            self._by_name.setdefault(normalize_name(channel_name), channel_name)
+            self._by_id.setdefault(normalize_id(channel_id), channel_name)
+
+        ranked = {}
+        for channel_name in self.channels:
+            normalized = normalize_name(channel_name)
+            for start in range(len(normalized)):
+                stop_limit = min(len(normalized), start + MAX_INDEXED_SUBSTRING)
+                for stop in range(start + 1, stop_limit + 1):
+                    key = normalized[start:stop]
+                    rank = self._rank(start, normalized, channel_name)
+                    best = ranked.get(key)
+                    if best is None or rank < best:
+                        ranked[key] = rank
+        self._by_substring = {key: rank[-1] for key, rank in ranked.items()}
+
+    @staticmethod
+    def _rank(position: int, normalized: str, channel_name: str):
+        # Префікс важливіший за входження всередині, далі коротша назва, далі алфавіт
+        return (position != 0, len(normalized), channel_name)
+
+    def _find_by_substring(self, fragment: str):
+        if len(fragment) <= MAX_INDEXED_SUBSTRING:
+            return self._by_substring.get(fragment)
+        candidates = []
+        for channel_name in self.channels:
+            normalized = normalize_name(channel_name)
+            position = normalized.find(fragment)
+            if position != -1:
+                candidates.append(self._rank(position, normalized, channel_name))
+        return min(candidates)[-1] if candidates else None
+
+    def resolve(self, param: str):
+        """Повернути назву каналу за параметром /start або None"""
+        started = time.perf_counter()
+        try:
+            param = param.strip()
+            if not param:
+                return None
+            name_key = normalize_name(param)
+            return (
+                self._by_name.get(name_key)
+                or self._by_id.get(normalize_id(param))
+                or (self._find_by_substring(name_key) if name_key else None)
+            )
+        finally:
+            elapsed = time.perf_counter() - started
+            self._lookups += 1
+            self._total_time += elapsed
+            self._max_time = max(self._max_time, elapsed)
+
+    def stats(self) -> dict:
+        return {
+            'channels': len(self.channels),
+            'indexed_substrings': len(self._by_substring),
+            'lookups': self._lookups,
+            'avg_ms': (self._total_time / self._lookups * 1000) if self._lookups else 0.0,
+            'max_ms': self._max_time * 1000,
+        }
@@ -30,46 +30,35 @@ async def check_database():
     try:
         print("🔄 Підключення до бази даних...")
         db = Database()
+        await db.connect()
         print("✅ Підключення успішне!")
         print()
         
-        print("🔄 Створення таблиць...")
-        await db.create_tables()
-        print("✅ Таблиці створено!")
+        print("🔄 Застосування міграцій...")
+        await db.migrate()
+        print("✅ Схема БД актуальна!")
         print()
         
         # Перевірка таблиць
-        cursor = db.get_cursor()
-        cursor.execute("""
+        tables = await db.fetchall("""
             SELECT table_name 
             FROM information_schema.tables 
             WHERE table_schema = 'public'
             ORDER BY table_name
         """)
         
-        tables = cursor.fetchall()
-        cursor.close()
-        
         print("📊 Таблиці в базі даних:")
         for table in tables:
             print(f"  ✓ {table['table_name']}")
         print()
         
         # Статистика
-        cursor = db.get_cursor()
-        cursor.execute("SELECT COUNT(*) as count FROM users")
-        users_count = cursor.fetchone()['count']
-        
-        cursor.execute("SELECT COUNT(*) as count FROM admins")
-        admins_count = cursor.fetchone()['count']
-        
-        cursor.execute("SELECT COUNT(*) as count FROM posts")
-        posts_count = cursor.fetchone()['count']
-        
-        cursor.execute("SELECT COUNT(*) as count FROM posts WHERE status = 'pending'")
-        pending_count = cursor.fetchone()['count']
+        users_count = (await db.fetchone("SELECT COUNT(*) as count FROM users"))['count']
+        admins_count = (await db.fetchone("SELECT COUNT(*) as count FROM admins"))['count']
+        posts_count = (await db.fetchone("SELECT COUNT(*) as count FROM posts"))['count']
+        pending_count = (await db.fetchone("SELECT COUNT(*) as count FROM posts WHERE status = 'pending'"))['count']
         
-        cursor.close()
+        await db.close()
         
         print("📈 Статистика:")
         print(f"  👥 Користувачів: {users_count}")
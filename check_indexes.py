@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Перевірка планів гарячих запитів database.py на великій таблиці posts.
+
+Скрипт створює тимчасову схему, застосовує в ній міграції, заповнює її
+синтетичними даними і виконує методи Database, записуючи EXPLAIN кожного
+запиту. Якщо хоч один гарячий запит читає posts через Seq Scan, скрипт
+завершується з кодом 1. Робочі таблиці не зачіпаються.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+
+from psycopg2.extras import RealDictCursor
+
+from config import DB_CONFIG
+from database import Database
+
+SCHEMA = 'index_check'
+
+# Таблиці, на яких гарячі запити не мають робити повний перегляд
+LARGE_TABLES = {'posts', 'post_media'}
+# Порожні секції (наступні місяці) Seq Scan читає безкоштовно, тож перевіряються лише заповнені
+MIN_PARTITION_ROWS = 1000
+
+
+class ExplainCursor(RealDictCursor):
+    """Курсор, що перед кожним запитом зберігає його план"""
+
+    plans = None
+
+    def execute(self, query, vars=None):
+        if self.plans is not None and query.lstrip().upper().startswith(('SELECT', 'WITH', 'UPDATE', 'DELETE', 'EXECUTE')):
+            super().execute("EXPLAIN (FORMAT JSON) " + query, vars)
+            self.plans.append((query, self.fetchone()['QUERY PLAN'][0]['Plan']))
+        return super().execute(query, vars)
+
+
+class ExplainingDatabase(Database):
+    def __init__(self, dsn: dict):
+        super().__init__(dsn)
+        self.plans = None
+
+    async def run(self, fn, *args):
+        if self.pool is None:
+            await self.connect()
+
+        def job(conn):
+            with conn.cursor(cursor_factory=ExplainCursor) as cursor:
+                cursor.plans = self.plans
+                return fn(cursor, *args)
+
+        return await self.pool.run(job)
+
+
+def find_seq_scans(plan: dict, tables: set) -> list:
+    found = []
+    if plan.get('Node Type') == 'Seq Scan' and plan.get('Relation Name') in tables:
+        found.append(plan['Relation Name'])
+    for child in plan.get('Plans', []):
+        found.extend(find_seq_scans(child, tables))
+    return found
+
+
+async def large_relations(db: Database) -> set:
+    """LARGE_TABLES разом із їхніми заповненими секціями"""
+    rows = await db.fetchall("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent::regclass::text = ANY(%s) AND c.reltuples >= %s
+    """, (list(LARGE_TABLES), MIN_PARTITION_ROWS))
+    return LARGE_TABLES | {row['relname'] for row in rows}
+
+
+async def seed(db: Database, posts: int, users: int, channels: int):
+    def job(cursor):
+        cursor.execute("""
+            INSERT INTO users (user_id, username)
+            SELECT g, 'user_' || g FROM generate_series(1, %s) g
+        """, (users,))
+        cursor.execute("""
+            INSERT INTO channels (channel_name, channel_id)
+            SELECT 'Канал ' || g, '@channel_' || g FROM generate_series(1, %s) g
+        """, (channels,))
+        cursor.execute(
+            "SELECT ensure_posts_partitions(LOCALTIMESTAMP - %s * INTERVAL '10 seconds', LOCALTIMESTAMP)",
+            (posts,)
+        )
+        # ~1% заявок чекають модерації, решта вже оброблена
+        cursor.execute("""
+            INSERT INTO posts (user_id, username, channel_ref, text, status, created_at, processed_at)
+            SELECT
+                1 + (g %% %(users)s),
+                'user_' || (1 + (g %% %(users)s)),
+                1 + (g %% %(channels)s),
+                'post',
+                CASE WHEN g %% 100 = 0 THEN 'pending'
+                     WHEN g %% 3 = 0 THEN 'rejected'
+                     ELSE 'approved' END,
+                created,
+                CASE WHEN g %% 100 = 0 THEN NULL ELSE created + INTERVAL '1 hour' END
+            FROM generate_series(1, %(posts)s) g,
+                 LATERAL (SELECT LOCALTIMESTAMP - (%(posts)s - g) * INTERVAL '10 seconds' AS created) t
+        """, {'posts': posts, 'users': users, 'channels': channels})
+        # Кожен 4-й пост з фото, кожен 20-й ще й з відео; частина файлів повторюється
+        cursor.execute("""
+            INSERT INTO post_media (post_id, post_created_at, ordinal, type, file_id, file_unique_id)
+            SELECT id, created_at, 1, 'photo', 'photo_' || id, 'u' || (id %% %(files)s)
+            FROM posts WHERE id %% 4 = 0
+            UNION ALL
+            SELECT id, created_at, 2, 'video', 'video_' || id, 'v' || id
+            FROM posts WHERE id %% 20 = 0
+        """, {'files': max(1, posts // 5)})
+        cursor.execute("ANALYZE")
+
+    await db.run(job)
+
+
+async def check_indexes(posts: int):
+    print("=" * 50)
+    print("🔍 Перевірка індексів гарячих запитів")
+    print("=" * 50)
+    print()
+
+    admin = Database()
+    await admin.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    await admin.execute(f"CREATE SCHEMA {SCHEMA}")
+
+    db = ExplainingDatabase({**DB_CONFIG, 'options': f'-c search_path={SCHEMA}'})
+    try:
+        await db.migrate()
+        print(f"🔄 Заповнення {posts} постів...")
+        await seed(db, posts, users=max(1, posts // 100), channels=500)
+        print()
+
+        tables = await large_relations(db)
+        db.plans = []
+        # Гарячі запити з параметрами, що відповідають реальному використанню
+        hot_calls = {
+            'get_pending_posts': db.get_pending_posts(),
+            'get_pending_posts_by_channel': db.get_pending_posts_by_channel('Канал 7'),
+            'claim_pending_posts': db.claim_pending_posts('Канал 7', 10, 'admin:1', 600),
+            'has_claimable_posts': db.has_claimable_posts('Канал 7'),
+            'claim_posts_by_ids': db.claim_posts_by_ids([posts // 2, posts // 3], 'admin:1', 600),
+            'release_claims': db.release_claims('admin:1'),
+            'count_pending_posts': db.count_pending_posts('Канал 7'),
+            'get_channels_with_pending_posts': db.get_channels_with_pending_posts(),
+            'get_post_by_id': db.get_post_by_id(posts // 2),
+            'transition_post_status': db.transition_post_status(posts // 2, 'approved'),
+            'get_scheduled_delays': db.get_scheduled_delays('Канал 7', 60 * 86400),
+            'get_posts_history': db.get_posts_history(limit=20),
+            'get_posts_history (канал)': db.get_posts_history(20, {'channel': 'Канал 7'}),
+            'get_posts_history (користувач, сторінка 2)': db.get_posts_history(
+                20, {'user_id': 7}, ['2100-01-01T00:00:00', 0]
+            ),
+            'get_user_stats': db.get_user_stats(7),
+            'get_last_post_time': db.get_last_post_time(7),
+            'get_recent_post_times': db.get_recent_post_times(900, 1, user_id=7),
+            'add_post_rate_limited': db.add_post_rate_limited(7, 'user_7', 'Канал 7', {'text': 'x'}, 900),
+            'get_posts_history (відео)': db.get_posts_history(20, {'media': 'video'}),
+            'get_posts_with_media': db.get_posts_with_media('video', 20),
+            'find_posts_with_files': db.find_posts_with_files(['u7', 'v20']),
+            'get_duplicate_files': db.get_duplicate_files(20),
+            'rename_channel': db.rename_channel('Канал 9', 'Канал 9 (нова назва)'),
+            'delete_channel (soft)': db.delete_channel('Канал 10', soft=True),
+            'delete_channel (cascade)': db.delete_channel('Канал 11', soft=False),
+            'cleanup_orphaned_posts': db.cleanup_orphaned_posts(),
+        }
+
+        failed = []
+        for name, call in hot_calls.items():
+            db.plans.clear()
+            await call
+            scans = [table for _, plan in db.plans for table in find_seq_scans(plan, tables)]
+            if scans:
+                failed.append(name)
+                print(f"  ❌ {name}: Seq Scan по {', '.join(sorted(set(scans)))}")
+                for query, plan in db.plans:
+                    print(json.dumps(plan, ensure_ascii=False, indent=2))
+            else:
+                print(f"  ✓ {name}")
+        print()
+    finally:
+        await db.close()
+        await admin.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await admin.close()
+
+    if failed:
+        print(f"❌ Seq Scan у {len(failed)} гарячих запитах: {', '.join(failed)}")
+        sys.exit(1)
+    print("✅ Усі гарячі запити використовують індекси!")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--posts', type=int, default=200_000, help="кількість синтетичних постів")
+    args = parser.parse_args()
+    asyncio.run(check_indexes(args.posts))
@@ -16,3 +16,73 @@ DB_CONFIG = {
     'password': os.getenv('DB_PASSWORD', 'danilus15'),
     'port': int(os.getenv('DB_PORT', 5432))
 }
+
+# Пул підключень до БД
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', 2))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 10))
+DB_POOL_ACQUIRE_TIMEOUT = float(os.getenv('DB_POOL_ACQUIRE_TIMEOUT', 10))
+DB_POOL_HEALTH_CHECK_INTERVAL = float(os.getenv('DB_POOL_HEALTH_CHECK_INTERVAL', 30))
+
+# Обмеження частоти постів: cooldown, sliding_window або token_bucket
+RATE_LIMIT_POLICY = os.getenv('RATE_LIMIT_POLICY', 'cooldown')
+RATE_LIMIT_BURST = int(os.getenv('RATE_LIMIT_BURST', 1))
+RATE_LIMIT_MAX_USERS = int(os.getenv('RATE_LIMIT_MAX_USERS', 100000))
+
+# Кількість заявок на одній сторінці черги модерації
+MODERATION_PAGE_SIZE = int(os.getenv('MODERATION_PAGE_SIZE', 10))
+
+# Кількість записів на одній сторінці історії модерації
+HISTORY_PAGE_SIZE = int(os.getenv('HISTORY_PAGE_SIZE', 20))
+
+# Масова модерація: скільки сповіщень авторам надсилається одночасно
+BULK_NOTIFY_CONCURRENCY = int(os.getenv('BULK_NOTIFY_CONCURRENCY', 5))
+
+# Ліміти вихідних повідомлень Telegram: глобальний, особистий чат, група/канал
+SEND_GLOBAL_RATE = float(os.getenv('SEND_GLOBAL_RATE', 30))
+SEND_PRIVATE_CHAT_RATE = float(os.getenv('SEND_PRIVATE_CHAT_RATE', 1))
+SEND_PRIVATE_CHAT_BURST = int(os.getenv('SEND_PRIVATE_CHAT_BURST', 3))
+SEND_GROUP_CHAT_PER_MINUTE = float(os.getenv('SEND_GROUP_CHAT_PER_MINUTE', 20))
+SEND_GROUP_CHAT_BURST = int(os.getenv('SEND_GROUP_CHAT_BURST', 3))
+SEND_MAX_RETRIES = int(os.getenv('SEND_MAX_RETRIES', 5))
+
+# Збирання альбомів: скільки незавершених альбомів тримати, скільки секунд на один альбом,
+# як часто (с) писати в лог статистику альбомів (0 — не писати)
+ALBUM_MAX_PENDING = int(os.getenv('ALBUM_MAX_PENDING', 10000))
+ALBUM_TTL = float(os.getenv('ALBUM_TTL', 30))
+ALBUM_STATS_INTERVAL = float(os.getenv('ALBUM_STATS_INTERVAL', 300))
+
+# Стан FSM у PostgreSQL: розмір кешу сесій, TTL неактивної сесії (с), інтервал запису (с)
+FSM_CACHE_SIZE = int(os.getenv('FSM_CACHE_SIZE', 50000))
+FSM_SESSION_TTL = float(os.getenv('FSM_SESSION_TTL', 7 * 24 * 3600))
+FSM_FLUSH_INTERVAL = float(os.getenv('FSM_FLUSH_INTERVAL', 0.5))
+
+# Отримання оновлень: polling або webhook
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+WEBHOOK_BASE_URL = os.getenv('WEBHOOK_BASE_URL')  # публічна адреса балансувальника; без неї set_webhook не викликається
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', 8080))
+WEBHOOK_QUEUE_SIZE = int(os.getenv('WEBHOOK_QUEUE_SIZE', 1000))
+WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', 16))
+
+# Скільки секунд заявка лишається за модератором, який її взяв у роботу
+MODERATION_LEASE_SECONDS = float(os.getenv('MODERATION_LEASE_SECONDS', 600))
+
+# Черга публікації: кількість воркерів, спроб на пост, оренда задачі (с), резервне опитування (с)
+PUBLISH_WORKERS = int(os.getenv('PUBLISH_WORKERS', 4))
+PUBLISH_MAX_ATTEMPTS = int(os.getenv('PUBLISH_MAX_ATTEMPTS', 5))
+PUBLISH_JOB_LEASE_SECONDS = float(os.getenv('PUBLISH_JOB_LEASE_SECONDS', 120))
+PUBLISH_POLL_INTERVAL = float(os.getenv('PUBLISH_POLL_INTERVAL', 60))
+
+# Секції posts: скільки місяців створювати наперед, скільки місяців зберігати (0 — всі),
+# абсолютний шлях для архіву старих секцій (порожньо — лише від'єднати без архіву і видалення)
+POSTS_PARTITIONS_AHEAD = int(os.getenv('POSTS_PARTITIONS_AHEAD', 3))
+POSTS_RETENTION_MONTHS = int(os.getenv('POSTS_RETENTION_MONTHS', 0))
+POSTS_ARCHIVE_DIR = os.getenv('POSTS_ARCHIVE_DIR', '')
+
+# Слоти відкладеної публікації (час доби через кому); порожньо — кнопки «У слот» немає
+PUBLISH_SLOTS = os.getenv('PUBLISH_SLOTS', '09:00,12:00,15:00,18:00,21:00')
+
+# Видалення каналу: cascade — разом з усіма заявками, soft — приховати канал, зберігши історію
+CHANNEL_DELETE_MODE = os.getenv('CHANNEL_DELETE_MODE', 'cascade')
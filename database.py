@@ -1,146 +1,173 @@
-import psycopg2
+import asyncio
+from psycopg2 import sql
 from psycopg2.extras import RealDictCursor
+import csv
+import gzip
 import json
+import os
+import time
 from datetime import datetime
-from config import DB_CONFIG
+from config import (
+    DB_CONFIG, DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE,
+    DB_POOL_ACQUIRE_TIMEOUT, DB_POOL_HEALTH_CHECK_INTERVAL, CHANNEL_DELETE_MODE
+)
+from db_pool import ConnectionPool, NotificationListener
+from db_migrations import migrate as migrate_schema
+from queries import QUERIES, POST_MESSAGE_SQL, POST_CHANNEL_SQL
+
+# Канал LISTEN/NOTIFY для інвалідації кешу налаштувань між процесами
+SETTINGS_CHANNEL = 'settings_changed'
+# Канал NOTIFY про нові задачі публікації (будить воркерів без опитування)
+PUBLISH_JOBS_CHANNEL = 'publish_jobs'
+
+# Ключ advisory lock: архівацію секцій posts виконує лише один процес бота
+RETENTION_LOCK_KEY = 0x706F73747265
+
+# channels.id за назвою каналу, яку передають обробники
+CHANNEL_REF_SQL = "(SELECT id FROM channels WHERE channel_name = %s)"
+
+HISTORY_EXPORT_COLUMNS = ('id', 'user_id', 'username', 'channel', 'status', 'created_at', 'processed_at', 'text')
+
+def write_history(rows, f, fmt: str) -> int:
+    """Записати рядки історії у відкритий файл як csv або jsonl"""
+    count = 0
+    if fmt == 'csv':
+        writer = csv.writer(f)
+        writer.writerow(HISTORY_EXPORT_COLUMNS)
+    for row in rows:
+        values = [row[column] for column in HISTORY_EXPORT_COLUMNS]
+        values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+        if fmt == 'csv':
+            writer.writerow(values)
+        else:
+            f.write(json.dumps(dict(zip(HISTORY_EXPORT_COLUMNS, values)), ensure_ascii=False) + '\n')
+        count += 1
+    return count
 
 class Database:
-    def __init__(self):
-        self.conn = None
-        self.connect()
+    def __init__(self, dsn: dict = None):
+        self.dsn = dsn or DB_CONFIG
+        self.pool = None
+        self.listener = None
+        # Курсор для всіх запитів через run (інструменти заміряють запити власним)
+        self.cursor_factory = RealDictCursor
+        self._spam_settings = None
+        self._settings_generation = 0
     
-    def connect(self):
+    async def connect(self):
+        if self.pool is not None:
+            return
         try:
-            self.conn = psycopg2.connect(**DB_CONFIG)
-            self.conn.autocommit = True
+            pool = ConnectionPool(
+                self.dsn,
+                min_size=DB_POOL_MIN_SIZE,
+                max_size=DB_POOL_MAX_SIZE,
+                acquire_timeout=DB_POOL_ACQUIRE_TIMEOUT,
+                health_check_interval=DB_POOL_HEALTH_CHECK_INTERVAL
+            )
+            await asyncio.to_thread(pool.open)
+            self.pool = pool
         except Exception as e:
             print(f"Помилка підключення до БД: {e}")
             raise
     
-    def get_cursor(self):
-        if self.conn is None or self.conn.closed:
-            self.connect()
-        return self.conn.cursor(cursor_factory=RealDictCursor)
+    def _get_listener(self) -> NotificationListener:
+        if self.listener is None:
+            self.listener = NotificationListener(self.dsn)
+            self.listener.subscribe(SETTINGS_CHANNEL, self._on_settings_changed)
+        return self.listener
     
-    async def create_tables(self):
-        cursor = self.get_cursor()
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS channels (
-                id SERIAL PRIMARY KEY,
-                channel_name VARCHAR(255) UNIQUE NOT NULL,
-                channel_id VARCHAR(255) NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                user_id BIGINT PRIMARY KEY,
-                username VARCHAR(255),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS admins (
-                user_id BIGINT PRIMARY KEY,
-                username VARCHAR(255),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS posts (
-                id SERIAL PRIMARY KEY,
-                user_id BIGINT NOT NULL,
-                username VARCHAR(255),
-                channel VARCHAR(255) NOT NULL,
-                message_data JSONB NOT NULL,
-                status VARCHAR(50) DEFAULT 'pending',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                processed_at TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(user_id)
-            )
-        """)
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS channel_mappings (
-                id SERIAL PRIMARY KEY,
-                channel_name VARCHAR(255) UNIQUE NOT NULL,
-                channel_id VARCHAR(255) NOT NULL,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS settings (
-                key VARCHAR(255) PRIMARY KEY,
-                value TEXT NOT NULL,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_posts_status 
-            ON posts(status)
-        """)
-        
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_posts_user_id 
-            ON posts(user_id)
-        """)
-        
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_posts_channel 
-            ON posts(channel)
-        """)
-        
-        # Видаляємо стару таблицю settings якщо вона є
-        cursor.execute("DROP TABLE IF EXISTS settings")
-        
-        # Створюємо нову таблицю settings
-        cursor.execute("""
-            CREATE TABLE settings (
-                setting_key VARCHAR(255) PRIMARY KEY,
-                setting_value TEXT NOT NULL,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Додаємо дефолтні налаштування
-        cursor.execute("""
-            INSERT INTO settings (setting_key, setting_value)
-            VALUES ('spam_protection_enabled', 'true')
-        """)
+    def subscribe(self, channel: str, handler):
+        """Підписатися на канал NOTIFY; викликати до start_listener"""
+        self._get_listener().subscribe(channel, handler)
+    
+    async def start_listener(self):
+        """Слухати зміни налаштувань від інших процесів бота"""
+        await self._get_listener().start()
+    
+    def _on_settings_changed(self, payload=None):
+        self._settings_generation += 1
+        self._spam_settings = None
+    
+    async def close(self):
+        if self.listener is not None:
+            await self.listener.stop()
+            self.listener = None
+        if self.pool is not None:
+            pool, self.pool = self.pool, None
+            await asyncio.to_thread(pool.close)
+    
+    async def run(self, fn, *args):
+        """Виконати fn(cursor, *args) на підключенні з пулу"""
+        if self.pool is None:
+            await self.connect()
         
-        cursor.execute("""
-            INSERT INTO settings (setting_key, setting_value)
-            VALUES ('spam_protection_minutes', '15')
-        """)
+        def job(conn):
+            with conn.cursor(cursor_factory=self.cursor_factory) as cursor:
+                return fn(cursor, *args)
         
-        cursor.close()
-        print("✅ Таблиці створено успішно!")
+        return await self.pool.run(job)
+    
+    async def execute(self, query: str, params=None) -> int:
+        """Виконати запит і повернути кількість змінених рядків"""
+        def job(cursor):
+            cursor.execute(query, params)
+            return cursor.rowcount
+        return await self.run(job)
+    
+    async def fetchone(self, query: str, params=None):
+        def job(cursor):
+            cursor.execute(query, params)
+            return cursor.fetchone()
+        return await self.run(job)
     
-    def add_user(self, user_id: int, username: str):
-        cursor = self.get_cursor()
+    async def fetchall(self, query: str, params=None):
+        def job(cursor):
+            cursor.execute(query, params)
+            return cursor.fetchall()
+        return await self.run(job)
+    
+    async def execute_named(self, name: str, params: tuple = ()) -> int:
+        """Виконати підготовлений запит з реєстру queries.py"""
+        def job(cursor):
+            QUERIES.execute(cursor, name, params)
+            return cursor.rowcount
+        return await self.run(job)
+    
+    async def fetchone_named(self, name: str, params: tuple = ()):
+        def job(cursor):
+            QUERIES.execute(cursor, name, params)
+            return cursor.fetchone()
+        return await self.run(job)
+    
+    async def fetchall_named(self, name: str, params: tuple = ()):
+        def job(cursor):
+            QUERIES.execute(cursor, name, params)
+            return cursor.fetchall()
+        return await self.run(job)
+    
+    def query_stats(self) -> list:
+        """Лічильники підготовлених запитів, найдорожчі спочатку"""
+        return QUERIES.stats()
+    
+    async def migrate(self):
+        """Застосувати нові міграції схеми (див. db_migrations.py)"""
+        if self.pool is None:
+            await self.connect()
+        applied = await self.pool.run(migrate_schema)
+        if applied:
+            print(f"✅ Застосовано міграції: {', '.join(f'{v:03d}' for v in applied)}")
+        return applied
+    
+    async def add_user(self, user_id: int, username: str):
         try:
-            cursor.execute("""
-                INSERT INTO users (user_id, username) 
-                VALUES (%s, %s) 
-                ON CONFLICT (user_id) DO UPDATE 
-                SET username = EXCLUDED.username
-            """, (user_id, username))
+            await self.execute_named('add_user', (user_id, username))
         except Exception as e:
             print(f"Помилка додавання користувача: {e}")
-        finally:
-            cursor.close()
     
-    def add_admin(self, user_id: int, username: str):
-        cursor = self.get_cursor()
+    async def add_admin(self, user_id: int, username: str):
         try:
-            cursor.execute("""
+            await self.execute("""
                 INSERT INTO admins (user_id, username) 
                 VALUES (%s, %s) 
                 ON CONFLICT (user_id) DO UPDATE 
@@ -148,54 +175,81 @@ class Database:
             """, (user_id, username))
         except Exception as e:
             print(f"Помилка додавання адміна: {e}")
-        finally:
-            cursor.close()
     
-    def is_admin(self, user_id: int) -> bool:
+    async def is_admin(self, user_id: int) -> bool:
         """Перевірка чи користувач є адміном"""
-        cursor = self.get_cursor()
         try:
-            cursor.execute("""
-                SELECT EXISTS(
-                    SELECT 1 FROM admins WHERE user_id = %s
-                )
-            """, (user_id,))
-            result = cursor.fetchone()
+            result = await self.fetchone_named('is_admin', (user_id,))
             return result['exists'] if result else False
         except Exception as e:
             print(f"Помилка перевірки адміна: {e}")
             return False
-        finally:
-            cursor.close()
     
-    def add_post(self, user_id: int, username: str, channel: str, message_data: dict) -> int:
-        cursor = self.get_cursor()
+    @staticmethod
+    def _media_params(message: dict) -> tuple:
+        """Текст і паралельні масиви медіа: типи, file_id, file_unique_id"""
+        media = message.get('media') or []
+        return (
+            message.get('text') or None,
+            [item['type'] for item in media],
+            [item['file_id'] for item in media],
+            [item.get('file_unique_id') for item in media],
+        )
+    
+    async def add_post(self, user_id: int, username: str, channel: str, message: dict) -> int:
+        """message — {'text': ..., 'media': [{'type', 'file_id', 'file_unique_id'}, ...]}.
+        Повертає 0, якщо канал не знайдено (перейменовано чи видалено) або сталася помилка."""
         try:
-            cursor.execute("""
-                INSERT INTO posts (user_id, username, channel, message_data, status) 
-                VALUES (%s, %s, %s, %s, 'pending')
-                RETURNING id
-            """, (user_id, username, channel, json.dumps(message_data)))
+            result = await self.fetchone_named(
+                'add_post', (user_id, username, channel, *self._media_params(message))
+            )
             
-            result = cursor.fetchone()
+            if not result:
+                print(f"Пост не додано: канал '{channel}' не знайдено")
+                return 0
             return result['id']
         except Exception as e:
             print(f"Помилка додавання поста: {e}")
             return 0
-        finally:
-            cursor.close()
     
-    def get_pending_posts(self):
-        cursor = self.get_cursor()
+    async def add_post_rate_limited(self, user_id: int, username: str, channel: str,
+                                    message: dict, cooldown_seconds: float) -> dict:
+        """Додати пост, якщо з останнього посту користувача минуло cooldown_seconds.
+        
+        Перевірка і вставка - один запит: рядок користувача блокується через
+        ON CONFLICT DO UPDATE, тому паралельні підтвердження не проходять обидва.
+        Повертає {'post_id': id або 0, 'retry_after': секунди очікування,
+        'channel_missing': True, якщо канал перейменовано чи видалено,
+        'error': True, якщо запит не виконано}.
+        """
         try:
-            cursor.execute("""
-                SELECT id, user_id, username, channel, message_data, created_at
-                FROM posts 
-                WHERE status = 'pending'
-                ORDER BY created_at ASC
+            row = await self.fetchone_named(
+                'add_post_rate_limited',
+                (user_id, username, channel, *self._media_params(message), cooldown_seconds)
+            )
+        except Exception as e:
+            print(f"Помилка додавання поста: {e}")
+            return {'post_id': 0, 'retry_after': 0.0, 'channel_missing': False, 'error': True}
+        
+        if row['channel_missing']:
+            return {'post_id': 0, 'retry_after': 0.0, 'channel_missing': True, 'error': False}
+        if row['post_id']:
+            return {'post_id': row['post_id'], 'retry_after': 0.0, 'channel_missing': False, 'error': False}
+        retry_after = float(row['retry_after'] or 0)
+        # Відмовлено через паралельний пост, якого ще не видно в знімку запиту
+        if retry_after <= 0:
+            retry_after = float(cooldown_seconds)
+        return {'post_id': 0, 'retry_after': retry_after, 'channel_missing': False, 'error': False}
+    
+    async def get_pending_posts(self):
+        try:
+            rows = await self.fetchall(f"""
+                SELECT p.id, p.user_id, p.username, {POST_CHANNEL_SQL}, {POST_MESSAGE_SQL}, p.created_at
+                FROM posts p
+                WHERE p.status = 'pending'
+                ORDER BY p.created_at ASC
             """)
             
-            rows = cursor.fetchall()
             result = []
             for row in rows:
                 result.append((
@@ -203,28 +257,24 @@ class Database:
                     row['user_id'],
                     row['username'],
                     row['channel'],
-                    row['message_data'],
+                    row['message'],
                     row['created_at'].strftime('%Y-%m-%d %H:%M:%S')
                 ))
             return result
         except Exception as e:
             print(f"Помилка отримання заявок: {e}")
             return []
-        finally:
-            cursor.close()
     
-    def get_pending_posts_by_channel(self, channel: str):
+    async def get_pending_posts_by_channel(self, channel: str):
         """Отримати заявки тільки для конкретного каналу"""
-        cursor = self.get_cursor()
         try:
-            cursor.execute("""
-                SELECT id, user_id, username, channel, message_data, created_at
-                FROM posts 
-                WHERE status = 'pending' AND channel = %s
-                ORDER BY created_at ASC
+            rows = await self.fetchall(f"""
+                SELECT p.id, p.user_id, p.username, {POST_CHANNEL_SQL}, {POST_MESSAGE_SQL}, p.created_at
+                FROM posts p
+                WHERE p.status = 'pending' AND p.channel_ref = {CHANNEL_REF_SQL}
+                ORDER BY p.created_at ASC
             """, (channel,))
             
-            rows = cursor.fetchall()
             result = []
             for row in rows:
                 result.append((
@@ -232,88 +282,439 @@ class Database:
                     row['user_id'],
                     row['username'],
                     row['channel'],
-                    row['message_data'],
+                    row['message'],
                     row['created_at'].strftime('%Y-%m-%d %H:%M:%S')
                 ))
             return result
         except Exception as e:
             print(f"Помилка отримання заявок по каналу: {e}")
             return []
-        finally:
-            cursor.close()
     
-    def get_channels_with_pending_posts(self):
-        """Отримати список каналів, які мають заявки на модерацію"""
-        cursor = self.get_cursor()
+    async def count_pending_posts(self, channel: str) -> int:
+        """Кількість заявок на модерацію для каналу"""
         try:
-            cursor.execute("""
-                SELECT DISTINCT channel
-                FROM posts 
-                WHERE status = 'pending'
-                ORDER BY channel
+            row = await self.fetchone_named('count_pending_posts', (channel,))
+            return row['pending'] if row else 0
+        except Exception as e:
+            print(f"Помилка підрахунку заявок: {e}")
+            return 0
+    
+    async def get_pending_counts(self) -> dict:
+        """Канали, які мають заявки на модерацію, з кількістю заявок"""
+        try:
+            rows = await self.fetchall("""
+                SELECT c.channel_name AS channel, n.pending
+                FROM channel_post_counts n
+                JOIN channels c ON c.id = n.channel_ref
+                WHERE n.pending > 0 AND c.deleted_at IS NULL
+                ORDER BY c.channel_name
             """)
-            
-            rows = cursor.fetchall()
-            return [row['channel'] for row in rows]
+            return {row['channel']: row['pending'] for row in rows}
         except Exception as e:
             print(f"Помилка отримання каналів з заявками: {e}")
-            return []
-        finally:
-            cursor.close()
+            return {}
     
-    def get_post_by_id(self, post_id: int):
-        cursor = self.get_cursor()
+    async def get_channel_counts(self) -> dict:
+        """Кількість заявок кожного каналу за статусами"""
         try:
-            cursor.execute("""
-                SELECT id, user_id, username, channel, message_data, created_at
-                FROM posts 
-                WHERE id = %s
-            """, (post_id,))
+            rows = await self.fetchall("""
+                SELECT c.channel_name AS channel, n.pending, n.approved, n.rejected, n.total
+                FROM channel_post_counts n
+                JOIN channels c ON c.id = n.channel_ref
+                WHERE c.deleted_at IS NULL
+            """)
+            return {row['channel']: row for row in rows}
+        except Exception as e:
+            print(f"Помилка отримання статистики каналів: {e}")
+            return {}
+    
+    async def get_channels_with_pending_posts(self):
+        """Отримати список каналів, які мають заявки на модерацію"""
+        return list(await self.get_pending_counts())
+    
+    async def get_post_by_id(self, post_id: int):
+        try:
+            row = await self.fetchone_named('get_post_by_id', (post_id,))
             
-            row = cursor.fetchone()
             if row:
                 return (
                     row['id'],
                     row['user_id'],
                     row['username'],
                     row['channel'],
-                    row['message_data'],
+                    row['message'],
                     row['created_at'].strftime('%Y-%m-%d %H:%M:%S')
                 )
             return None
         except Exception as e:
             print(f"Помилка отримання поста: {e}")
             return None
-        finally:
-            cursor.close()
     
-    def update_post_status(self, post_id: int, status: str):
-        cursor = self.get_cursor()
+    async def transition_post_status(self, post_id: int, status: str, owner: str = None):
+        """Атомарно перевести заявку pending → status одним запитом.
+        Повертає id, user_id і channel, або None,
+        якщо заявку вже оброблено чи її орендував інший модератор."""
         try:
-            cursor.execute("""
+            return await self.fetchone_named('transition_post_status', (status, post_id, owner))
+        except Exception as e:
+            print(f"Помилка зміни статусу: {e}")
+            return None
+    
+    @staticmethod
+    def _post_tuple(row):
+        return (
+            row['id'],
+            row['user_id'],
+            row['username'],
+            row['channel'],
+            row['message'],
+            row['created_at'].strftime('%Y-%m-%d %H:%M:%S')
+        )
+    
+    async def claim_pending_posts(self, channel: str, limit: int, owner: str, lease_seconds: float):
+        """Взяти в оренду до limit найстаріших вільних заявок каналу.
+        Заявки, орендовані іншими (і ще не прострочені), пропускаються без очікування,
+        тож паралельні модератори і воркери отримують неперетинні пачки."""
+        try:
+            rows = await self.fetchall(f"""
+                WITH claimable AS (
+                    SELECT id FROM posts
+                    WHERE status = 'pending' AND channel_ref = {CHANNEL_REF_SQL}
+                      AND (claimed_until IS NULL OR claimed_until < LOCALTIMESTAMP)
+                    ORDER BY created_at ASC, id ASC
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                UPDATE posts p
+                SET claimed_by = %s, claimed_until = LOCALTIMESTAMP + make_interval(secs => %s)
+                FROM claimable c
+                WHERE p.id = c.id
+                RETURNING p.id, p.user_id, p.username, {POST_CHANNEL_SQL}, {POST_MESSAGE_SQL}, p.created_at
+            """, (channel, limit, owner, lease_seconds))
+            rows.sort(key=lambda row: (row['created_at'], row['id']))
+            return [self._post_tuple(row) for row in rows]
+        except Exception as e:
+            print(f"Помилка оренди заявок: {e}")
+            return []
+    
+    async def has_claimable_posts(self, channel: str) -> bool:
+        """Чи є в каналі вільні заявки, які ще можна взяти в оренду (для кнопки «далі»)"""
+        try:
+            row = await self.fetchone(f"""
+                SELECT EXISTS(
+                    SELECT 1 FROM posts
+                    WHERE status = 'pending' AND channel_ref = {CHANNEL_REF_SQL}
+                      AND (claimed_until IS NULL OR claimed_until < LOCALTIMESTAMP)
+                ) AS found
+            """, (channel,))
+            return row['found']
+        except Exception as e:
+            print(f"Помилка перевірки черги модерації: {e}")
+            return False
+    
+    async def claim_posts_by_ids(self, post_ids: list, owner: str, lease_seconds: float):
+        """Взяти в оренду (або продовжити власну) заявки з переданими ID.
+        Повертає лише ті, що ще на модерації і не орендовані іншими."""
+        if not post_ids:
+            return []
+        try:
+            rows = await self.fetchall(f"""
+                WITH claimable AS (
+                    SELECT id FROM posts
+                    WHERE id = ANY(%s) AND status = 'pending'
+                      AND (claimed_until IS NULL OR claimed_until < LOCALTIMESTAMP OR claimed_by = %s)
+                    FOR UPDATE SKIP LOCKED
+                )
+                UPDATE posts p
+                SET claimed_by = %s, claimed_until = LOCALTIMESTAMP + make_interval(secs => %s)
+                FROM claimable c
+                WHERE p.id = c.id
+                RETURNING p.id, p.user_id, p.username, {POST_CHANNEL_SQL}, {POST_MESSAGE_SQL}, p.created_at
+            """, (list(post_ids), owner, owner, lease_seconds))
+            rows.sort(key=lambda row: (row['created_at'], row['id']))
+            return [self._post_tuple(row) for row in rows]
+        except Exception as e:
+            print(f"Помилка оренди заявок за ID: {e}")
+            return []
+    
+    async def release_claims(self, owner: str) -> int:
+        """Повернути в чергу всі заявки, орендовані owner"""
+        try:
+            return await self.execute("""
                 UPDATE posts 
-                SET status = %s, processed_at = CURRENT_TIMESTAMP
-                WHERE id = %s
-            """, (status, post_id))
+                SET claimed_by = NULL, claimed_until = NULL
+                WHERE claimed_by = %s AND status = 'pending'
+            """, (owner,))
         except Exception as e:
-            print(f"Помилка оновлення статусу: {e}")
-        finally:
-            cursor.close()
+            print(f"Помилка звільнення заявок: {e}")
+            return 0
     
-    def get_posts_history(self, limit: int = 20):
-        cursor = self.get_cursor()
+    async def set_posts_status(self, post_ids: list, status: str, owner: str = None):
+        """Змінити статус кількох заявок одним запитом.
+        Змінюються лише ті, що ще на модерації і не орендовані іншим (owner — свої);
+        повертає їх id, user_id, channel."""
+        if not post_ids:
+            return []
         try:
-            cursor.execute("""
-                SELECT id, username, channel, status, created_at, processed_at
-                FROM posts 
-                WHERE status IN ('approved', 'rejected')
-                ORDER BY processed_at DESC
+            return await self.fetchall(f"""
+                UPDATE posts p
+                SET status = %s, processed_at = CURRENT_TIMESTAMP,
+                    claimed_by = NULL, claimed_until = NULL
+                WHERE id = ANY(%s) AND status = 'pending'
+                  AND (claimed_until IS NULL OR claimed_until < LOCALTIMESTAMP OR claimed_by = %s)
+                RETURNING p.id, p.user_id, {POST_CHANNEL_SQL}
+            """, (status, list(post_ids), owner))
+        except Exception as e:
+            print(f"Помилка масового оновлення статусу: {e}")
+            return []
+    
+    async def reject_channel_queue(self, channel: str, owner: str = None):
+        """Відхилити всі заявки каналу одним запитом, крім орендованих іншими;
+        повертає id, user_id, channel"""
+        try:
+            return await self.fetchall(f"""
+                UPDATE posts p
+                SET status = 'rejected', processed_at = CURRENT_TIMESTAMP,
+                    claimed_by = NULL, claimed_until = NULL
+                WHERE channel_ref = {CHANNEL_REF_SQL} AND status = 'pending'
+                  AND (claimed_until IS NULL OR claimed_until < LOCALTIMESTAMP OR claimed_by = %s)
+                RETURNING p.id, p.user_id, {POST_CHANNEL_SQL}
+            """, (channel, owner))
+        except Exception as e:
+            print(f"Помилка відхилення черги каналу: {e}")
+            return []
+    
+    def _approve_and_enqueue(self, cursor, condition: str, params: tuple, owner: str, delays: dict):
+        # Схвалення і постановка задач публікації — один запит; заявки без каналу в БД лишаються pending.
+        # delays: {post_id: секунд до публікації}; решта публікується одразу.
+        # NOTIFY несе затримку, щоб воркери поставили таймер саме на цей момент.
+        cursor.execute(f"""
+            WITH schedule AS (
+                SELECT * FROM unnest(%s::int[], %s::float8[]) AS s(post_id, delay)
+            ),
+            moved AS (
+                UPDATE posts p
+                SET status = 'approved', processed_at = CURRENT_TIMESTAMP,
+                    claimed_by = NULL, claimed_until = NULL,
+                    scheduled_at = LOCALTIMESTAMP + make_interval(
+                        secs => (SELECT s.delay FROM schedule s WHERE s.post_id = p.id))
+                FROM channels c
+                WHERE {condition} AND p.status = 'pending' AND c.id = p.channel_ref AND c.deleted_at IS NULL
+                  AND (p.claimed_until IS NULL OR p.claimed_until < LOCALTIMESTAMP OR p.claimed_by = %s)
+                RETURNING p.id, p.user_id, c.channel_name AS channel, p.created_at, p.scheduled_at, c.channel_id
+            ),
+            queued AS (
+                INSERT INTO publish_jobs (post_id, post_created_at, channel_id, scheduled_at, available_at)
+                SELECT id, created_at, channel_id, COALESCE(scheduled_at, LOCALTIMESTAMP), COALESCE(scheduled_at, LOCALTIMESTAMP)
+                FROM moved ORDER BY scheduled_at NULLS FIRST, created_at, id
+            )
+            SELECT m.id, m.user_id, m.channel, m.scheduled_at
+            FROM moved m CROSS JOIN LATERAL pg_notify(
+                %s, COALESCE(EXTRACT(EPOCH FROM m.scheduled_at - LOCALTIMESTAMP), 0)::text
+            ) AS n
+        """, (list(delays), list(delays.values())) + params + (owner, PUBLISH_JOBS_CHANNEL))
+        return cursor.fetchall()
+    
+    async def approve_posts(self, post_ids: list, owner: str = None, delays: dict = None):
+        """Схвалити заявки і поставити їх у чергу публікації (delays — відкладені);
+        повертає id, user_id, channel, scheduled_at"""
+        if not post_ids:
+            return []
+        try:
+            return await self.run(
+                self._approve_and_enqueue, "p.id = ANY(%s)", (list(post_ids),), owner, delays or {}
+            )
+        except Exception as e:
+            print(f"Помилка схвалення заявок: {e}")
+            return []
+    
+    async def approve_channel_queue(self, channel: str, owner: str = None):
+        """Схвалити всі заявки каналу, крім орендованих іншими, і поставити їх у чергу публікації"""
+        try:
+            return await self.run(self._approve_and_enqueue, "c.channel_name = %s", (channel,), owner, {})
+        except Exception as e:
+            print(f"Помилка схвалення черги каналу: {e}")
+            return []
+    
+    async def get_scheduled_delays(self, channel: str, horizon_seconds: float):
+        """Секунди до вже запланованих публікацій каналу в межах horizon_seconds"""
+        try:
+            rows = await self.fetchall(f"""
+                SELECT EXTRACT(EPOCH FROM scheduled_at - LOCALTIMESTAMP)::float8 AS delay
+                FROM posts
+                WHERE channel_ref = {CHANNEL_REF_SQL}
+                  AND scheduled_at BETWEEN LOCALTIMESTAMP AND LOCALTIMESTAMP + make_interval(secs => %s)
+            """, (channel, horizon_seconds))
+            return [row['delay'] for row in rows]
+        except Exception as e:
+            print(f"Помилка отримання запланованих публікацій: {e}")
+            return []
+    
+    async def get_upcoming_publish_delays(self, limit: int):
+        """Секунди до найближчих моментів, коли відкладені задачі публікації стануть готовими"""
+        try:
+            rows = await self.fetchall("""
+                SELECT EXTRACT(EPOCH FROM GREATEST(scheduled_at, available_at) - LOCALTIMESTAMP)::float8 AS delay
+                FROM publish_jobs
+                WHERE status = 'queued'
+                  AND (scheduled_at > LOCALTIMESTAMP OR available_at > LOCALTIMESTAMP)
+                ORDER BY scheduled_at
                 LIMIT %s
             """, (limit,))
+            return [row['delay'] for row in rows]
+        except Exception as e:
+            print(f"Помилка отримання запланованих задач: {e}")
+            return []
+    
+    async def claim_publish_jobs(self, worker: str, limit: int, lease_seconds: float):
+        """Взяти до limit задач публікації. З кожного каналу береться лише перша
+        незавершена задача (за часом публікації, потім за порядком схвалення),
+        тож пости в канал виходять по черзі. publish_jobs.channel_id — лише ключ
+        черги; адресу для надсилання беремо з channels на момент оренди, тож
+        зміна ID каналу діє і на вже поставлені задачі."""
+        try:
+            return await self.fetchall(f"""
+                WITH heads AS (
+                    SELECT DISTINCT ON (channel_id) id
+                    FROM publish_jobs
+                    WHERE status IN ('queued', 'running')
+                    ORDER BY channel_id, scheduled_at, id
+                ),
+                picked AS (
+                    SELECT j.id FROM publish_jobs j
+                    JOIN heads h ON h.id = j.id
+                    WHERE (j.status = 'queued' AND j.available_at <= LOCALTIMESTAMP
+                           AND j.scheduled_at <= LOCALTIMESTAMP)
+                       OR (j.status = 'running' AND j.locked_until < LOCALTIMESTAMP)
+                    ORDER BY j.scheduled_at, j.id
+                    LIMIT %s
+                    FOR UPDATE OF j SKIP LOCKED
+                )
+                UPDATE publish_jobs j
+                SET status = 'running', attempts = j.attempts + 1, locked_by = %s,
+                    locked_until = LOCALTIMESTAMP + make_interval(secs => %s)
+                FROM picked, posts p
+                JOIN channels c ON c.id = p.channel_ref
+                WHERE j.id = picked.id AND p.id = j.post_id AND p.created_at = j.post_created_at
+                RETURNING j.id, j.post_id, c.channel_id, j.attempts, p.user_id,
+                    c.channel_name AS channel, {POST_MESSAGE_SQL}
+            """, (limit, worker, lease_seconds))
+        except Exception as e:
+            print(f"Помилка отримання задач публікації: {e}")
+            return []
+    
+    async def renew_publish_job(self, job_id: int, worker: str, lease_seconds: float) -> bool:
+        """Продовжити оренду задачі, що виконується. False — задачу вже взяв інший
+        воркер або її скасовано; надсилання треба перервати."""
+        try:
+            return await self.execute("""
+                UPDATE publish_jobs
+                SET locked_until = LOCALTIMESTAMP + make_interval(secs => %s)
+                WHERE id = %s AND locked_by = %s AND status = 'running'
+            """, (lease_seconds, job_id, worker)) > 0
+        except Exception as e:
+            print(f"Помилка продовження оренди задачі публікації: {e}")
+            return False
+    
+    async def complete_publish_job(self, job_id: int, worker: str) -> bool:
+        try:
+            return await self.execute("""
+                UPDATE publish_jobs
+                SET status = 'done', finished_at = CURRENT_TIMESTAMP, locked_by = NULL, locked_until = NULL
+                WHERE id = %s AND locked_by = %s AND status = 'running'
+            """, (job_id, worker)) > 0
+        except Exception as e:
+            print(f"Помилка завершення задачі публікації: {e}")
+            return False
+    
+    async def fail_publish_job(self, job_id: int, worker: str, error: str,
+                               retry_in: float, max_attempts: int):
+        """Записати невдалу спробу: повтор через retry_in секунд або, після max_attempts,
+        dead-letter з поверненням заявки на модерацію. Повертає новий статус задачі."""
+        try:
+            row = await self.fetchone("""
+                WITH failed AS (
+                    UPDATE publish_jobs
+                    SET status = CASE WHEN attempts >= %(max_attempts)s THEN 'dead' ELSE 'queued' END,
+                        finished_at = CASE WHEN attempts >= %(max_attempts)s THEN CURRENT_TIMESTAMP END,
+                        available_at = LOCALTIMESTAMP + make_interval(secs => %(retry_in)s),
+                        last_error = %(error)s, locked_by = NULL, locked_until = NULL
+                    WHERE id = %(job_id)s AND locked_by = %(worker)s
+                    RETURNING post_id, post_created_at, status
+                ),
+                reverted AS (
+                    UPDATE posts SET status = 'pending', processed_at = NULL, scheduled_at = NULL
+                    FROM failed
+                    WHERE posts.id = failed.post_id AND posts.created_at = failed.post_created_at
+                      AND failed.status = 'dead' AND posts.status = 'approved'
+                )
+                SELECT f.status FROM failed f
+                CROSS JOIN LATERAL pg_notify(%(channel)s, %(retry_in)s::text) AS n
+            """, {'job_id': job_id, 'worker': worker, 'error': error[:1000],
+                  'retry_in': retry_in, 'max_attempts': max_attempts, 'channel': PUBLISH_JOBS_CHANNEL})
+            return row['status'] if row else None
+        except Exception as e:
+            print(f"Помилка запису невдалої публікації: {e}")
+            return None
+    
+    async def delete_finished_publish_jobs(self, older_than_seconds: float) -> int:
+        try:
+            return await self.execute("""
+                DELETE FROM publish_jobs
+                WHERE status = 'done' AND finished_at < LOCALTIMESTAMP - make_interval(secs => %s)
+            """, (older_than_seconds,))
+        except Exception as e:
+            print(f"Помилка видалення виконаних задач публікації: {e}")
+            return 0
+    
+    @staticmethod
+    def _history_conditions(filters: dict):
+        """WHERE для історії: filters — channel, status, user_id, date_from, date_to (включно),
+        media (photo або video)"""
+        conditions = ["status IN ('approved', 'rejected')", "processed_at IS NOT NULL"]
+        params = []
+        if filters.get('channel'):
+            conditions.append(f"channel_ref = {CHANNEL_REF_SQL}")
+            params.append(filters['channel'])
+        if filters.get('status'):
+            conditions.append("status = %s")
+            params.append(filters['status'])
+        if filters.get('user_id'):
+            conditions.append("user_id = %s")
+            params.append(filters['user_id'])
+        if filters.get('date_from'):
+            conditions.append("processed_at >= %s::date")
+            params.append(filters['date_from'])
+        if filters.get('date_to'):
+            conditions.append("processed_at < %s::date + 1")
+            params.append(filters['date_to'])
+        if filters.get('media'):
+            # Лише за post_id: з умовою і на created_at планувальник сильно занижує
+            # кількість збігів і замість проходу по індексу історії сканує обидві таблиці
+            conditions.append("""EXISTS (
+                SELECT 1 FROM post_media m WHERE m.post_id = p.id AND m.type = %s
+            )""")
+            params.append(filters['media'])
+        return " AND ".join(conditions), params
+    
+    async def get_posts_history(self, limit: int = 20, filters: dict = None, after: list = None):
+        """Сторінка історії, новіші спочатку. after — курсор попередньої сторінки.
+        Повертає (рядки, курсор наступної сторінки або None)."""
+        try:
+            where, params = self._history_conditions(filters or {})
+            if after:
+                where += " AND (processed_at, id) < (%s::timestamp, %s)"
+                params += list(after)
+            rows = await self.fetchall(f"""
+                SELECT id, username, {POST_CHANNEL_SQL}, status, created_at, processed_at
+                FROM posts p
+                WHERE {where}
+                ORDER BY processed_at DESC, id DESC
+                LIMIT %s
+            """, params + [limit + 1])
             
-            rows = cursor.fetchall()
             result = []
-            for row in rows:
+            for row in rows[:limit]:
                 result.append((
                     row['id'],
                     row['username'],
@@ -322,43 +723,117 @@ class Database:
                     row['created_at'].strftime('%Y-%m-%d %H:%M:%S'),
                     row['processed_at'].strftime('%Y-%m-%d %H:%M:%S') if row['processed_at'] else None
                 ))
-            return result
+            next_after = None
+            if len(rows) > limit:
+                last = rows[limit - 1]
+                next_after = [last['processed_at'].isoformat(), last['id']]
+            return result, next_after
         except Exception as e:
             print(f"Помилка отримання історії: {e}")
+            return [], None
+    
+    async def export_posts_history(self, path: str, fmt: str = 'csv', filters: dict = None,
+                                   batch_size: int = 2000) -> int:
+        """Записати історію у файл (csv або jsonl), повертає кількість рядків.
+        Рядки читаються серверним курсором пачками по batch_size, тож у пам'яті
+        бота ніколи не буває більше однієї пачки."""
+        where, params = self._history_conditions(filters or {})
+        query = f"""
+            SELECT id, user_id, username, {POST_CHANNEL_SQL}, status, created_at, processed_at,
+                   COALESCE(text, '') AS text
+            FROM posts p
+            WHERE {where}
+            ORDER BY processed_at DESC, id DESC
+        """
+        
+        def job(conn):
+            # Іменований курсор існує лише всередині транзакції
+            conn.autocommit = False
+            try:
+                with conn.cursor(name='history_export', cursor_factory=RealDictCursor) as cursor:
+                    cursor.itersize = batch_size
+                    cursor.execute(query, params)
+                    with open(path, 'w', encoding='utf-8', newline='') as f:
+                        count = write_history(cursor, f, fmt)
+                conn.commit()
+                return count
+            finally:
+                conn.rollback()
+                conn.autocommit = True
+        
+        try:
+            if self.pool is None:
+                await self.connect()
+            return await self.pool.run(job)
+        except Exception as e:
+            print(f"Помилка експорту історії: {e}")
+            return -1
+    
+    async def get_posts_with_media(self, media_type: str, limit: int = 20):
+        """Найновіші пости, що містять файл типу media_type (photo або video)"""
+        try:
+            return await self.fetchall(f"""
+                WITH found AS (
+                    SELECT DISTINCT post_created_at, post_id
+                    FROM post_media
+                    WHERE type = %s
+                    ORDER BY post_created_at DESC, post_id
+                    LIMIT %s
+                )
+                SELECT p.id, p.user_id, p.username, {POST_CHANNEL_SQL}, p.status, p.created_at
+                FROM found f
+                JOIN posts p ON p.id = f.post_id AND p.created_at = f.post_created_at
+                ORDER BY p.created_at DESC, p.id
+            """, (media_type, limit))
+        except Exception as e:
+            print(f"Помилка пошуку постів з медіа: {e}")
+            return []
+    
+    async def find_posts_with_files(self, file_unique_ids: list):
+        """Пости, в яких уже траплялися файли з переданими file_unique_id"""
+        if not file_unique_ids:
+            return []
+        try:
+            return await self.fetchall(f"""
+                SELECT m.file_unique_id, p.id, p.user_id, {POST_CHANNEL_SQL}, p.status, p.created_at
+                FROM post_media m
+                JOIN posts p ON p.id = m.post_id AND p.created_at = m.post_created_at
+                WHERE m.file_unique_id = ANY(%s)
+                ORDER BY p.created_at, p.id
+            """, (list(file_unique_ids),))
+        except Exception as e:
+            print(f"Помилка пошуку повторних файлів: {e}")
             return []
-        finally:
-            cursor.close()
     
-    def get_user_stats(self, user_id: int):
-        cursor = self.get_cursor()
+    async def get_duplicate_files(self, limit: int = 20):
+        """Файли, надіслані більш ніж в одному пості, найчастіші спочатку"""
         try:
-            cursor.execute("""
-                SELECT 
-                    COUNT(*) FILTER (WHERE status = 'pending') as pending,
-                    COUNT(*) FILTER (WHERE status = 'approved') as approved,
-                    COUNT(*) FILTER (WHERE status = 'rejected') as rejected
-                FROM posts 
-                WHERE user_id = %s
-            """, (user_id,))
-            
-            return cursor.fetchone()
+            return await self.fetchall("""
+                SELECT file_unique_id, COUNT(DISTINCT post_id) AS posts, MAX(post_created_at) AS last_at
+                FROM post_media
+                WHERE file_unique_id IS NOT NULL
+                GROUP BY file_unique_id
+                HAVING COUNT(DISTINCT post_id) > 1
+                ORDER BY posts DESC, last_at DESC
+                LIMIT %s
+            """, (limit,))
+        except Exception as e:
+            print(f"Помилка пошуку повторних файлів: {e}")
+            return []
+    
+    async def get_user_stats(self, user_id: int):
+        try:
+            row = await self.fetchone_named('get_user_stats', (user_id,))
+            return row or {'pending': 0, 'approved': 0, 'rejected': 0}
         except Exception as e:
             print(f"Помилка отримання статистики: {e}")
             return None
-        finally:
-            cursor.close()
     
-    def get_all_channels(self):
+    async def get_all_channels(self):
         """Отримати всі канали з БД"""
-        cursor = self.get_cursor()
         try:
-            cursor.execute("""
-                SELECT channel_name, channel_id
-                FROM channels
-                ORDER BY channel_name
-            """)
+            rows = await self.fetchall_named('get_all_channels')
             
-            rows = cursor.fetchall()
             channels = {}
             for row in rows:
                 channels[row['channel_name']] = row['channel_id']
@@ -366,153 +841,176 @@ class Database:
         except Exception as e:
             print(f"Помилка отримання каналів: {e}")
             return {}
-        finally:
-            cursor.close()
     
-    def add_channel(self, channel_name: str, channel_id: str):
-        """Додати новий канал"""
-        cursor = self.get_cursor()
+    async def add_channel(self, channel_name: str, channel_id: str):
+        """Додати новий канал. М'яко видалений канал з тією ж назвою відновлюється
+        разом зі своєю історією."""
         try:
-            cursor.execute("""
+            row = await self.fetchone("""
                 INSERT INTO channels (channel_name, channel_id)
                 VALUES (%s, %s)
+                ON CONFLICT (channel_name) DO UPDATE
+                SET channel_id = EXCLUDED.channel_id, deleted_at = NULL, updated_at = CURRENT_TIMESTAMP
+                WHERE channels.deleted_at IS NOT NULL
+                RETURNING id
             """, (channel_name, channel_id))
+            if not row:
+                print(f"Помилка додавання каналу: канал '{channel_name}' вже існує")
+                return False
             print(f"✅ Канал '{channel_name}' додано")
             return True
         except Exception as e:
             print(f"Помилка додавання каналу: {e}")
             return False
-        finally:
-            cursor.close()
     
-    def delete_channel(self, channel_name: str):
-        """Видалити канал та всі його заявки"""
-        cursor = self.get_cursor()
-        try:
-            # Спочатку видаляємо всі заявки для цього каналу
-            cursor.execute("""
-                DELETE FROM posts
-                WHERE channel = %s
-            """, (channel_name,))
-            deleted_posts = cursor.rowcount
+    async def delete_channel(self, channel_name: str, soft: bool = None):
+        """Видалити канал. Жорстко (CHANNEL_DELETE_MODE=cascade) — разом з усіма
+        заявками каскадом через posts.channel_ref; м'яко (soft) — канал ховається,
+        історія лишається, а заявки на модерації та схвалені, але ще не
+        опубліковані, відхиляються разом зі своїми задачами публікації (воркер, що
+        саме надсилає пост, втрачає оренду і перериває надсилання). Обидва
+        варіанти блокують лише рядки каналу."""
+        if soft is None:
+            soft = CHANNEL_DELETE_MODE == 'soft'
+        
+        def job(cursor):
+            if not soft:
+                cursor.execute("""
+                    SELECT pending, total FROM channel_post_counts
+                    WHERE channel_ref = (SELECT id FROM channels WHERE channel_name = %s)
+                """, (channel_name,))
+                counts = cursor.fetchone()
+                cursor.execute("DELETE FROM channels WHERE channel_name = %s", (channel_name,))
+                return counts['total'] if counts else 0
             
-            # Потім видаляємо сам канал
             cursor.execute("""
-                DELETE FROM channels
-                WHERE channel_name = %s
+                WITH deleted AS (
+                    UPDATE channels
+                    SET deleted_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+                    WHERE channel_name = %s AND deleted_at IS NULL
+                    RETURNING id, channel_id
+                ), cancelled AS (
+                    UPDATE publish_jobs j
+                    SET status = 'dead', last_error = 'Канал видалено', finished_at = CURRENT_TIMESTAMP,
+                        locked_by = NULL, locked_until = NULL
+                    FROM deleted d, posts p
+                    WHERE j.channel_id = d.channel_id AND j.status IN ('queued', 'running')
+                      AND p.id = j.post_id AND p.created_at = j.post_created_at AND p.channel_ref = d.id
+                    RETURNING j.post_id, j.post_created_at
+                )
+                UPDATE posts p
+                SET status = 'rejected', processed_at = CURRENT_TIMESTAMP, scheduled_at = NULL,
+                    claimed_by = NULL, claimed_until = NULL
+                FROM deleted d
+                WHERE p.channel_ref = d.id
+                  AND (p.status = 'pending'
+                       OR (p.status = 'approved'
+                           AND (p.id, p.created_at) IN (SELECT post_id, post_created_at FROM cancelled)))
             """, (channel_name,))
-            
-            print(f"✅ Канал '{channel_name}' видалено (видалено {deleted_posts} заявок)")
+            return cursor.rowcount
+        
+        try:
+            affected = await self.run(job)
+            if soft:
+                print(f"✅ Канал '{channel_name}' приховано (відхилено {affected} заявок)")
+            else:
+                print(f"✅ Канал '{channel_name}' видалено (видалено {affected} заявок)")
             return True
         except Exception as e:
             print(f"Помилка видалення каналу: {e}")
             return False
-        finally:
-            cursor.close()
     
-    def update_channel(self, channel_name: str, new_channel_id: str):
-        """Оновити ID каналу"""
-        cursor = self.get_cursor()
+    async def update_channel(self, channel_name: str, new_channel_id: str):
+        """Оновити ID каналу. Незавершені задачі публікації переходять у чергу
+        нового ID, щоб пости каналу й надалі виходили по одному"""
         try:
-            cursor.execute("""
-                UPDATE channels 
-                SET channel_id = %s, updated_at = CURRENT_TIMESTAMP
-                WHERE channel_name = %s
-            """, (new_channel_id, channel_name))
+            await self.execute("""
+                WITH old AS (
+                    SELECT id, channel_id FROM channels WHERE channel_name = %(name)s
+                ), updated AS (
+                    UPDATE channels
+                    SET channel_id = %(channel_id)s, updated_at = CURRENT_TIMESTAMP
+                    FROM old
+                    WHERE channels.id = old.id
+                )
+                UPDATE publish_jobs j
+                SET channel_id = %(channel_id)s
+                FROM old, posts p
+                WHERE j.channel_id = old.channel_id AND j.status IN ('queued', 'running')
+                  AND p.id = j.post_id AND p.created_at = j.post_created_at AND p.channel_ref = old.id
+            """, {'name': channel_name, 'channel_id': new_channel_id})
             print(f"✅ ID каналу '{channel_name}' оновлено на '{new_channel_id}'")
             return True
         except Exception as e:
             print(f"Помилка оновлення ID каналу: {e}")
             return False
-        finally:
-            cursor.close()
     
-    def get_channel_mapping(self, channel_name: str):
+    async def get_channel_mapping(self, channel_name: str):
         """Отримати актуальне посилання на канал"""
-        cursor = self.get_cursor()
         try:
-            cursor.execute("""
+            row = await self.fetchone("""
                 SELECT channel_id
                 FROM channel_mappings 
                 WHERE channel_name = %s
             """, (channel_name,))
             
-            row = cursor.fetchone()
             return row['channel_id'] if row else None
         except Exception as e:
             print(f"Помилка отримання маппінгу каналу: {e}")
             return None
-        finally:
-            cursor.close()
     
-    def get_last_post_time(self, user_id: int):
+    async def get_last_post_time(self, user_id: int):
         """Отримати час останнього посту користувача"""
-        cursor = self.get_cursor()
         try:
-            cursor.execute("""
-                SELECT created_at
-                FROM posts 
-                WHERE user_id = %s
-                ORDER BY created_at DESC
-                LIMIT 1
-            """, (user_id,))
+            row = await self.fetchone_named('get_last_post_time', (user_id,))
             
-            row = cursor.fetchone()
             if row:
                 return row['created_at']
             return None
         except Exception as e:
             print(f"Помилка отримання часу останнього посту: {e}")
             return None
-        finally:
-            cursor.close()
     
-    def rename_channel(self, old_name: str, new_name: str):
-        """Перейменувати канал"""
-        cursor = self.get_cursor()
+    async def get_recent_post_times(self, window_seconds: float, per_user: int, user_id: int = None):
+        """Часи останніх постів (unix time) у межах вікна: {user_id: [час, ...]}"""
         try:
-            # Оновлюємо всі пости зі старою назвою на нову
-            cursor.execute("""
-                UPDATE posts 
-                SET channel = %s
-                WHERE channel = %s
-            """, (new_name, old_name))
+            rows = await self.fetchall_named('get_recent_post_times', (per_user, window_seconds, user_id))
             
-            # Оновлюємо назву в таблиці channels
-            cursor.execute("""
+            now = time.time()
+            return {row['user_id']: [now - float(age) for age in row['ages']] for row in rows}
+        except Exception as e:
+            print(f"Помилка отримання часу останніх постів: {e}")
+            return None
+    
+    async def rename_channel(self, old_name: str, new_name: str):
+        """Перейменувати канал: пости посилаються на channels.id, тож змінюється один рядок"""
+        try:
+            await self.execute("""
                 UPDATE channels 
                 SET channel_name = %s, updated_at = CURRENT_TIMESTAMP
                 WHERE channel_name = %s
             """, (new_name, old_name))
-            
             print(f"✅ Канал '{old_name}' перейменовано на '{new_name}'")
             return True
         except Exception as e:
             print(f"Помилка перейменування каналу: {e}")
             return False
-        finally:
-            cursor.close()
     
-    def get_setting(self, key: str, default=None):
+    async def get_setting(self, key: str, default=None):
         """Отримати налаштування з БД"""
-        cursor = self.get_cursor()
         try:
-            cursor.execute("""
+            row = await self.fetchone("""
                 SELECT value FROM settings WHERE key = %s
             """, (key,))
-            row = cursor.fetchone()
             return row['value'] if row else default
         except Exception as e:
             print(f"Помилка отримання налаштування {key}: {e}")
             return default
-        finally:
-            cursor.close()
     
-    def set_setting(self, key: str, value: str):
+    async def set_setting(self, key: str, value: str):
         """Зберегти налаштування в БД"""
-        cursor = self.get_cursor()
         try:
-            cursor.execute("""
+            await self.execute("""
                 INSERT INTO settings (key, value, updated_at)
                 VALUES (%s, %s, CURRENT_TIMESTAMP)
                 ON CONFLICT (key) DO UPDATE
@@ -522,89 +1020,248 @@ class Database:
         except Exception as e:
             print(f"Помилка збереження налаштування {key}: {e}")
             return False
-        finally:
-            cursor.close()
     
-    def get_spam_protection_settings(self):
+    async def get_spam_protection_settings(self):
         """Отримати налаштування захисту від спаму"""
-        enabled = self.get_setting('spam_protection_enabled', 'true')
-        delay = self.get_setting('post_delay_minutes', '15')
+        enabled = await self.get_setting('spam_protection_enabled', 'true')
+        delay = await self.get_setting('post_delay_minutes', '15')
         
         return {
             'enabled': enabled.lower() == 'true',
             'delay_minutes': int(delay)
         }
     
-    def set_spam_protection_enabled(self, enabled: bool):
-        """Увімкнути/вимкнути захист від спаму"""
-        return self.set_setting('spam_protection_enabled', 'true' if enabled else 'false')
-    
-    def set_post_delay_minutes(self, minutes: int):
+    async def set_post_delay_minutes(self, minutes: int):
         """Встановити затримку між постами (в хвилинах)"""
-        return self.set_setting('post_delay_minutes', str(minutes))
+        return await self.set_setting('post_delay_minutes', str(minutes))
     
-    def get_spam_settings(self):
-        """Отримати налаштування захисту від спаму"""
-        cursor = self.get_cursor()
+    async def get_spam_settings(self):
+        """Отримати налаштування захисту від спаму (з кешу, якщо він актуальний)"""
+        if self._spam_settings is not None:
+            return dict(self._spam_settings)
+        
+        generation = self._settings_generation
         try:
-            cursor.execute("""
-                SELECT setting_value 
-                FROM settings 
-                WHERE setting_key = 'spam_protection_enabled'
-            """)
-            row = cursor.fetchone()
-            enabled = row['setting_value'] == 'true' if row else True
-            
-            cursor.execute("""
-                SELECT setting_value 
-                FROM settings 
-                WHERE setting_key = 'spam_protection_minutes'
-            """)
-            row = cursor.fetchone()
-            minutes = int(row['setting_value']) if row else 15
-            
-            return {'enabled': enabled, 'minutes': minutes}
+            rows = await self.fetchall_named('get_spam_settings')
         except Exception as e:
             print(f"Помилка отримання налаштувань спаму: {e}")
             return {'enabled': True, 'minutes': 15}
-        finally:
-            cursor.close()
+        
+        values = {row['setting_key']: row['setting_value'] for row in rows}
+        settings = {
+            'enabled': values.get('spam_protection_enabled', 'true') == 'true',
+            'minutes': int(values.get('spam_protection_minutes', 15))
+        }
+        # Не кешуємо результат, якщо під час запиту прийшла інвалідація
+        if generation == self._settings_generation:
+            self._spam_settings = settings
+        return dict(settings)
     
-    def update_spam_setting(self, key: str, value: str):
+    async def update_spam_setting(self, key: str, value: str):
         """Оновити налаштування спаму"""
-        cursor = self.get_cursor()
         try:
-            cursor.execute("""
-                INSERT INTO settings (setting_key, setting_value)
-                VALUES (%s, %s)
-                ON CONFLICT (setting_key) 
-                DO UPDATE SET setting_value = EXCLUDED.setting_value, updated_at = CURRENT_TIMESTAMP
-            """, (key, value))
+            await self.execute("""
+                WITH updated AS (
+                    INSERT INTO settings (setting_key, setting_value)
+                    VALUES (%s, %s)
+                    ON CONFLICT (setting_key) 
+                    DO UPDATE SET setting_value = EXCLUDED.setting_value, updated_at = CURRENT_TIMESTAMP
+                    RETURNING setting_key
+                )
+                SELECT pg_notify(%s, setting_key) FROM updated
+            """, (key, value, SETTINGS_CHANNEL))
+            self._on_settings_changed(key)
             return True
         except Exception as e:
             print(f"Помилка оновлення налаштування: {e}")
             return False
-        finally:
-            cursor.close()
     
-    def set_spam_protection_enabled(self, enabled: bool):
+    async def set_spam_protection_enabled(self, enabled: bool):
         """Увімкнути/вимкнути захист від спаму"""
-        return self.update_spam_setting('spam_protection_enabled', 'true' if enabled else 'false')
+        return await self.update_spam_setting('spam_protection_enabled', 'true' if enabled else 'false')
     
-    def set_spam_protection_minutes(self, minutes: int):
+    async def set_spam_protection_minutes(self, minutes: int):
         """Встановити затримку в хвилинах"""
-        return self.update_spam_setting('spam_protection_minutes', str(minutes))
+        return await self.update_spam_setting('spam_protection_minutes', str(minutes))
     
-    def cleanup_orphaned_posts(self):
-        """Видалити заявки для каналів, які більше не існують"""
-        cursor = self.get_cursor()
+    async def load_fsm_session(self, key: str, ttl_seconds: float):
+        """Стан і дані FSM за ключем, або None. Помилки не приховуються,
+        щоб збій БД не виглядав як порожня сесія."""
+        row = await self.fetchone_named('load_fsm_session', (key, ttl_seconds))
+        return (row['state'], row['data']) if row else None
+    
+    async def save_fsm_sessions(self, sessions: dict, notify_channel: str, notify_payloads: list) -> bool:
+        """Записати пачку сесій {key: (state, data_json)} одним запитом.
+        Порожні сесії видаляються; після запису надсилаються NOTIFY для інших процесів."""
+        keys, states, datas, deleted = [], [], [], []
+        for key, (state, data) in sessions.items():
+            if state is None and data == '{}':
+                deleted.append(key)
+            else:
+                keys.append(key)
+                states.append(state)
+                datas.append(data)
         try:
-            # Видаляємо всі заявки, де канал не існує в таблиці channels
-            cursor.execute("""
+            await self.execute("""
+                WITH upserted AS (
+                    INSERT INTO fsm_sessions (key, state, data, updated_at)
+                    SELECT key, state, data::jsonb, LOCALTIMESTAMP
+                    FROM unnest(%s::text[], %s::text[], %s::text[]) AS t(key, state, data)
+                    ON CONFLICT (key) DO UPDATE
+                    SET state = EXCLUDED.state, data = EXCLUDED.data, updated_at = EXCLUDED.updated_at
+                ),
+                deleted AS (
+                    DELETE FROM fsm_sessions WHERE key = ANY(%s::text[])
+                )
+                SELECT pg_notify(%s, payload) FROM unnest(%s::text[]) AS payload
+            """, (keys, states, datas, deleted, notify_channel, notify_payloads))
+            return True
+        except Exception as e:
+            print(f"Помилка збереження FSM сесій: {e}")
+            return False
+    
+    async def delete_expired_fsm_sessions(self, ttl_seconds: float) -> int:
+        """Видалити сесії FSM, що не змінювались довше ttl_seconds"""
+        try:
+            return await self.execute("""
+                DELETE FROM fsm_sessions
+                WHERE updated_at < LOCALTIMESTAMP - make_interval(secs => %s)
+            """, (ttl_seconds,))
+        except Exception as e:
+            print(f"Помилка видалення застарілих FSM сесій: {e}")
+            return 0
+    
+    async def ensure_posts_partitions(self, months_ahead: int) -> int:
+        """Створити секції posts до поточного місяця + months_ahead; повертає кількість нових"""
+        try:
+            row = await self.fetchone("""
+                SELECT ensure_posts_partitions(
+                    LOCALTIMESTAMP, LOCALTIMESTAMP + make_interval(months => %s)
+                ) AS created
+            """, (months_ahead,))
+            return row['created']
+        except Exception as e:
+            print(f"Помилка створення секцій posts: {e}")
+            return 0
+    
+    async def get_expired_posts_partitions(self, retain_months: int) -> list:
+        """Секції posts, що повністю старші за retain_months останніх місяців"""
+        try:
+            rows = await self.fetchall(r"""
+                SELECT c.relname
+                FROM pg_inherits i
+                JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = 'posts'::regclass
+                  AND c.relname ~ '^posts_\d{4}_\d{2}$'
+                  AND to_date(substring(c.relname FROM 7), 'YYYY_MM')
+                      < date_trunc('month', LOCALTIMESTAMP) - make_interval(months => %s)
+                ORDER BY c.relname
+            """, (retain_months,))
+            return [row['relname'] for row in rows]
+        except Exception as e:
+            print(f"Помилка отримання старих секцій posts: {e}")
+            return []
+    
+    async def archive_posts_partition(self, name: str, path: str = None):
+        """Від'єднати секцію posts разом із секцією post_media того ж місяця. Якщо
+        задано path, пости з їхніми файлами (колонка media, JSON) спершу зберігаються
+        в gzip CSV, а таблиці видаляються; інакше вони лишаються окремими таблицями
+        archived_<name> і archived_post_media_<місяць>. Секції з необробленими заявками чи активними публікаціями
+        пропускаються. Повертає кількість рядків або None, якщо секцію пропущено.
+        Лічильники з channel_post_counts/user_post_counts не зменшуються: архівні
+        пости лишаються в статистиці."""
+        table = sql.Identifier(name)
+        media_name = 'post_media_' + name[len('posts_'):]
+        media_table = sql.Identifier(media_name)
+        
+        def job(conn):
+            conn.autocommit = False
+            part_path = path + '.part' if path else None
+            try:
+                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                    cursor.execute("SELECT pg_try_advisory_xact_lock(%s) AS locked", (RETENTION_LOCK_KEY,))
+                    if not cursor.fetchone()['locked']:
+                        return None
+                    # Не тримати чергу запитів до posts, якщо від'єднання доводиться чекати
+                    cursor.execute("SET LOCAL lock_timeout = '5s'")
+                    cursor.execute(sql.SQL("LOCK TABLE {}, {} IN SHARE MODE").format(table, media_table))
+                    cursor.execute(sql.SQL("""
+                        SELECT COUNT(*) AS total,
+                               COUNT(*) FILTER (WHERE status NOT IN ('approved', 'rejected')) AS active,
+                               EXISTS (
+                                   SELECT 1 FROM publish_jobs j JOIN {} p
+                                       ON p.id = j.post_id AND p.created_at = j.post_created_at
+                                   WHERE j.status IN ('queued', 'running')
+                               ) AS publishing
+                        FROM {}
+                    """).format(table, table))
+                    counts = cursor.fetchone()
+                    if counts['active'] or counts['publishing']:
+                        print(f"⚠️ Секцію {name} не архівовано: є необроблені заявки або публікації")
+                        return None
+                    
+                    # Зовнішній ключ не дасть від'єднати секцію з історією публікацій
+                    cursor.execute(sql.SQL("""
+                        DELETE FROM publish_jobs j USING {} p
+                        WHERE p.id = j.post_id AND p.created_at = j.post_created_at
+                    """).format(table))
+                    if path:
+                        with gzip.open(part_path, 'wb') as f:
+                            cursor.copy_expert(
+                                sql.SQL("""
+                                    COPY (
+                                        SELECT p.*, (
+                                            SELECT c.channel_name FROM channels c WHERE c.id = p.channel_ref
+                                        ) AS channel, (
+                                            SELECT json_agg(json_build_object(
+                                                'type', m.type, 'file_id', m.file_id,
+                                                'file_unique_id', m.file_unique_id
+                                            ) ORDER BY m.ordinal)
+                                            FROM {} m
+                                            WHERE m.post_id = p.id AND m.post_created_at = p.created_at
+                                        ) AS media
+                                        FROM {} p ORDER BY p.id
+                                    ) TO STDOUT WITH (FORMAT csv, HEADER)
+                                """).format(media_table, table).as_string(cursor),
+                                f
+                            )
+                    # Спершу файли: вони посилаються на секцію posts
+                    cursor.execute(sql.SQL("ALTER TABLE post_media DETACH PARTITION {}").format(media_table))
+                    cursor.execute(sql.SQL("ALTER TABLE {} DROP CONSTRAINT post_media_post_fkey").format(media_table))
+                    cursor.execute(sql.SQL("ALTER TABLE posts DETACH PARTITION {}").format(table))
+                    if path:
+                        cursor.execute(sql.SQL("DROP TABLE {}, {}").format(media_table, table))
+                    else:
+                        for partition_name in (media_name, name):
+                            cursor.execute(sql.SQL("ALTER TABLE {} RENAME TO {}").format(
+                                sql.Identifier(partition_name), sql.Identifier('archived_' + partition_name)
+                            ))
+                conn.commit()
+                if path:
+                    os.replace(part_path, path)
+                return counts['total']
+            finally:
+                conn.rollback()
+                conn.autocommit = True
+                if part_path and os.path.exists(part_path):
+                    os.remove(part_path)
+        
+        try:
+            if self.pool is None:
+                await self.connect()
+            return await self.pool.run(job)
+        except Exception as e:
+            print(f"Помилка архівації секції {name}: {e}")
+            return None
+    
+    async def cleanup_orphaned_posts(self):
+        """Видалити заявки без каналу. Зовнішній ключ не дає з'явитися новим,
+        тож лишитися могли тільки заявки, які міграція 013 не зіставила з каналом"""
+        try:
+            deleted_count = await self.execute("""
                 DELETE FROM posts
-                WHERE channel NOT IN (SELECT channel_name FROM channels)
+                WHERE channel_ref IS NULL
             """)
-            deleted_count = cursor.rowcount
             
             if deleted_count > 0:
                 print(f"✅ Видалено {deleted_count} сирітських заявок")
@@ -613,9 +1270,7 @@ class Database:
         except Exception as e:
             print(f"Помилка очищення сирітських заявок: {e}")
             return 0
-        finally:
-            cursor.close()
 
-    def __del__(self):
-        if self.conn and not self.conn.closed:
-            self.conn.close()
+
+# Спільний екземпляр для bot.py та admin_handlers.py
+db = Database()
@@ -0,0 +1,133 @@
+"""
+Версійовані міграції схеми БД.
+
+Міграції - файли migrations/NNN_назва.sql, що застосовуються по порядку.
+Застосовані версії записуються в schema_version, а advisory lock не дає
+кільком воркерам мігрувати одночасно. Файл, що починається з рядка
+'-- migration: no-transaction', виконується поза транзакцією по одному
+виразу (потрібно для CREATE INDEX CONCURRENTLY); вирази в ньому мають
+закінчуватись ';' в кінці рядка і не містити тіл функцій.
+"""
+
+import logging
+import os
+import re
+
+import psycopg2
+from psycopg2 import errors
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+# Довільний, але сталий ключ advisory lock для міграцій цього бота
+MIGRATION_LOCK_KEY = 0x706F7374626F74
+
+NO_TRANSACTION_MARKER = '-- migration: no-transaction'
+
+
+class Migration:
+    def __init__(self, version: int, name: str, path: str):
+        self.version = version
+        self.name = name
+        self.path = path
+
+    def read(self) -> str:
+        with open(self.path, encoding='utf-8') as f:
+            return f.read()
+
+
+def load_migrations(directory: str = MIGRATIONS_DIR):
+    migrations = []
+    for filename in os.listdir(directory):
+        match = re.fullmatch(r'(\d+)_(\w+)\.sql', filename)
+        if match:
+            migrations.append(Migration(int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    migrations.sort(key=lambda m: m.version)
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"Дублікати номерів міграцій у {directory}")
+    return migrations
+
+
+def get_schema_version(cursor) -> int:
+    try:
+        cursor.execute("SELECT COALESCE(MAX(version), 0) AS version FROM schema_version")
+        return cursor.fetchone()[0]
+    except errors.UndefinedTable:
+        return 0
+
+
+def split_statements(sql: str) -> list:
+    statements = re.split(r';[ \t]*(?:\n|$)', sql)
+    result = []
+    for statement in statements:
+        lines = [line for line in statement.splitlines() if not line.strip().startswith('--')]
+        if ''.join(lines).strip():
+            result.append(statement.strip())
+    return result
+
+
+def _apply(conn, migration: Migration):
+    sql = migration.read()
+    in_transaction = not sql.lstrip().startswith(NO_TRANSACTION_MARKER)
+    # Рядок з кількома виразами PostgreSQL виконує як одну неявну транзакцію
+    statements = [sql] if in_transaction else split_statements(sql)
+    conn.autocommit = not in_transaction
+    try:
+        with conn.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+            cursor.execute(
+                "INSERT INTO schema_version (version, name) VALUES (%s, %s)",
+                (migration.version, migration.name)
+            )
+        if in_transaction:
+            conn.commit()
+    except Exception:
+        if in_transaction:
+            conn.rollback()
+        raise
+    finally:
+        conn.autocommit = True
+
+
+def migrate(conn, migrations=None) -> list:
+    """Застосувати нові міграції на підключенні в autocommit режимі.
+    Повертає список застосованих версій."""
+    migrations = load_migrations() if migrations is None else migrations
+    latest = migrations[-1].version if migrations else 0
+
+    with conn.cursor() as cursor:
+        # Звичайний запуск: одна перевірка версії без блокувань
+        if get_schema_version(cursor) >= latest:
+            return []
+
+        cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_KEY,))
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    name VARCHAR(255) NOT NULL,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            # Поки чекали на блокування, інший воркер міг усе застосувати
+            current = get_schema_version(cursor)
+
+        applied = []
+        for migration in migrations:
+            if migration.version <= current:
+                continue
+            logger.info(f"🗄 Міграція {migration.version:03d}_{migration.name}...")
+            _apply(conn, migration)
+            applied.append(migration.version)
+        return applied
+    finally:
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_KEY,))
+        except psycopg2.Error:
+            # Сесійний lock звільниться разом із розірваним підключенням
+            pass
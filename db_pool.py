@@ -0,0 +1,234 @@
+"""
+Пул підключень до PostgreSQL для асинхронного шару даних.
+
+psycopg2 блокує потік, тому кожен запит виконується у власному пулі потоків,
+а обробники aiogram лише чекають на результат і не зупиняють event loop.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+from psycopg2 import extensions
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(Exception):
+    """Не вдалося отримати підключення з пулу за відведений час"""
+
+
+class ConnectionPool:
+    def __init__(self, dsn: dict, min_size: int = 2, max_size: int = 10,
+                 acquire_timeout: float = 10.0, health_check_interval: float = 30.0):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Невірні розміри пулу: min={min_size}, max={max_size}")
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.health_check_interval = health_check_interval
+
+        self._idle = []
+        self._size = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_size, thread_name_prefix='db')
+        self._slots = None
+        self._waiting = 0
+        self._closed = False
+
+    def open(self):
+        """Відкрити мінімальну кількість підключень (блокуючий виклик)"""
+        for _ in range(self.min_size):
+            conn = self._new_connection()
+            with self._lock:
+                self._size += 1
+                self._idle.append((conn, time.monotonic()))
+
+    def _new_connection(self):
+        conn = psycopg2.connect(**self.dsn)
+        conn.autocommit = True
+        return conn
+
+    def _is_healthy(self, conn, idle_since: float) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - idle_since < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn):
+        with self._lock:
+            self._size -= 1
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def _checkout(self):
+        while True:
+            with self._lock:
+                item = self._idle.pop() if self._idle else None
+                if item is None:
+                    self._size += 1
+            if item is None:
+                try:
+                    return self._new_connection()
+                except Exception:
+                    with self._lock:
+                        self._size -= 1
+                    raise
+            conn, idle_since = item
+            if self._is_healthy(conn, idle_since):
+                return conn
+            logger.warning("Підключення до БД не пройшло перевірку, перепідключаємось")
+            self._discard(conn)
+
+    def _checkin(self, conn, broken: bool = False):
+        if broken or self._closed or conn.closed:
+            self._discard(conn)
+            return
+        if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                self._discard(conn)
+                return
+        with self._lock:
+            self._idle.append((conn, time.monotonic()))
+
+    def _call(self, fn, args):
+        conn = self._checkout()
+        broken = False
+        try:
+            return fn(conn, *args)
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            self._checkin(conn, broken)
+
+    async def run(self, fn, *args):
+        """Виконати fn(conn, *args) на підключенні з пулу, не блокуючи event loop"""
+        if self._closed:
+            raise RuntimeError("Пул підключень закрито")
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_size)
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.acquire_timeout)
+        except asyncio.TimeoutError:
+            raise PoolTimeoutError(
+                f"Немає вільного підключення до БД протягом {self.acquire_timeout} с"
+            ) from None
+        finally:
+            self._waiting -= 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._call, fn, args)
+        finally:
+            self._slots.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'waiting': self._waiting,
+                'max_size': self.max_size,
+            }
+
+    def close(self):
+        """Закрити всі підключення (блокуючий виклик)"""
+        self._closed = True
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for conn, _ in idle:
+            try:
+                conn.close()
+            except psycopg2.Error:
+                pass
+
+
+class NotificationListener:
+    """Окреме підключення для LISTEN/NOTIFY, вбудоване в event loop"""
+
+    def __init__(self, dsn: dict, reconnect_delay: float = 5.0):
+        self.dsn = dsn
+        self.reconnect_delay = reconnect_delay
+        self._handlers = {}
+        self._task = None
+
+    def subscribe(self, channel: str, handler):
+        """handler(payload) викликається на кожне повідомлення каналу.
+        Після перепідключення handler отримує None: повідомлення могли загубитись."""
+        self._handlers.setdefault(channel, []).append(handler)
+
+    def _connect(self):
+        conn = psycopg2.connect(**self.dsn, keepalives=1, keepalives_idle=30)
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            for channel in self._handlers:
+                cursor.execute(f'LISTEN "{channel}"')
+        return conn
+
+    def _dispatch(self, channel: str, payload):
+        for handler in self._handlers.get(channel, []):
+            try:
+                handler(payload)
+            except Exception as e:
+                logger.error(f"Помилка обробника сповіщення {channel}: {e}")
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                conn = await asyncio.to_thread(self._connect)
+            except psycopg2.Error as e:
+                logger.warning(f"LISTEN: не вдалося підключитись до БД: {e}")
+                await asyncio.sleep(self.reconnect_delay)
+                continue
+
+            fd = conn.fileno()
+            readable = asyncio.Event()
+            loop.add_reader(fd, readable.set)
+            try:
+                for channel in self._handlers:
+                    self._dispatch(channel, None)
+                while True:
+                    await readable.wait()
+                    readable.clear()
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        self._dispatch(notify.channel, notify.payload)
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                logger.warning(f"LISTEN: підключення втрачено: {e}")
+            finally:
+                loop.remove_reader(fd)
+                conn.close()
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
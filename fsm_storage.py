@@ -0,0 +1,230 @@
+"""
+Сховище станів FSM aiogram у PostgreSQL.
+
+Активні сесії тримаються в LRU-кеші, а зміни записуються в таблицю
+fsm_sessions пачками у фоні (write-behind). Інші процеси бота дізнаються про
+зміни через NOTIFY і скидають свої копії. Сесії, що простояли довше TTL,
+вважаються порожніми і видаляються.
+"""
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+
+logger = logging.getLogger(__name__)
+
+# Канал NOTIFY про записані сесії; payload — "<origin>\n<key>\n<key>..."
+FSM_CHANNEL = 'fsm_changed'
+# Ліміт payload у PostgreSQL — 8000 байт
+NOTIFY_PAYLOAD_LIMIT = 7000
+
+
+class PostgresStorage(BaseStorage):
+    def __init__(self, db, max_sessions: int = 50_000, ttl: float = 7 * 24 * 3600,
+                 flush_interval: float = 0.5, batch_size: int = 500, sweep_interval: float = 600.0):
+        self.db = db
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.sweep_interval = sweep_interval
+        self.key_builder = DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+
+        # key -> [state, data, час останнього звернення]; порядок = LRU
+        self._cache = OrderedDict()
+        # key -> (state, data_json): ще не записані в БД зміни
+        self._dirty = {}
+        # Пачка, що саме записується: до кінця запису БД ще може бути застарілою
+        self._flushing = {}
+        self._loading = {}
+        self._origin = uuid.uuid4().hex[:12]
+        self._wakeup = None
+        self._task = None
+        self._closing = False
+        self._hits = 0
+        self._misses = 0
+        self._flushes = 0
+        self._flushed = 0
+        self._expired = 0
+
+        db.subscribe(FSM_CHANNEL, self._on_notify)
+
+    # ============= КЕШ =============
+
+    async def _record(self, storage_key: StorageKey) -> list:
+        key = self.key_builder.build(storage_key)
+        now = time.monotonic()
+        record = self._cache.get(key)
+        if record is not None:
+            self._hits += 1
+            if now - record[2] > self.ttl:
+                self._expired += 1
+                record[0], record[1] = None, {}
+                self._mark_dirty(key, record)
+            record[2] = now
+            self._cache.move_to_end(key)
+            return record
+
+        # Паралельні звернення до однієї сесії чекають один запит до БД
+        task = self._loading.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key))
+            self._loading[key] = task
+            task.add_done_callback(lambda _: self._loading.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _load(self, key: str) -> list:
+        self._misses += 1
+        pending = self._dirty.get(key) or self._flushing.get(key)
+        if pending is not None:
+            state, data = pending[0], json.loads(pending[1])
+        else:
+            row = await self.db.load_fsm_session(key, self.ttl)
+            state, data = row if row else (None, {})
+        record = self._cache.get(key)
+        if record is None:
+            record = [state, data, time.monotonic()]
+            self._store(key, record)
+        return record
+
+    def _store(self, key: str, record: list):
+        self._cache[key] = record
+        self._cache.move_to_end(key)
+        # Витіснення безпечне: незаписані зміни лежать окремо в _dirty
+        while len(self._cache) > self.max_sessions:
+            self._cache.popitem(last=False)
+
+    def _mark_dirty(self, key: str, record: list):
+        self._dirty[key] = (record[0], json.dumps(record[1], ensure_ascii=False))
+        if len(self._dirty) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    def _expire_cache(self):
+        expire_before = time.monotonic() - self.ttl
+        while self._cache:
+            key, record = next(iter(self._cache.items()))
+            if record[2] >= expire_before:
+                break
+            self._cache.popitem(last=False)
+            self._expired += 1
+
+    def _on_notify(self, payload=None):
+        if payload is None:
+            # Після перепідключення сповіщення могли загубитись
+            self._cache.clear()
+            return
+        origin, *keys = payload.split('\n')
+        if origin == self._origin:
+            return
+        for key in keys:
+            # Локальна незаписана зміна новіша за чужу
+            if key not in self._dirty:
+                self._cache.pop(key, None)
+
+    # ============= ІНТЕРФЕЙС BaseStorage =============
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = await self._record(key)
+        record[0] = state.state if isinstance(state, State) else state
+        self._mark_dirty(self.key_builder.build(key), record)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        record = await self._record(key)
+        return record[0]
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        record = await self._record(key)
+        record[1] = data.copy()
+        self._mark_dirty(self.key_builder.build(key), record)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        record = await self._record(key)
+        return record[1].copy()
+
+    # ============= ЗАПИС У БД =============
+
+    def _notify_payloads(self, keys) -> list:
+        payloads, current = [], [self._origin]
+        size = len(self._origin)
+        for key in keys:
+            key_size = len(key.encode()) + 1
+            if size + key_size > NOTIFY_PAYLOAD_LIMIT and len(current) > 1:
+                payloads.append('\n'.join(current))
+                current, size = [self._origin], len(self._origin)
+            current.append(key)
+            size += key_size
+        if len(current) > 1:
+            payloads.append('\n'.join(current))
+        return payloads
+
+    async def flush(self) -> bool:
+        """Записати всі незбережені зміни; при помилці вони лишаються на наступну спробу"""
+        while self._dirty:
+            keys = list(self._dirty)[:self.batch_size]
+            batch = {key: self._dirty.pop(key) for key in keys}
+            self._flushing = batch
+            try:
+                ok = await self.db.save_fsm_sessions(batch, FSM_CHANNEL, self._notify_payloads(batch))
+            finally:
+                self._flushing = {}
+            if not ok:
+                # Зміни, що прийшли під час запису, новіші за пачку
+                for key, value in batch.items():
+                    self._dirty.setdefault(key, value)
+                return False
+            self._flushes += 1
+            self._flushed += len(batch)
+        return True
+
+    async def _run(self):
+        last_sweep = time.monotonic()
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+                self._expire_cache()
+                if time.monotonic() - last_sweep >= self.sweep_interval:
+                    last_sweep = time.monotonic()
+                    deleted = await self.db.delete_expired_fsm_sessions(self.ttl)
+                    if deleted:
+                        logger.info(f"🧹 Видалено {deleted} застарілих FSM сесій")
+            except Exception as e:
+                logger.error(f"Помилка фонового запису FSM: {e}")
+
+    async def start(self):
+        if self._task is None:
+            self._closing = False
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """Зупинити фоновий запис і зберегти решту змін"""
+        if self._task is not None:
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            'cached': len(self._cache),
+            'max_sessions': self.max_sessions,
+            'dirty': len(self._dirty),
+            'hits': self._hits,
+            'misses': self._misses,
+            'flushes': self._flushes,
+            'flushed_sessions': self._flushed,
+            'expired': self._expired,
+        }
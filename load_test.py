@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+"""
+Навантажувальний тест бота з локальним фейковим Telegram Bot API.
+
+Диспетчер bot.py разом з setup_admin_handlers обробляє синтетичні оновлення:
+користувачі проходять /start, надсилають одиночні пости й альбоми та
+підтверджують їх, адміни схвалюють і відхиляють заявки, а PublishWorker
+публікує схвалені пости. Запити бота приймає aiohttp-заглушка Bot API, дані —
+тимчасова схема PostgreSQL; робочі таблиці не зачіпаються. Для кожного
+сценарію виводяться пропускна здатність, p50/p95/p99 часу обробки оновлення
+і кількість запитів до БД.
+
+Приклад: python load_test.py --users 500 --admins 4 --concurrency 50 --json load.json
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+
+# Заглушці Bot API справжній токен не потрібен
+os.environ.setdefault('BOT_TOKEN', '123456:LOADTESTabcdefghijklmnopqrstuvwxyz012')
+
+from aiogram.client.telegram import TelegramAPIServer
+from aiohttp import web
+from psycopg2.extras import RealDictCursor
+
+import bot as bot_module
+from admin_handlers import setup_admin_handlers, AdminStates
+from config import DB_CONFIG, ADMIN_PASSWORD, POSTS_PARTITIONS_AHEAD
+from database import Database, db
+from queries import QUERIES
+from send_scheduler import PriorityTokenBucket
+
+SCHEMA = 'load_test'
+
+USER_ID_BASE = 1_000_000
+ADMIN_ID_BASE = 900_000
+ALBUM_SIZE = 3
+ALBUM_TIMEOUT = 10.0
+
+
+class FakeBotAPI:
+    """Bot API, що відповідає успіхом на кожен метод і запам'ятовує inline-кнопки"""
+
+    def __init__(self):
+        self.calls = Counter()
+        self.url = None
+        self._callbacks = defaultdict(list)
+        self._message_ids = itertools.count(1)
+        self._runner = None
+
+    async def start(self, host: str = '127.0.0.1'):
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, 0)
+        await site.start()
+        self.url = f"http://{host}:{self._runner.addresses[0][1]}"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def pop_callbacks(self, chat_id: int) -> list:
+        """callback_data кнопок, надісланих у чат з минулого виклику"""
+        return self._callbacks.pop(chat_id, [])
+
+    def _message(self, chat_id) -> dict:
+        try:
+            chat = {'id': int(chat_id), 'type': 'private'}
+        except (TypeError, ValueError):
+            # @username каналу
+            chat = {'id': -1001000000000, 'type': 'channel', 'username': str(chat_id).lstrip('@')}
+        return {'message_id': next(self._message_ids), 'date': int(time.time()), 'chat': chat}
+
+    async def _handle(self, request):
+        method = request.match_info['method']
+        form = await request.post()
+        self.calls[method] += 1
+        chat_id = form.get('chat_id')
+
+        markup = form.get('reply_markup')
+        if markup and chat_id:
+            for row in json.loads(markup).get('inline_keyboard', []):
+                for button in row:
+                    if 'callback_data' in button:
+                        self._callbacks[int(chat_id)].append(button['callback_data'])
+
+        if method == 'sendMediaGroup':
+            result = [self._message(chat_id) for _ in json.loads(form['media'])]
+        elif method.startswith('send'):
+            result = self._message(chat_id)
+        else:
+            result = True
+        return web.json_response({'ok': True, 'result': result})
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def add(self):
+        with self._lock:
+            self.count += 1
+
+
+QUERY_COUNTER = QueryCounter()
+
+
+class CountingCursor(RealDictCursor):
+    """Курсор, що рахує всі запити бота до БД"""
+
+    def execute(self, query, vars=None):
+        QUERY_COUNTER.add()
+        return super().execute(query, vars)
+
+
+class Updates:
+    """Синтетичні оновлення Telegram"""
+
+    def __init__(self):
+        self._ids = itertools.count(1)
+
+    @staticmethod
+    def user(user_id: int) -> dict:
+        return {'id': user_id, 'is_bot': False, 'first_name': 'Load', 'username': f'load_{user_id}'}
+
+    def message(self, user_id: int, text: str = None, **fields) -> dict:
+        update_id = next(self._ids)
+        message = {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': self.user(user_id),
+            **fields,
+        }
+        if text is not None:
+            message['text'] = text
+        return {'update_id': update_id, 'message': message}
+
+    def photo(self, user_id: int, **fields) -> dict:
+        n = next(self._ids)
+        file = {'file_id': f'photo_{n}', 'file_unique_id': f'uphoto_{n}', 'width': 1280, 'height': 720}
+        return self.message(user_id, photo=[file], **fields)
+
+    def video(self, user_id: int, **fields) -> dict:
+        n = next(self._ids)
+        file = {'file_id': f'video_{n}', 'file_unique_id': f'uvideo_{n}',
+                'width': 1280, 'height': 720, 'duration': 10}
+        return self.message(user_id, video=file, **fields)
+
+    def callback(self, user_id: int, data: str) -> dict:
+        update_id = next(self._ids)
+        return {
+            'update_id': update_id,
+            'callback_query': {
+                'id': str(update_id),
+                'from': self.user(user_id),
+                'chat_instance': str(user_id),
+                'data': data,
+                'message': {
+                    'message_id': update_id,
+                    'date': int(time.time()),
+                    'chat': {'id': user_id, 'type': 'private'},
+                    'text': 'Дії:',
+                },
+            },
+        }
+
+
+def percentile(values: list, p: float) -> float:
+    """Перцентиль за найближчим рангом; values відсортовано"""
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+class Scenario:
+    def __init__(self, name: str, api: FakeBotAPI):
+        self.name = name
+        self.api = api
+        self.latencies = []
+        self.units = 0
+        self.errors = 0
+
+    async def feed(self, update: dict):
+        started = time.perf_counter()
+        try:
+            await bot_module.dp.feed_raw_update(bot_module.bot, update)
+        except Exception as e:
+            self.errors += 1
+            if self.errors == 1:
+                logging.getLogger(__name__).error(f"{self.name}: помилка обробки оновлення: {e}")
+        self.latencies.append(time.perf_counter() - started)
+
+    async def __aenter__(self):
+        QUERIES.reset_stats()
+        self._queries = QUERY_COUNTER.count
+        self._calls = Counter(self.api.calls)
+        self._started = time.perf_counter()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.elapsed = time.perf_counter() - self._started
+        self.db_queries = QUERY_COUNTER.count - self._queries
+        self.api_calls = dict(self.api.calls - self._calls)
+        self.prepared = [row for row in QUERIES.stats() if row['calls']][:5]
+        return False
+
+    def report(self) -> dict:
+        latencies = sorted(self.latencies)
+        return {
+            'name': self.name,
+            'units': self.units,
+            'updates': len(latencies),
+            'errors': self.errors,
+            'seconds': round(self.elapsed, 3),
+            'units_per_second': round(self.units / self.elapsed, 1) if self.elapsed else 0.0,
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+            'db_queries': self.db_queries,
+            'db_queries_per_unit': round(self.db_queries / self.units, 1) if self.units else 0.0,
+            'api_calls': self.api_calls,
+            'top_prepared': self.prepared,
+        }
+
+
+async def run_concurrently(items, concurrency: int, fn):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(item):
+        async with semaphore:
+            await fn(item)
+
+    await asyncio.gather(*(run(item) for item in items))
+
+
+async def wait_for_state(user_id: int, state, timeout: float) -> bool:
+    context = bot_module.dp.fsm.get_context(bot_module.bot, chat_id=user_id, user_id=user_id)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if await context.get_state() == state.state:
+            return True
+        await asyncio.sleep(0.02)
+    return False
+
+
+class LoadTest:
+    def __init__(self, users: int, admins: int, channels: int, concurrency: int):
+        self.users = [USER_ID_BASE + i for i in range(1, users + 1)]
+        self.admins = [ADMIN_ID_BASE + i for i in range(1, admins + 1)]
+        self.channels = channels
+        self.concurrency = concurrency
+        self.api = FakeBotAPI()
+        self.updates = Updates()
+        self.scenarios = []
+
+    def channel_of(self, user_id: int) -> int:
+        return user_id % self.channels + 1
+
+    def scenario(self, name: str) -> Scenario:
+        scenario = Scenario(name, self.api)
+        self.scenarios.append(scenario)
+        return scenario
+
+    async def setup(self, admin_db: Database, telegram_limits: bool):
+        await self.api.start()
+        bot_module.bot.session.api = TelegramAPIServer.from_base(self.api.url)
+        if not telegram_limits:
+            # Заглушка не обмежує частоту, тож ліміти Telegram лише маскували б час обробників
+            scheduler = bot_module.send_scheduler
+            scheduler.global_bucket = PriorityTokenBucket(1e9, 1e9)
+            scheduler.private_rate = scheduler.group_rate = 1e9
+            scheduler.private_burst = scheduler.group_burst = 1_000_000
+
+        await admin_db.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await admin_db.execute(f"CREATE SCHEMA {SCHEMA}")
+        db.dsn = {**DB_CONFIG, 'options': f'-c search_path={SCHEMA}'}
+        db.cursor_factory = CountingCursor
+
+        # Те саме, що bot.main() до початку отримання оновлень
+        await db.connect()
+        await db.migrate()
+        await db.ensure_posts_partitions(POSTS_PARTITIONS_AHEAD)
+        await bot_module.storage.start()
+        await db.start_listener()
+
+        for n in range(1, self.channels + 1):
+            await db.add_channel(f"Канал {n}", f"@load_{n}")
+        for admin_id in self.admins:
+            await db.add_admin(admin_id, f"admin_{admin_id}")
+        # Кожен користувач надсилає кілька постів поспіль
+        await db.set_spam_protection_enabled(False)
+
+        await bot_module.load_channels_from_db()
+        await bot_module.warm_rate_limiter()
+        setup_admin_handlers(bot_module.dp, bot_module.bot, bot_module.load_channels_from_db)
+
+        # Вхід в адмінку (bcrypt) не заміряється
+        login = Scenario('login', self.api)
+        for admin_id in self.admins:
+            await login.feed(self.updates.message(admin_id, f"/admin {ADMIN_PASSWORD}"))
+            if not await wait_for_state(admin_id, AdminStates.in_admin_panel, 1.0):
+                raise RuntimeError(f"Адмін {admin_id} не увійшов в адмінку")
+
+    async def run_start(self):
+        async with self.scenario('start') as scenario:
+            async def user_flow(user_id):
+                await scenario.feed(self.updates.message(user_id, f"/start load_{self.channel_of(user_id)}"))
+                scenario.units += 1
+            await run_concurrently(self.users, self.concurrency, user_flow)
+
+    async def run_posts(self):
+        """Одиночні пости: текст, фото або відео і підтвердження"""
+        async with self.scenario('posts') as scenario:
+            async def user_flow(user_id):
+                kind = user_id % 3
+                if kind == 0:
+                    update = self.updates.message(user_id, f"Пост користувача {user_id}")
+                elif kind == 1:
+                    update = self.updates.photo(user_id, caption="Фото")
+                else:
+                    update = self.updates.video(user_id)
+                await scenario.feed(update)
+                await scenario.feed(self.updates.message(user_id, "✅ Відправити на модерацію"))
+                scenario.units += 1
+            await run_concurrently(self.users, self.concurrency, user_flow)
+
+    async def run_albums(self):
+        """Альбоми: частини приходять окремими оновленнями, далі підтвердження"""
+        async with self.scenario('albums') as scenario:
+            async def user_flow(user_id):
+                await scenario.feed(self.updates.message(user_id, "✍️ Написати ще 1 пост"))
+                group = f"album_{user_id}_{time.monotonic_ns()}"
+                for n in range(ALBUM_SIZE):
+                    fields = {'media_group_id': group}
+                    if n == 0:
+                        fields['caption'] = "Альбом"
+                    if n == ALBUM_SIZE - 1:
+                        await scenario.feed(self.updates.video(user_id, **fields))
+                    else:
+                        await scenario.feed(self.updates.photo(user_id, **fields))
+                if not await wait_for_state(user_id, bot_module.UserStates.confirming_post, ALBUM_TIMEOUT):
+                    scenario.errors += 1
+                    return
+                await scenario.feed(self.updates.message(user_id, "✅ Відправити на модерацію"))
+                scenario.units += 1
+            await run_concurrently(self.users, self.concurrency, user_flow)
+
+    async def run_moderation(self):
+        """Кожен адмін розбирає чергу своїх каналів: парні заявки схвалює, решту відхиляє"""
+        async with self.scenario('moderation') as scenario:
+            async def admin_flow(index):
+                admin_id = self.admins[index]
+                for n in range(index + 1, self.channels + 1, len(self.admins)):
+                    await scenario.feed(self.updates.message(admin_id, "📋 Заявки на модерацію"))
+                    await scenario.feed(self.updates.message(admin_id, f"Канал {n}"))
+                    while True:
+                        callbacks = self.api.pop_callbacks(admin_id)
+                        for data in callbacks:
+                            if data.startswith('approve_'):
+                                post_id = int(data.split('_')[1])
+                                action = 'approve' if post_id % 2 == 0 else 'reject'
+                                await scenario.feed(self.updates.callback(admin_id, f"{action}_{post_id}"))
+                                scenario.units += 1
+                        if 'pending_next' not in callbacks:
+                            break
+                        await scenario.feed(self.updates.callback(admin_id, 'pending_next'))
+            await run_concurrently(range(len(self.admins)), self.concurrency, admin_flow)
+
+    async def run_publish(self, admin_db: Database, timeout: float):
+        """PublishWorker стартує після модерації і публікує всю накопичену чергу"""
+        worker = bot_module.publish_worker
+        async with self.scenario('publish') as scenario:
+            before = worker.stats()
+            await worker.start()
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline:
+                row = await admin_db.fetchone(
+                    f"SELECT COUNT(*) AS left FROM {SCHEMA}.publish_jobs WHERE status IN ('queued', 'running')"
+                )
+                if not row['left']:
+                    break
+                await asyncio.sleep(0.05)
+            else:
+                scenario.errors += 1
+            after = worker.stats()
+            scenario.units = after['published'] - before['published']
+            scenario.errors += after['dead'] - before['dead']
+
+    async def teardown(self, admin_db: Database):
+        await bot_module.publish_worker.stop()
+        await bot_module.storage.close()
+        await db.close()
+        await bot_module.bot.session.close()
+        await self.api.stop()
+        await admin_db.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+
+
+def print_report(reports: list):
+    print()
+    print(f"{'Сценарій':<12}{'одиниць':>9}{'оновлень':>10}{'помилок':>9}{'за с':>9}"
+          f"{'p50 мс':>9}{'p95 мс':>9}{'p99 мс':>9}{'запитів БД':>12}{'на од.':>8}")
+    for r in reports:
+        print(f"{r['name']:<12}{r['units']:>9}{r['updates']:>10}{r['errors']:>9}{r['units_per_second']:>9}"
+              f"{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}{r['db_queries']:>12}{r['db_queries_per_unit']:>8}")
+    print()
+    for r in reports:
+        if r['top_prepared']:
+            top = ', '.join(f"{q['name']} {q['calls']}×{q['avg_ms']} мс" for q in r['top_prepared'])
+            print(f"🗄 {r['name']}: {top}")
+
+
+async def load_test(args):
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    test = LoadTest(args.users, args.admins, args.channels, args.concurrency)
+    admin_db = Database()
+    try:
+        print(f"🔄 Підготовка схеми {SCHEMA}: {args.channels} каналів, {args.admins} адмінів...")
+        await test.setup(admin_db, args.telegram_limits)
+        print(f"🚀 {args.users} користувачів, одночасно {args.concurrency}")
+        await test.run_start()
+        await test.run_posts()
+        await test.run_albums()
+        await test.run_moderation()
+        await test.run_publish(admin_db, args.publish_timeout)
+    finally:
+        await test.teardown(admin_db)
+        await admin_db.close()
+
+    reports = [scenario.report() for scenario in test.scenarios]
+    print_report(reports)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({
+                'users': args.users,
+                'admins': args.admins,
+                'channels': args.channels,
+                'concurrency': args.concurrency,
+                'telegram_limits': args.telegram_limits,
+                'scenarios': reports,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"📄 Звіт збережено у {args.json}")
+    return all(r['errors'] == 0 for r in reports)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=200, help="кількість синтетичних користувачів")
+    parser.add_argument('--admins', type=int, default=2, help="кількість модераторів")
+    parser.add_argument('--channels', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=50, help="скільки користувачів діють одночасно")
+    parser.add_argument('--publish-timeout', type=float, default=60, help="скільки чекати на публікацію (с)")
+    parser.add_argument('--telegram-limits', action='store_true',
+                        help="залишити ліміти надсилання Telegram з config.py")
+    parser.add_argument('--json', help="зберегти звіт у JSON")
+    parser.add_argument('--verbose', action='store_true', help="журнал бота рівня INFO")
+    args = parser.parse_args()
+    raise SystemExit(0 if asyncio.run(load_test(args)) else 1)
@@ -0,0 +1,71 @@
+-- ============================================
+-- Початкова схема (те, що раніше створював Database.create_tables)
+-- ============================================
+
+CREATE TABLE IF NOT EXISTS channels (
+    id SERIAL PRIMARY KEY,
+    channel_name VARCHAR(255) UNIQUE NOT NULL,
+    channel_id VARCHAR(255) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS users (
+    user_id BIGINT PRIMARY KEY,
+    username VARCHAR(255),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS admins (
+    user_id BIGINT PRIMARY KEY,
+    username VARCHAR(255),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS posts (
+    id SERIAL PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    username VARCHAR(255),
+    channel VARCHAR(255) NOT NULL,
+    message_data JSONB NOT NULL,
+    status VARCHAR(50) DEFAULT 'pending',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    processed_at TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(user_id)
+);
+
+-- Час останнього посту для атомарної перевірки затримки
+ALTER TABLE users ADD COLUMN IF NOT EXISTS last_post_at TIMESTAMP;
+
+UPDATE users u
+SET last_post_at = p.last_post_at
+FROM (
+    SELECT user_id, MAX(created_at) AS last_post_at
+    FROM posts
+    GROUP BY user_id
+) p
+WHERE p.user_id = u.user_id AND u.last_post_at IS NULL;
+
+CREATE TABLE IF NOT EXISTS channel_mappings (
+    id SERIAL PRIMARY KEY,
+    channel_name VARCHAR(255) UNIQUE NOT NULL,
+    channel_id VARCHAR(255) NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Стара версія create_tables створювала settings(key, value) і одразу
+-- перестворювала її; у робочих базах лишилась лише версія з setting_key
+CREATE TABLE IF NOT EXISTS settings (
+    setting_key VARCHAR(255) PRIMARY KEY,
+    setting_value TEXT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO settings (setting_key, setting_value)
+VALUES ('spam_protection_enabled', 'true'),
+       ('spam_protection_minutes', '15')
+ON CONFLICT (setting_key) DO NOTHING;
+
+CREATE INDEX IF NOT EXISTS idx_posts_status ON posts(status);
+CREATE INDEX IF NOT EXISTS idx_posts_user_id ON posts(user_id);
+CREATE INDEX IF NOT EXISTS idx_posts_channel ON posts(channel);
@@ -0,0 +1,26 @@
+-- migration: no-transaction
+-- ============================================
+-- Індекси під реальні запити модерації та перевірки затримки
+-- ============================================
+
+-- get_pending_posts_by_channel: status='pending' AND channel=? ORDER BY created_at,
+-- get_channels_with_pending_posts: DISTINCT channel серед pending
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_posts_pending_channel_created
+    ON posts(channel, created_at) WHERE status = 'pending';
+
+-- get_pending_posts: усі pending за часом створення
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_posts_pending_created
+    ON posts(created_at) WHERE status = 'pending';
+
+-- get_last_post_time, get_recent_post_times, get_user_stats
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_posts_user_created
+    ON posts(user_id, created_at DESC);
+
+-- get_posts_history: status IN ('approved', 'rejected') ORDER BY processed_at DESC
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_posts_history
+    ON posts(processed_at DESC) WHERE status IN ('approved', 'rejected');
+
+-- Покриті новими індексами
+DROP INDEX CONCURRENTLY IF EXISTS idx_posts_user_id;
+DROP INDEX CONCURRENTLY IF EXISTS idx_posts_processed_at;
+DROP INDEX CONCURRENTLY IF EXISTS idx_posts_status;
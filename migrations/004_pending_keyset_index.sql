@@ -0,0 +1,9 @@
+-- migration: no-transaction
+-- ============================================
+-- Keyset-пагінація черги модерації по (created_at, id)
+-- ============================================
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_posts_pending_channel_keyset
+    ON posts(channel, created_at, id) WHERE status = 'pending';
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_posts_pending_channel_created;
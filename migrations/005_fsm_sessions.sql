@@ -0,0 +1,13 @@
+-- ============================================
+-- Стан FSM користувачів (fsm_storage.PostgresStorage)
+-- ============================================
+
+CREATE TABLE IF NOT EXISTS fsm_sessions (
+    key TEXT PRIMARY KEY,
+    state TEXT,
+    data JSONB NOT NULL DEFAULT '{}',
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Видалення сесій, що простояли довше TTL
+CREATE INDEX IF NOT EXISTS idx_fsm_sessions_updated_at ON fsm_sessions(updated_at);
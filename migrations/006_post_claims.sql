@@ -0,0 +1,12 @@
+-- migration: no-transaction
+-- ============================================
+-- Оренда (claim/lease) заявок модератором або воркером
+-- ============================================
+
+-- Хто і до якого часу обробляє заявку; після claimed_until її може взяти інший
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS claimed_by VARCHAR(64);
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS claimed_until TIMESTAMP;
+
+-- release_claims: оренда знімається при зміні статусу, тому індекс лишається малим
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_posts_claimed_by
+    ON posts(claimed_by) WHERE claimed_by IS NOT NULL;
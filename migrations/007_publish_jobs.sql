@@ -0,0 +1,27 @@
+-- ============================================
+-- Черга публікації схвалених постів (publishing.PublishWorker)
+-- ============================================
+
+CREATE TABLE IF NOT EXISTS publish_jobs (
+    id BIGSERIAL PRIMARY KEY,
+    post_id INTEGER NOT NULL REFERENCES posts(id) ON DELETE CASCADE,
+    channel_id VARCHAR(255) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',  -- queued, running, done, dead
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    locked_by VARCHAR(64),
+    locked_until TIMESTAMP,
+    last_error TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+-- Голова черги кожного каналу: найстаріша незавершена задача
+CREATE INDEX IF NOT EXISTS idx_publish_jobs_active
+    ON publish_jobs(channel_id, id) WHERE status IN ('queued', 'running');
+
+-- Видалення старих виконаних задач
+CREATE INDEX IF NOT EXISTS idx_publish_jobs_done
+    ON publish_jobs(finished_at) WHERE status = 'done';
+
+CREATE INDEX IF NOT EXISTS idx_publish_jobs_post_id ON publish_jobs(post_id);
@@ -0,0 +1,24 @@
+-- migration: no-transaction
+-- ============================================
+-- Відкладена публікація: час виходу посту і порядок задач за ним
+-- ============================================
+
+-- Запланований час публікації (NULL — одразу після схвалення)
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS scheduled_at TIMESTAMP;
+
+-- Порядок публікації в каналі; на відміну від available_at, не зсувається повторами
+ALTER TABLE publish_jobs ADD COLUMN IF NOT EXISTS scheduled_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP;
+
+-- Зайняті слоти каналу
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_posts_channel_scheduled
+    ON posts(channel, scheduled_at) WHERE scheduled_at IS NOT NULL;
+
+-- Голова черги кожного каналу тепер визначається часом публікації
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_publish_jobs_channel_order
+    ON publish_jobs(channel_id, scheduled_at, id) WHERE status IN ('queued', 'running');
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_publish_jobs_active;
+
+-- Найближчі моменти, коли задачі стануть готовими (таймер воркерів)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_publish_jobs_queued_at
+    ON publish_jobs(scheduled_at) WHERE status = 'queued';
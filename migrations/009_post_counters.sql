@@ -0,0 +1,194 @@
+-- ============================================
+-- Лічильники заявок по каналах і користувачах
+-- ============================================
+
+-- Оновлюються тригерами на posts, тож читання статистики не сканує posts.
+-- Тригери рівня виразу: масова модерація оновлює кожен лічильник один раз.
+CREATE TABLE IF NOT EXISTS channel_post_counts (
+    channel VARCHAR(255) PRIMARY KEY,
+    pending INTEGER NOT NULL DEFAULT 0,
+    approved INTEGER NOT NULL DEFAULT 0,
+    rejected INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0
+);
+
+-- Канали з заявками на модерацію
+CREATE INDEX IF NOT EXISTS idx_channel_post_counts_pending
+    ON channel_post_counts(channel) WHERE pending > 0;
+
+CREATE TABLE IF NOT EXISTS user_post_counts (
+    user_id BIGINT PRIMARY KEY,
+    pending INTEGER NOT NULL DEFAULT 0,
+    approved INTEGER NOT NULL DEFAULT 0,
+    rejected INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    -- Лише зростає: видалення постів його не повертає назад
+    last_post_date TIMESTAMP
+);
+
+COMMENT ON TABLE channel_post_counts IS 'Кількість заявок каналу за статусами (підтримується тригерами)';
+COMMENT ON TABLE user_post_counts IS 'Кількість заявок користувача за статусами (підтримується тригерами)';
+
+-- Застосувати зміни: по рядку на (канал, користувач, статус) зі зміною delta
+CREATE OR REPLACE FUNCTION apply_post_count_deltas(
+    channels VARCHAR[], user_ids BIGINT[], statuses VARCHAR[], deltas INTEGER[], created TIMESTAMP[]
+) RETURNS VOID AS $$
+BEGIN
+    -- Порядок за ключем: паралельні транзакції блокують рядки в однаковому порядку
+    INSERT INTO channel_post_counts AS c (channel, pending, approved, rejected, total)
+    SELECT channel,
+           COALESCE(SUM(delta) FILTER (WHERE status = 'pending'), 0),
+           COALESCE(SUM(delta) FILTER (WHERE status = 'approved'), 0),
+           COALESCE(SUM(delta) FILTER (WHERE status = 'rejected'), 0),
+           SUM(delta)
+    FROM unnest(channels, statuses, deltas) AS d(channel, status, delta)
+    GROUP BY channel
+    ORDER BY channel
+    ON CONFLICT (channel) DO UPDATE SET
+        pending = c.pending + EXCLUDED.pending,
+        approved = c.approved + EXCLUDED.approved,
+        rejected = c.rejected + EXCLUDED.rejected,
+        total = c.total + EXCLUDED.total;
+
+    INSERT INTO user_post_counts AS u (user_id, pending, approved, rejected, total, last_post_date)
+    SELECT user_id,
+           COALESCE(SUM(delta) FILTER (WHERE status = 'pending'), 0),
+           COALESCE(SUM(delta) FILTER (WHERE status = 'approved'), 0),
+           COALESCE(SUM(delta) FILTER (WHERE status = 'rejected'), 0),
+           SUM(delta),
+           MAX(created_at)
+    FROM unnest(user_ids, statuses, deltas, created) AS d(user_id, status, delta, created_at)
+    GROUP BY user_id
+    ORDER BY user_id
+    ON CONFLICT (user_id) DO UPDATE SET
+        pending = u.pending + EXCLUDED.pending,
+        approved = u.approved + EXCLUDED.approved,
+        rejected = u.rejected + EXCLUDED.rejected,
+        total = u.total + EXCLUDED.total,
+        last_post_date = GREATEST(u.last_post_date, EXCLUDED.last_post_date);
+
+    -- Канал без жодної заявки (видалений або перейменований) не тримаємо
+    DELETE FROM channel_post_counts WHERE channel = ANY(channels) AND total = 0;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION update_post_counts()
+RETURNS TRIGGER AS $$
+DECLARE
+    channels VARCHAR[];
+    user_ids BIGINT[];
+    statuses VARCHAR[];
+    deltas INTEGER[];
+    created TIMESTAMP[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(channel), array_agg(user_id), array_agg(status), array_agg(1), array_agg(created_at)
+        INTO channels, user_ids, statuses, deltas, created
+        FROM new_rows;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(channel), array_agg(user_id), array_agg(status), array_agg(-1), array_agg(NULL::TIMESTAMP)
+        INTO channels, user_ids, statuses, deltas, created
+        FROM old_rows;
+    ELSE
+        -- Оренди, scheduled_at тощо лічильників не стосуються
+        SELECT array_agg(d.channel), array_agg(d.user_id), array_agg(d.status), array_agg(d.delta),
+               array_agg(NULL::TIMESTAMP)
+        INTO channels, user_ids, statuses, deltas, created
+        FROM old_rows o
+        JOIN new_rows n ON n.id = o.id
+        CROSS JOIN LATERAL (VALUES
+            (o.channel, o.user_id, o.status, -1),
+            (n.channel, n.user_id, n.status, 1)
+        ) AS d(channel, user_id, status, delta)
+        WHERE (o.channel, o.user_id, o.status) IS DISTINCT FROM (n.channel, n.user_id, n.status);
+    END IF;
+
+    IF channels IS NOT NULL THEN
+        PERFORM apply_post_count_deltas(channels, user_ids, statuses, deltas, created);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION truncate_post_counts()
+RETURNS TRIGGER AS $$
+BEGIN
+    TRUNCATE channel_post_counts, user_post_counts;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Поки рахуємо початкові значення, нові заявки мають чекати
+LOCK TABLE posts IN SHARE ROW EXCLUSIVE MODE;
+
+DROP TRIGGER IF EXISTS trigger_post_counts_insert ON posts;
+DROP TRIGGER IF EXISTS trigger_post_counts_update ON posts;
+DROP TRIGGER IF EXISTS trigger_post_counts_delete ON posts;
+DROP TRIGGER IF EXISTS trigger_post_counts_truncate ON posts;
+
+CREATE TRIGGER trigger_post_counts_insert
+    AFTER INSERT ON posts REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION update_post_counts();
+
+CREATE TRIGGER trigger_post_counts_update
+    AFTER UPDATE ON posts REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION update_post_counts();
+
+CREATE TRIGGER trigger_post_counts_delete
+    AFTER DELETE ON posts REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION update_post_counts();
+
+CREATE TRIGGER trigger_post_counts_truncate
+    AFTER TRUNCATE ON posts
+    FOR EACH STATEMENT EXECUTE FUNCTION truncate_post_counts();
+
+TRUNCATE channel_post_counts, user_post_counts;
+
+INSERT INTO channel_post_counts (channel, pending, approved, rejected, total)
+SELECT channel,
+       COUNT(*) FILTER (WHERE status = 'pending'),
+       COUNT(*) FILTER (WHERE status = 'approved'),
+       COUNT(*) FILTER (WHERE status = 'rejected'),
+       COUNT(*)
+FROM posts
+GROUP BY channel;
+
+INSERT INTO user_post_counts (user_id, pending, approved, rejected, total, last_post_date)
+SELECT user_id,
+       COUNT(*) FILTER (WHERE status = 'pending'),
+       COUNT(*) FILTER (WHERE status = 'approved'),
+       COUNT(*) FILTER (WHERE status = 'rejected'),
+       COUNT(*),
+       MAX(created_at)
+FROM posts
+GROUP BY user_id;
+
+-- ============================================
+-- Перегляди статистики читають лічильники замість агрегації posts
+-- ============================================
+
+-- Типи колонок змінюються (INTEGER замість BIGINT), тому перестворюємо
+DROP VIEW IF EXISTS user_stats_view;
+DROP VIEW IF EXISTS channel_stats_view;
+
+CREATE VIEW user_stats_view AS
+SELECT
+    u.user_id,
+    u.username,
+    COALESCE(c.total, 0) as total_posts,
+    COALESCE(c.pending, 0) as pending,
+    COALESCE(c.approved, 0) as approved,
+    COALESCE(c.rejected, 0) as rejected,
+    c.last_post_date
+FROM users u
+LEFT JOIN user_post_counts c ON c.user_id = u.user_id;
+
+CREATE VIEW channel_stats_view AS
+SELECT
+    channel,
+    total as total_posts,
+    approved,
+    rejected,
+    pending
+FROM channel_post_counts
+ORDER BY total_posts DESC;
@@ -0,0 +1,17 @@
+-- migration: no-transaction
+-- ============================================
+-- Keyset-пагінація і фільтри історії модерації по (processed_at, id)
+-- ============================================
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_posts_history_keyset
+    ON posts(processed_at DESC, id DESC) WHERE status IN ('approved', 'rejected');
+
+-- Фільтр за каналом
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_posts_history_channel
+    ON posts(channel, processed_at DESC, id DESC) WHERE status IN ('approved', 'rejected');
+
+-- Фільтр за користувачем
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_posts_history_user
+    ON posts(user_id, processed_at DESC, id DESC) WHERE status IN ('approved', 'rejected');
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_posts_history;
@@ -0,0 +1,144 @@
+-- ============================================
+-- Щомісячні секції posts за created_at
+-- ============================================
+
+-- Старі місяці відключаються від таблиці цілком (див. retention.py) замість
+-- построкового DELETE, а індекси кожної секції лишаються невеликими.
+-- Секція місяця називається posts_РРРР_ММ.
+
+-- Створити відсутні секції для всіх місяців від from_ts до to_ts
+CREATE OR REPLACE FUNCTION ensure_posts_partitions(from_ts TIMESTAMP, to_ts TIMESTAMP)
+RETURNS INTEGER AS $$
+DECLARE
+    month TIMESTAMP := date_trunc('month', from_ts);
+    partition_name TEXT;
+    created_count INTEGER := 0;
+BEGIN
+    WHILE month <= to_ts LOOP
+        partition_name := 'posts_' || to_char(month, 'YYYY_MM');
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF posts FOR VALUES FROM (%L) TO (%L)',
+                partition_name, month, month + INTERVAL '1 month'
+            );
+            created_count := created_count + 1;
+        END IF;
+        month := month + INTERVAL '1 month';
+    END LOOP;
+    RETURN created_count;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION ensure_posts_partitions IS 'Створює щомісячні секції posts для проміжку часу';
+
+-- Під час перенесення таблиця недоступна
+LOCK TABLE posts IN ACCESS EXCLUSIVE MODE;
+LOCK TABLE publish_jobs IN ACCESS EXCLUSIVE MODE;
+
+ALTER TABLE posts RENAME TO posts_unpartitioned;
+ALTER TABLE posts_unpartitioned RENAME CONSTRAINT posts_pkey TO posts_unpartitioned_pkey;
+ALTER SEQUENCE posts_id_seq OWNED BY NONE;
+
+-- Первинний ключ секціонованої таблиці має містити ключ секціонування
+CREATE TABLE posts (
+    id INTEGER NOT NULL DEFAULT nextval('posts_id_seq'),
+    user_id BIGINT NOT NULL REFERENCES users(user_id),
+    username VARCHAR(255),
+    channel VARCHAR(255) NOT NULL,
+    message_data JSONB NOT NULL,
+    status VARCHAR(50) DEFAULT 'pending',
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    processed_at TIMESTAMP,
+    claimed_by VARCHAR(64),
+    claimed_until TIMESTAMP,
+    scheduled_at TIMESTAMP,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+ALTER SEQUENCE posts_id_seq OWNED BY posts.id;
+
+SELECT ensure_posts_partitions(
+    LEAST(LOCALTIMESTAMP, (SELECT MIN(created_at) FROM posts_unpartitioned)),
+    LOCALTIMESTAMP + INTERVAL '3 months'
+);
+
+-- Лічильники з 009 уже відповідають цим рядкам: тригери створюються після копіювання
+INSERT INTO posts (id, user_id, username, channel, message_data, status, created_at,
+                   processed_at, claimed_by, claimed_until, scheduled_at)
+SELECT id, user_id, username, channel, message_data, status,
+       COALESCE(created_at, processed_at, LOCALTIMESTAMP),
+       processed_at, claimed_by, claimed_until, scheduled_at
+FROM posts_unpartitioned;
+
+-- Зовнішній ключ на секціоновану таблицю посилається на (id, created_at)
+ALTER TABLE publish_jobs DROP CONSTRAINT IF EXISTS publish_jobs_post_id_fkey;
+ALTER TABLE publish_jobs ADD COLUMN IF NOT EXISTS post_created_at TIMESTAMP;
+UPDATE publish_jobs j SET post_created_at = p.created_at FROM posts p WHERE p.id = j.post_id;
+DELETE FROM publish_jobs WHERE post_created_at IS NULL;
+ALTER TABLE publish_jobs ALTER COLUMN post_created_at SET NOT NULL;
+ALTER TABLE publish_jobs ADD CONSTRAINT publish_jobs_post_fkey
+    FOREIGN KEY (post_id, post_created_at) REFERENCES posts(id, created_at) ON DELETE CASCADE;
+
+DROP INDEX IF EXISTS idx_publish_jobs_post_id;
+CREATE INDEX IF NOT EXISTS idx_publish_jobs_post ON publish_jobs(post_id, post_created_at);
+
+DROP VIEW IF EXISTS pending_posts_view;
+DROP TABLE posts_unpartitioned;
+
+-- Індекси створюються на кожній секції автоматично
+CREATE INDEX idx_posts_channel ON posts(channel);
+CREATE INDEX idx_posts_created_at ON posts(created_at DESC);
+CREATE INDEX idx_posts_pending_created ON posts(created_at) WHERE status = 'pending';
+CREATE INDEX idx_posts_user_created ON posts(user_id, created_at DESC);
+CREATE INDEX idx_posts_channel_scheduled ON posts(channel, scheduled_at) WHERE scheduled_at IS NOT NULL;
+CREATE INDEX idx_posts_pending_channel_keyset ON posts(channel, created_at, id) WHERE status = 'pending';
+CREATE INDEX idx_posts_claimed_by ON posts(claimed_by) WHERE claimed_by IS NOT NULL;
+CREATE INDEX idx_posts_history_keyset
+    ON posts(processed_at DESC, id DESC) WHERE status IN ('approved', 'rejected');
+CREATE INDEX idx_posts_history_channel
+    ON posts(channel, processed_at DESC, id DESC) WHERE status IN ('approved', 'rejected');
+CREATE INDEX idx_posts_history_user
+    ON posts(user_id, processed_at DESC, id DESC) WHERE status IN ('approved', 'rejected');
+
+-- Тригери
+CREATE TRIGGER trigger_update_processed_at
+    BEFORE UPDATE ON posts
+    FOR EACH ROW EXECUTE FUNCTION update_processed_at();
+
+CREATE TRIGGER trigger_post_counts_insert
+    AFTER INSERT ON posts REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION update_post_counts();
+
+CREATE TRIGGER trigger_post_counts_update
+    AFTER UPDATE ON posts REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION update_post_counts();
+
+CREATE TRIGGER trigger_post_counts_delete
+    AFTER DELETE ON posts REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION update_post_counts();
+
+CREATE TRIGGER trigger_post_counts_truncate
+    AFTER TRUNCATE ON posts
+    FOR EACH STATEMENT EXECUTE FUNCTION truncate_post_counts();
+
+CREATE VIEW pending_posts_view AS
+SELECT
+    p.id,
+    p.user_id,
+    p.username,
+    p.channel,
+    p.created_at,
+    EXTRACT(EPOCH FROM (NOW() - p.created_at))/3600 as hours_pending
+FROM posts p
+WHERE p.status = 'pending'
+ORDER BY p.created_at ASC;
+
+COMMENT ON TABLE posts IS 'Таблиця всіх постів та їх статусів (щомісячні секції за created_at)';
+COMMENT ON COLUMN posts.id IS 'Унікальний ID заявки';
+COMMENT ON COLUMN posts.user_id IS 'ID користувача, який відправив пост';
+COMMENT ON COLUMN posts.username IS 'Username користувача';
+COMMENT ON COLUMN posts.channel IS 'Назва каналу для публікації';
+COMMENT ON COLUMN posts.message_data IS 'JSON дані повідомлення (текст, фото, відео тощо)';
+COMMENT ON COLUMN posts.status IS 'Статус заявки: pending, approved, rejected';
+COMMENT ON COLUMN posts.created_at IS 'Час створення заявки';
+COMMENT ON COLUMN posts.processed_at IS 'Час обробки заявки адміністратором';
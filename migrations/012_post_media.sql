@@ -0,0 +1,114 @@
+-- ============================================
+-- Текст і медіа постів в окремих колонках замість JSON message_data
+-- ============================================
+
+-- Файли поста: по рядку на фото/відео в порядку альбому. Секціонується так само,
+-- як posts, тож секції місяця від'єднуються разом (див. retention.py).
+CREATE TABLE IF NOT EXISTS post_media (
+    post_id INTEGER NOT NULL,
+    post_created_at TIMESTAMP NOT NULL,
+    ordinal SMALLINT NOT NULL,
+    type VARCHAR(16) NOT NULL CHECK (type IN ('photo', 'video')),
+    file_id TEXT NOT NULL,
+    file_unique_id TEXT,
+    PRIMARY KEY (post_id, post_created_at, ordinal),
+    CONSTRAINT post_media_post_fkey FOREIGN KEY (post_id, post_created_at)
+        REFERENCES posts(id, created_at) ON DELETE CASCADE
+) PARTITION BY RANGE (post_created_at);
+
+-- Пости з відео (або фото), новіші спочатку
+CREATE INDEX IF NOT EXISTS idx_post_media_type
+    ON post_media(type, post_created_at DESC, post_id);
+
+-- Повторно надіслані файли. У перенесених зі старого формату постів
+-- file_unique_id невідомий
+CREATE INDEX IF NOT EXISTS idx_post_media_file_unique
+    ON post_media(file_unique_id) WHERE file_unique_id IS NOT NULL;
+
+COMMENT ON TABLE post_media IS 'Фото і відео постів (щомісячні секції за post_created_at)';
+COMMENT ON COLUMN post_media.ordinal IS 'Порядок файлу в альбомі, від 1';
+COMMENT ON COLUMN post_media.file_unique_id IS 'Незмінний ID файлу в Telegram (однаковий для повторних надсилань)';
+
+-- Секція місяця для post_media називається post_media_РРРР_ММ
+CREATE OR REPLACE FUNCTION ensure_posts_partitions(from_ts TIMESTAMP, to_ts TIMESTAMP)
+RETURNS INTEGER AS $$
+DECLARE
+    month TIMESTAMP := date_trunc('month', from_ts);
+    partition_name TEXT;
+    media_partition_name TEXT;
+    created_count INTEGER := 0;
+BEGIN
+    WHILE month <= to_ts LOOP
+        partition_name := 'posts_' || to_char(month, 'YYYY_MM');
+        media_partition_name := 'post_media_' || to_char(month, 'YYYY_MM');
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF posts FOR VALUES FROM (%L) TO (%L)',
+                partition_name, month, month + INTERVAL '1 month'
+            );
+            created_count := created_count + 1;
+        END IF;
+        IF to_regclass(media_partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF post_media FOR VALUES FROM (%L) TO (%L)',
+                media_partition_name, month, month + INTERVAL '1 month'
+            );
+        END IF;
+        month := month + INTERVAL '1 month';
+    END LOOP;
+    RETURN created_count;
+END;
+$$ LANGUAGE plpgsql;
+
+LOCK TABLE posts IN SHARE ROW EXCLUSIVE MODE;
+
+-- Секції post_media для кожної наявної секції posts
+DO $$
+DECLARE
+    month TIMESTAMP;
+BEGIN
+    FOR month IN
+        SELECT to_date(substring(c.relname FROM 7), 'YYYY_MM')
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'posts'::regclass AND c.relname ~ '^posts_\d{4}_\d{2}$'
+    LOOP
+        PERFORM ensure_posts_partitions(month, month);
+    END LOOP;
+END;
+$$;
+
+INSERT INTO post_media (post_id, post_created_at, ordinal, type, file_id)
+SELECT p.id, p.created_at, m.ordinal, m.item->>'type', m.item->>'file_id'
+FROM posts p
+CROSS JOIN LATERAL jsonb_array_elements(p.message_data->'media_group') WITH ORDINALITY AS m(item, ordinal)
+WHERE jsonb_typeof(p.message_data->'media_group') = 'array'
+UNION ALL
+SELECT p.id, p.created_at, 1, 'photo', p.message_data->>'photo'
+FROM posts p
+WHERE p.message_data->>'photo' IS NOT NULL
+  AND jsonb_typeof(p.message_data->'media_group') IS DISTINCT FROM 'array'
+UNION ALL
+SELECT p.id, p.created_at, 1, 'video', p.message_data->>'video'
+FROM posts p
+WHERE p.message_data->>'video' IS NOT NULL
+  AND p.message_data->>'photo' IS NULL
+  AND jsonb_typeof(p.message_data->'media_group') IS DISTINCT FROM 'array';
+
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS text TEXT;
+ALTER TABLE posts ALTER COLUMN message_data DROP NOT NULL;
+
+-- Переписуємо рядки вже без JSON; лічильники й processed_at це не змінює
+ALTER TABLE posts DISABLE TRIGGER trigger_update_processed_at;
+ALTER TABLE posts DISABLE TRIGGER trigger_post_counts_update;
+
+UPDATE posts
+SET text = NULLIF(COALESCE(message_data->>'caption', message_data->>'text'), ''),
+    message_data = NULL;
+
+ALTER TABLE posts ENABLE TRIGGER trigger_update_processed_at;
+ALTER TABLE posts ENABLE TRIGGER trigger_post_counts_update;
+
+ALTER TABLE posts DROP COLUMN message_data;
+
+COMMENT ON COLUMN posts.text IS 'Текст поста або підпис до медіа';
@@ -0,0 +1,188 @@
+-- ============================================
+-- posts посилається на channels.id замість назви каналу
+-- ============================================
+
+-- Перейменування каналу змінює лише рядок channels, а видалення йде
+-- каскадом через індексований зовнішній ключ (або м'яко, див. CHANNEL_DELETE_MODE).
+
+-- М'яко видалений канал прихований, але його історія лишається
+ALTER TABLE channels ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP;
+
+COMMENT ON COLUMN channels.deleted_at IS 'Час м''якого видалення каналу (NULL — активний)';
+
+LOCK TABLE posts IN SHARE ROW EXCLUSIVE MODE;
+
+DROP VIEW IF EXISTS pending_posts_view;
+DROP VIEW IF EXISTS channel_stats_view;
+
+ALTER TABLE posts ADD COLUMN IF NOT EXISTS channel_ref INTEGER;
+
+-- Заявки каналів, яких уже немає в channels, лишаються з NULL;
+-- їх видаляє cleanup_orphaned_posts під час запуску бота
+ALTER TABLE posts DISABLE TRIGGER trigger_update_processed_at;
+ALTER TABLE posts DISABLE TRIGGER trigger_post_counts_update;
+
+UPDATE posts p SET channel_ref = c.id FROM channels c WHERE c.channel_name = p.channel;
+
+ALTER TABLE posts ENABLE TRIGGER trigger_update_processed_at;
+
+ALTER TABLE posts ADD CONSTRAINT posts_channel_fkey
+    FOREIGN KEY (channel_ref) REFERENCES channels(id) ON DELETE CASCADE;
+
+-- Індекси за назвою каналу замінюються індексами за channel_ref
+DROP INDEX IF EXISTS idx_posts_channel;
+DROP INDEX IF EXISTS idx_posts_channel_scheduled;
+DROP INDEX IF EXISTS idx_posts_pending_channel_keyset;
+DROP INDEX IF EXISTS idx_posts_history_channel;
+
+-- Каскадне видалення каналу
+CREATE INDEX idx_posts_channel_ref ON posts(channel_ref);
+CREATE INDEX idx_posts_channel_scheduled
+    ON posts(channel_ref, scheduled_at) WHERE scheduled_at IS NOT NULL;
+CREATE INDEX idx_posts_pending_channel_keyset
+    ON posts(channel_ref, created_at, id) WHERE status = 'pending';
+CREATE INDEX idx_posts_history_channel
+    ON posts(channel_ref, processed_at DESC, id DESC) WHERE status IN ('approved', 'rejected');
+-- cleanup_orphaned_posts
+CREATE INDEX idx_posts_orphaned ON posts(id) WHERE channel_ref IS NULL;
+
+-- ============================================
+-- Лічильники каналів за channel_ref
+-- ============================================
+
+DROP FUNCTION IF EXISTS apply_post_count_deltas(VARCHAR[], BIGINT[], VARCHAR[], INTEGER[], TIMESTAMP[]);
+DROP TABLE IF EXISTS channel_post_counts;
+
+CREATE TABLE channel_post_counts (
+    channel_ref INTEGER PRIMARY KEY,
+    pending INTEGER NOT NULL DEFAULT 0,
+    approved INTEGER NOT NULL DEFAULT 0,
+    rejected INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX idx_channel_post_counts_pending
+    ON channel_post_counts(channel_ref) WHERE pending > 0;
+
+COMMENT ON TABLE channel_post_counts IS 'Кількість заявок каналу за статусами (підтримується тригерами)';
+
+CREATE OR REPLACE FUNCTION apply_post_count_deltas(
+    channels INTEGER[], user_ids BIGINT[], statuses VARCHAR[], deltas INTEGER[], created TIMESTAMP[]
+) RETURNS VOID AS $$
+BEGIN
+    -- Порядок за ключем: паралельні транзакції блокують рядки в однаковому порядку
+    INSERT INTO channel_post_counts AS c (channel_ref, pending, approved, rejected, total)
+    SELECT channel_ref,
+           COALESCE(SUM(delta) FILTER (WHERE status = 'pending'), 0),
+           COALESCE(SUM(delta) FILTER (WHERE status = 'approved'), 0),
+           COALESCE(SUM(delta) FILTER (WHERE status = 'rejected'), 0),
+           SUM(delta)
+    FROM unnest(channels, statuses, deltas) AS d(channel_ref, status, delta)
+    WHERE channel_ref IS NOT NULL
+    GROUP BY channel_ref
+    ORDER BY channel_ref
+    ON CONFLICT (channel_ref) DO UPDATE SET
+        pending = c.pending + EXCLUDED.pending,
+        approved = c.approved + EXCLUDED.approved,
+        rejected = c.rejected + EXCLUDED.rejected,
+        total = c.total + EXCLUDED.total;
+
+    INSERT INTO user_post_counts AS u (user_id, pending, approved, rejected, total, last_post_date)
+    SELECT user_id,
+           COALESCE(SUM(delta) FILTER (WHERE status = 'pending'), 0),
+           COALESCE(SUM(delta) FILTER (WHERE status = 'approved'), 0),
+           COALESCE(SUM(delta) FILTER (WHERE status = 'rejected'), 0),
+           SUM(delta),
+           MAX(created_at)
+    FROM unnest(user_ids, statuses, deltas, created) AS d(user_id, status, delta, created_at)
+    GROUP BY user_id
+    ORDER BY user_id
+    ON CONFLICT (user_id) DO UPDATE SET
+        pending = u.pending + EXCLUDED.pending,
+        approved = u.approved + EXCLUDED.approved,
+        rejected = u.rejected + EXCLUDED.rejected,
+        total = u.total + EXCLUDED.total,
+        last_post_date = GREATEST(u.last_post_date, EXCLUDED.last_post_date);
+
+    -- Канал без жодної заявки (наприклад, видалений) не тримаємо
+    DELETE FROM channel_post_counts WHERE channel_ref = ANY(channels) AND total = 0;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION update_post_counts()
+RETURNS TRIGGER AS $$
+DECLARE
+    channels INTEGER[];
+    user_ids BIGINT[];
+    statuses VARCHAR[];
+    deltas INTEGER[];
+    created TIMESTAMP[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(channel_ref), array_agg(user_id), array_agg(status), array_agg(1), array_agg(created_at)
+        INTO channels, user_ids, statuses, deltas, created
+        FROM new_rows;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(channel_ref), array_agg(user_id), array_agg(status), array_agg(-1), array_agg(NULL::TIMESTAMP)
+        INTO channels, user_ids, statuses, deltas, created
+        FROM old_rows;
+    ELSE
+        -- Оренди, scheduled_at тощо лічильників не стосуються
+        SELECT array_agg(d.channel_ref), array_agg(d.user_id), array_agg(d.status), array_agg(d.delta),
+               array_agg(NULL::TIMESTAMP)
+        INTO channels, user_ids, statuses, deltas, created
+        FROM old_rows o
+        JOIN new_rows n ON n.id = o.id
+        CROSS JOIN LATERAL (VALUES
+            (o.channel_ref, o.user_id, o.status, -1),
+            (n.channel_ref, n.user_id, n.status, 1)
+        ) AS d(channel_ref, user_id, status, delta)
+        WHERE (o.channel_ref, o.user_id, o.status) IS DISTINCT FROM (n.channel_ref, n.user_id, n.status);
+    END IF;
+
+    IF channels IS NOT NULL THEN
+        PERFORM apply_post_count_deltas(channels, user_ids, statuses, deltas, created);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+INSERT INTO channel_post_counts (channel_ref, pending, approved, rejected, total)
+SELECT channel_ref,
+       COUNT(*) FILTER (WHERE status = 'pending'),
+       COUNT(*) FILTER (WHERE status = 'approved'),
+       COUNT(*) FILTER (WHERE status = 'rejected'),
+       COUNT(*)
+FROM posts
+WHERE channel_ref IS NOT NULL
+GROUP BY channel_ref;
+
+ALTER TABLE posts ENABLE TRIGGER trigger_post_counts_update;
+
+ALTER TABLE posts DROP COLUMN channel;
+
+COMMENT ON COLUMN posts.channel_ref IS 'Канал для публікації (channels.id)';
+
+CREATE VIEW channel_stats_view AS
+SELECT
+    c.channel_name AS channel,
+    n.total as total_posts,
+    n.approved,
+    n.rejected,
+    n.pending
+FROM channel_post_counts n
+JOIN channels c ON c.id = n.channel_ref
+ORDER BY total_posts DESC;
+
+CREATE VIEW pending_posts_view AS
+SELECT
+    p.id,
+    p.user_id,
+    p.username,
+    c.channel_name AS channel,
+    p.created_at,
+    EXTRACT(EPOCH FROM (NOW() - p.created_at))/3600 as hours_pending
+FROM posts p
+LEFT JOIN channels c ON c.id = p.channel_ref
+WHERE p.status = 'pending'
+ORDER BY p.created_at ASC;
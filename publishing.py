@@ -0,0 +1,324 @@
+"""
+Публікація схвалених постів у канали
+"""
+
+import asyncio
+import heapq
+import logging
+import os
+import socket
+from bisect import bisect_left
+from datetime import datetime, time as dt_time, timedelta
+
+from aiogram import Bot
+from aiogram.types import InputMediaPhoto, InputMediaVideo
+
+from database import PUBLISH_JOBS_CHANNEL
+from send_scheduler import Priority, send_priority
+
+logger = logging.getLogger(__name__)
+
+
+async def publish_post(bot: Bot, channel_id: str, message: dict):
+    """Надіслати пост у канал у тому вигляді, в якому його подав користувач.
+    message — {'text': ..., 'media': [{'type', 'file_id'}, ...]}"""
+    with send_priority(Priority.PUBLISH):
+        await _send_post(bot, channel_id, message)
+
+
+def build_media_group(media: list, caption: str):
+    """InputMedia для альбому; підпис ставиться на перший файл"""
+    media_types = {'photo': InputMediaPhoto, 'video': InputMediaVideo}
+    return [
+        media_types[item['type']](media=item['file_id'], caption=caption if idx == 0 else None)
+        for idx, item in enumerate(media)
+    ]
+
+
+async def _send_post(bot: Bot, channel_id: str, message: dict):
+    media, text = message['media'], message['text']
+    if len(media) > 1:
+        await bot.send_media_group(chat_id=channel_id, media=build_media_group(media, text))
+    elif media and media[0]['type'] == 'photo':
+        await bot.send_photo(channel_id, media[0]['file_id'], caption=text)
+    elif media:
+        await bot.send_video(channel_id, media[0]['file_id'], caption=text)
+    else:
+        await bot.send_message(channel_id, text)
+
+
+async def run_bounded(items, worker, concurrency: int):
+    """Виконати worker(item) для всіх items, не більше concurrency одночасно.
+    Повертає список items, для яких worker завершився без помилки."""
+    semaphore = asyncio.Semaphore(concurrency)
+    succeeded = []
+
+    async def run_one(item):
+        async with semaphore:
+            try:
+                await worker(item)
+                succeeded.append(item)
+            except Exception as e:
+                logger.warning(f"Помилка масової дії: {e}")
+
+    await asyncio.gather(*(run_one(item) for item in items))
+    return succeeded
+
+
+def parse_slots(value: str) -> list:
+    """'09:00,18:30' -> [time(9, 0), time(18, 30)]"""
+    slots = []
+    for part in value.split(','):
+        part = part.strip()
+        if part:
+            hours, minutes = part.split(':')
+            slots.append(dt_time(int(hours), int(minutes)))
+    return sorted(slots)
+
+
+def next_free_slots(slots: list, taken_delays: list, count: int, now: datetime = None,
+                    min_gap: float = 60.0, max_days: int = 60) -> list:
+    """Секунди від now до count найближчих вільних слотів публікації.
+    taken_delays — секунди до вже запланованих постів каналу; слот зайнятий,
+    якщо до нього ближче min_gap секунд від запланованого."""
+    if not slots or count <= 0:
+        return []
+    now = now or datetime.now()
+    taken = sorted(taken_delays)
+    result = []
+    for day in range(max_days + 1):
+        date = now.date() + timedelta(days=day)
+        for slot in slots:
+            delay = (datetime.combine(date, slot) - now).total_seconds()
+            if delay <= 0:
+                continue
+            i = bisect_left(taken, delay - min_gap)
+            if i < len(taken) and taken[i] < delay + min_gap:
+                continue
+            result.append(delay)
+            if len(result) == count:
+                return result
+    return result
+
+
+class DueTimer:
+    """Один таймер event loop на найближчий момент із купи моментів.
+    Коли момент настає, викликається callback()."""
+
+    def __init__(self, callback, max_items: int = 10_000):
+        self.callback = callback
+        self.max_items = max_items
+        self._heap = []
+        self._handle = None
+        self._armed_at = None
+
+    def add(self, delay: float):
+        loop = asyncio.get_running_loop()
+        when = loop.time() + max(0.0, delay)
+        if len(self._heap) >= self.max_items:
+            # Далекі моменти все одно підхопить опитування або наступне перезавантаження
+            if when >= max(self._heap):
+                return
+            self._heap.remove(max(self._heap))
+            heapq.heapify(self._heap)
+        heapq.heappush(self._heap, when)
+        self._arm(loop)
+
+    def clear(self):
+        self._heap = []
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+            self._armed_at = None
+
+    def _arm(self, loop):
+        when = self._heap[0]
+        if self._armed_at is not None and self._armed_at <= when:
+            return
+        if self._handle is not None:
+            self._handle.cancel()
+        self._armed_at = when
+        self._handle = loop.call_at(when, self._fire)
+
+    def _fire(self):
+        self._handle = None
+        self._armed_at = None
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        due = False
+        while self._heap and self._heap[0] <= now:
+            heapq.heappop(self._heap)
+            due = True
+        if self._heap:
+            self._arm(loop)
+        if due:
+            self.callback()
+
+    def __len__(self):
+        return len(self._heap)
+
+
+class PublishWorker:
+    """Пул воркерів, що виконують задачі публікації з таблиці publish_jobs.
+
+    Задачі беруться з FOR UPDATE SKIP LOCKED, тож воркери кількох процесів бота
+    не заважають один одному. Невдала спроба повторюється з експоненційною
+    затримкою; після max_attempts задача стає dead, а заявка повертається на
+    модерацію. Відкладені задачі не опитуються: NOTIFY несе затримку, і воркери
+    прокидаються таймером саме тоді, коли найближча задача стає готовою."""
+
+    def __init__(self, db, bot: Bot, workers: int = 4, max_attempts: int = 5,
+                 lease_seconds: float = 120.0, poll_interval: float = 60.0,
+                 backoff_base: float = 5.0, max_backoff: float = 600.0,
+                 keep_done_seconds: float = 7 * 24 * 3600):
+        self.db = db
+        self.bot = bot
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.backoff_base = backoff_base
+        self.max_backoff = max_backoff
+        self.keep_done_seconds = keep_done_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+        self._wakeup = None
+        self._timer = DueTimer(self._wake)
+        self._tasks = []
+        self._cleanup_task = None
+        self._reload_task = None
+        self._stopping = False
+        self._published = 0
+        self._retried = 0
+        self._dead = 0
+
+        db.subscribe(PUBLISH_JOBS_CHANNEL, self._on_notify)
+
+    def _wake(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _on_notify(self, payload=None):
+        if self._wakeup is None:
+            return
+        if payload is None:
+            # Після перепідключення сповіщення могли загубитись
+            self._wake()
+            self._reload_task = asyncio.create_task(self._load_timers())
+            return
+        try:
+            delay = float(payload or 0)
+        except ValueError:
+            delay = 0.0
+        if delay > 0:
+            self._timer.add(delay)
+        else:
+            self._wake()
+
+    async def _load_timers(self):
+        """Поставити таймери на вже заплановані задачі (після старту чи перепідключення)"""
+        self._timer.clear()
+        for delay in await self.db.get_upcoming_publish_delays(self._timer.max_items):
+            self._timer.add(delay)
+
+    async def _run(self):
+        while not self._stopping:
+            jobs = await self.db.claim_publish_jobs(self.worker_id, 1, self.lease_seconds)
+            if not jobs:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+            await self._process(jobs[0])
+
+    async def _publish_with_lease(self, job) -> bool:
+        """Надіслати пост, продовжуючи оренду задачі, поки триває надсилання
+        (SendScheduler може чекати на RetryAfter довше за оренду). Якщо оренду
+        втрачено, надсилання переривається і повертається False."""
+        send = asyncio.create_task(publish_post(self.bot, job['channel_id'], job['message']))
+        try:
+            while True:
+                done, _ = await asyncio.wait({send}, timeout=self.lease_seconds / 3)
+                if done:
+                    send.result()
+                    return True
+                if not await self.db.renew_publish_job(job['id'], self.worker_id, self.lease_seconds):
+                    return False
+        finally:
+            if not send.done():
+                send.cancel()
+                await asyncio.gather(send, return_exceptions=True)
+
+    async def _process(self, job):
+        try:
+            if not await self._publish_with_lease(job):
+                logger.warning(f"Публікацію #{job['post_id']} перервано: задачу скасовано або її взяв інший воркер")
+                return
+        except Exception as e:
+            retry_in = min(self.max_backoff, self.backoff_base * 2 ** (job['attempts'] - 1))
+            status = await self.db.fail_publish_job(
+                job['id'], self.worker_id, str(e), retry_in, self.max_attempts
+            )
+            if status == 'dead':
+                self._dead += 1
+                logger.error(
+                    f"Публікація #{job['post_id']} у {job['channel_id']} не вдалась після "
+                    f"{job['attempts']} спроб, заявку повернуто на модерацію: {e}"
+                )
+            else:
+                self._retried += 1
+                logger.warning(f"Публікація #{job['post_id']}: {e}; повтор через {retry_in:.1f} с")
+            return
+
+        if not await self.db.complete_publish_job(job['id'], self.worker_id):
+            # Оренду втрачено під час надсилання: задачу завершує або скасовує хтось інший
+            logger.warning(f"Публікація #{job['post_id']}: задачу вже не утримує цей воркер")
+            return
+        self._published += 1
+        try:
+            with send_priority(Priority.NOTIFY):
+                await self.bot.send_message(job['user_id'], f"✅ Пост опубліковано в '{job['channel']}'!")
+        except Exception as e:
+            logger.warning(f"Не вдалося сповістити користувача {job['user_id']}: {e}")
+
+    async def _cleanup(self):
+        while not self._stopping:
+            deleted = await self.db.delete_finished_publish_jobs(self.keep_done_seconds)
+            if deleted:
+                logger.info(f"🧹 Видалено {deleted} виконаних задач публікації")
+            await asyncio.sleep(3600)
+
+    async def start(self):
+        if not self._tasks:
+            self._stopping = False
+            self._wakeup = asyncio.Event()
+            await self._load_timers()
+            self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+            self._cleanup_task = asyncio.create_task(self._cleanup())
+
+    async def stop(self, timeout: float = 30.0):
+        """Дочекатись поточних публікацій і зупинити воркерів"""
+        self._stopping = True
+        self._timer.clear()
+        if self._wakeup is not None:
+            self._wakeup.set()
+        if self._cleanup_task is not None:
+            self._cleanup_task.cancel()
+            self._cleanup_task = None
+        if self._tasks:
+            _, pending = await asyncio.wait(self._tasks, timeout=timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> dict:
+        return {
+            'workers': self.workers,
+            'published': self._published,
+            'retried': self._retried,
+            'dead': self._dead,
+            'timers': len(self._timer),
+        }
@@ -0,0 +1,250 @@
+"""
+Реєстр іменованих запитів шару даних.
+
+Гарячі запити (ті, що виконуються на кожне оновлення) описані тут один раз
+з плейсхолдерами $1, $2, ... і явними типами параметрів. На кожному
+підключенні пулу запит готується через PREPARE при першому використанні,
+далі виконується як EXECUTE ім'я(...) — без повторного розбору і планування.
+Для кожного запиту ведуться лічильники викликів і часу виконання.
+"""
+
+import threading
+import time
+import weakref
+
+from psycopg2 import errors
+
+
+# Текст і файли поста одним JSON {'text': ..., 'media': [{'type', 'file_id'}, ...]};
+# запит має звертатися до posts через псевдонім p
+POST_MESSAGE_SQL = """json_build_object(
+    'text', COALESCE(p.text, ''),
+    'media', COALESCE((
+        SELECT json_agg(json_build_object('type', m.type, 'file_id', m.file_id) ORDER BY m.ordinal)
+        FROM post_media m
+        WHERE m.post_id = p.id AND m.post_created_at = p.created_at
+    ), '[]'::json)
+) AS message"""
+
+# Назва каналу поста (posts посилається на channels.id); псевдонім posts — p
+POST_CHANNEL_SQL = "(SELECT c.channel_name FROM channels c WHERE c.id = p.channel_ref) AS channel"
+
+
+class QueryRegistry:
+    def __init__(self):
+        self._queries = {}
+        # Імена запитів, уже підготовлених на кожному підключенні
+        self._prepared = weakref.WeakKeyDictionary()
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, sql: str, types: tuple = ()) -> str:
+        """Зареєструвати запит; у sql параметри позначаються $1, $2, ... у порядку types"""
+        if name in self._queries:
+            raise ValueError(f"Запит {name} уже зареєстровано")
+        if not name.isidentifier():
+            raise ValueError(f"Невірне ім'я запиту: {name}")
+        self._queries[name] = (sql, tuple(types))
+        self._stats[name] = {'calls': 0, 'errors': 0, 'prepares': 0, 'total': 0.0, 'max': 0.0}
+        return name
+
+    def _prepare(self, cursor, name: str):
+        sql, types = self._queries[name]
+        signature = f" ({', '.join(types)})" if types else ""
+        cursor.execute(f"PREPARE {name}{signature} AS {sql}")
+
+    def _ensure_prepared(self, cursor, name: str):
+        conn = cursor.connection
+        with self._lock:
+            prepared = self._prepared.setdefault(conn, set())
+            if name in prepared:
+                return
+        try:
+            self._prepare(cursor, name)
+        except errors.DuplicatePreparedStatement:
+            # Підготовлено раніше, але облік втрачено
+            pass
+        with self._lock:
+            prepared.add(name)
+            self._stats[name]['prepares'] += 1
+
+    def _forget(self, cursor, name: str):
+        with self._lock:
+            self._prepared.get(cursor.connection, set()).discard(name)
+
+    def execute(self, cursor, name: str, params: tuple = ()):
+        """Виконати запит name на курсорі (блокуючий виклик, у потоці пулу)"""
+        if name not in self._queries:
+            raise KeyError(f"Невідомий запит: {name}")
+        types = self._queries[name][1]
+        if len(params) != len(types):
+            raise ValueError(f"Запит {name} очікує {len(types)} параметрів, отримано {len(params)}")
+        statement = f"EXECUTE {name}({', '.join(['%s'] * len(params))})" if params else f"EXECUTE {name}"
+
+        self._ensure_prepared(cursor, name)
+        started = time.perf_counter()
+        try:
+            try:
+                cursor.execute(statement, params)
+            except errors.InvalidSqlStatementName:
+                # Підготовлений запит зник (DISCARD ALL, перезапуск сесії тощо)
+                self._forget(cursor, name)
+                self._ensure_prepared(cursor, name)
+                cursor.execute(statement, params)
+        except Exception:
+            with self._lock:
+                self._stats[name]['errors'] += 1
+            raise
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            stats = self._stats[name]
+            stats['calls'] += 1
+            stats['total'] += elapsed
+            stats['max'] = max(stats['max'], elapsed)
+
+    def stats(self) -> list:
+        """Лічильники запитів, найдорожчі за сумарним часом спочатку (час у мс)"""
+        with self._lock:
+            rows = [
+                {
+                    'name': name,
+                    'calls': stats['calls'],
+                    'errors': stats['errors'],
+                    'prepares': stats['prepares'],
+                    'total_ms': round(stats['total'] * 1000, 3),
+                    'avg_ms': round(stats['total'] * 1000 / stats['calls'], 3) if stats['calls'] else 0.0,
+                    'max_ms': round(stats['max'] * 1000, 3),
+                }
+                for name, stats in self._stats.items()
+            ]
+        return sorted(rows, key=lambda row: row['total_ms'], reverse=True)
+
+    def reset_stats(self):
+        with self._lock:
+            for stats in self._stats.values():
+                stats.update(calls=0, errors=0, prepares=0, total=0.0, max=0.0)
+
+
+QUERIES = QueryRegistry()
+
+QUERIES.register('add_user', """
+    INSERT INTO users (user_id, username)
+    VALUES ($1, $2)
+    ON CONFLICT (user_id) DO UPDATE
+    SET username = EXCLUDED.username
+""", ('BIGINT', 'VARCHAR'))
+
+QUERIES.register('is_admin', """
+    SELECT EXISTS(
+        SELECT 1 FROM admins WHERE user_id = $1
+    )
+""", ('BIGINT',))
+
+# Медіа передаються паралельними масивами: типи, file_id, file_unique_id
+QUERIES.register('add_post', """
+    WITH inserted AS (
+        INSERT INTO posts (user_id, username, channel_ref, text, status)
+        SELECT $1, $2, id, $4, 'pending'
+        FROM channels
+        WHERE channel_name = $3 AND deleted_at IS NULL
+        RETURNING id, created_at
+    ), media AS (
+        INSERT INTO post_media (post_id, post_created_at, ordinal, type, file_id, file_unique_id)
+        SELECT i.id, i.created_at, m.ordinal, m.type, m.file_id, m.file_unique_id
+        FROM inserted i,
+             unnest($5, $6, $7) WITH ORDINALITY AS m(type, file_id, file_unique_id, ordinal)
+    )
+    SELECT id FROM inserted
+""", ('BIGINT', 'VARCHAR', 'VARCHAR', 'TEXT', 'VARCHAR[]', 'TEXT[]', 'TEXT[]'))
+
+QUERIES.register('add_post_rate_limited', """
+    WITH channel AS (
+        SELECT id FROM channels WHERE channel_name = $3 AND deleted_at IS NULL
+    ), claimed AS (
+        INSERT INTO users (user_id, username, last_post_at)
+        SELECT $1, $2, LOCALTIMESTAMP FROM channel
+        ON CONFLICT (user_id) DO UPDATE
+        SET last_post_at = EXCLUDED.last_post_at
+        WHERE users.last_post_at IS NULL
+           OR users.last_post_at <= LOCALTIMESTAMP - make_interval(secs => $8)
+        RETURNING user_id
+    ), inserted AS (
+        INSERT INTO posts (user_id, username, channel_ref, text, status)
+        SELECT claimed.user_id, $2, channel.id, $4, 'pending'
+        FROM claimed, channel
+        RETURNING id, created_at
+    ), media AS (
+        INSERT INTO post_media (post_id, post_created_at, ordinal, type, file_id, file_unique_id)
+        SELECT i.id, i.created_at, m.ordinal, m.type, m.file_id, m.file_unique_id
+        FROM inserted i,
+             unnest($5, $6, $7) WITH ORDINALITY AS m(type, file_id, file_unique_id, ordinal)
+    )
+    SELECT
+        (SELECT id FROM inserted) AS post_id,
+        NOT EXISTS (SELECT 1 FROM channel) AS channel_missing,
+        (SELECT EXTRACT(EPOCH FROM (last_post_at + make_interval(secs => $8) - LOCALTIMESTAMP))
+         FROM users WHERE user_id = $1) AS retry_after
+""", ('BIGINT', 'VARCHAR', 'VARCHAR', 'TEXT', 'VARCHAR[]', 'TEXT[]', 'TEXT[]', 'DOUBLE PRECISION'))
+
+QUERIES.register('get_last_post_time', """
+    SELECT created_at
+    FROM posts
+    WHERE user_id = $1
+    ORDER BY created_at DESC
+    LIMIT 1
+""", ('BIGINT',))
+
+QUERIES.register('get_recent_post_times', """
+    SELECT user_id,
+           (array_agg(EXTRACT(EPOCH FROM (LOCALTIMESTAMP - created_at))
+                      ORDER BY created_at DESC))[1:$1] AS ages
+    FROM posts
+    WHERE created_at > LOCALTIMESTAMP - make_interval(secs => $2)
+      AND ($3 IS NULL OR user_id = $3)
+    GROUP BY user_id
+""", ('INTEGER', 'DOUBLE PRECISION', 'BIGINT'))
+
+QUERIES.register('get_spam_settings', """
+    SELECT setting_key, setting_value
+    FROM settings
+    WHERE setting_key IN ('spam_protection_enabled', 'spam_protection_minutes')
+""")
+
+QUERIES.register('load_fsm_session', """
+    SELECT state, data FROM fsm_sessions
+    WHERE key = $1 AND updated_at > LOCALTIMESTAMP - make_interval(secs => $2)
+""", ('TEXT', 'DOUBLE PRECISION'))
+
+QUERIES.register('get_all_channels', """
+    SELECT channel_name, channel_id
+    FROM channels
+    WHERE deleted_at IS NULL
+    ORDER BY channel_name
+""")
+
+QUERIES.register('count_pending_posts', """
+    SELECT pending FROM channel_post_counts
+    WHERE channel_ref = (SELECT id FROM channels WHERE channel_name = $1)
+""", ('VARCHAR',))
+
+QUERIES.register('get_user_stats', """
+    SELECT pending, approved, rejected
+    FROM user_post_counts
+    WHERE user_id = $1
+""", ('BIGINT',))
+
+QUERIES.register('get_post_by_id', f"""
+    SELECT p.id, p.user_id, p.username, {POST_CHANNEL_SQL}, {POST_MESSAGE_SQL}, p.created_at
+    FROM posts p
+    WHERE p.id = $1
+""", ('INTEGER',))
+
+# pending → status, якщо заявку не орендував інший модератор
+QUERIES.register('transition_post_status', f"""
+    UPDATE posts p
+    SET status = $1, processed_at = CURRENT_TIMESTAMP,
+        claimed_by = NULL, claimed_until = NULL
+    WHERE p.id = $2 AND p.status = 'pending'
+      AND (p.claimed_until IS NULL OR p.claimed_until < LOCALTIMESTAMP OR p.claimed_by = $3)
+    RETURNING p.id, p.user_id, {POST_CHANNEL_SQL}
+""", ('VARCHAR', 'INTEGER', 'VARCHAR'))
@@ -0,0 +1,190 @@
+"""
+Обмеження частоти постів користувачів без запитів до БД на кожну перевірку.
+
+Стан зберігається в пам'яті з обмеженням кількості користувачів і TTL:
+записи, старші за вікно політики, вже ні на що не впливають і видаляються.
+"""
+
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class CooldownPolicy:
+    """Не більше одного посту за window секунд (поведінка за замовчуванням)"""
+    window: float
+
+    history_size = 1
+
+    @property
+    def ttl(self):
+        return self.window
+
+    def new_state(self):
+        return [0.0]
+
+    def retry_after(self, state, now: float) -> float:
+        return max(0.0, state[0] + self.window - now)
+
+    def consume(self, state, now: float):
+        state[0] = max(state[0], now)
+
+
+@dataclass(frozen=True)
+class SlidingWindowPolicy:
+    """Не більше limit постів за будь-які window секунд"""
+    window: float
+    limit: int
+
+    @property
+    def history_size(self):
+        return self.limit
+
+    @property
+    def ttl(self):
+        return self.window
+
+    def new_state(self):
+        return deque(maxlen=self.limit)
+
+    def retry_after(self, state, now: float) -> float:
+        if len(state) < self.limit:
+            return 0.0
+        return max(0.0, state[0] + self.window - now)
+
+    def consume(self, state, now: float):
+        state.append(now)
+
+
+@dataclass(frozen=True)
+class TokenBucketPolicy:
+    """Запас до capacity постів, один пост відновлюється кожні window секунд"""
+    window: float
+    capacity: int
+
+    @property
+    def history_size(self):
+        return self.capacity
+
+    @property
+    def ttl(self):
+        # За цей час порожній кошик гарантовано наповнюється
+        return self.window * self.capacity
+
+    def new_state(self):
+        return [float(self.capacity), 0.0]
+
+    def _refill(self, state, now: float):
+        tokens, updated_at = state
+        if now > updated_at:
+            tokens = min(self.capacity, tokens + (now - updated_at) / self.window)
+            state[0], state[1] = tokens, now
+
+    def retry_after(self, state, now: float) -> float:
+        self._refill(state, now)
+        if state[0] >= 1:
+            return 0.0
+        return (1 - state[0]) * self.window
+
+    def consume(self, state, now: float):
+        self._refill(state, now)
+        state[0] -= 1
+
+
+POLICIES = {
+    'cooldown': lambda window, burst: CooldownPolicy(window),
+    'sliding_window': lambda window, burst: SlidingWindowPolicy(window, burst),
+    'token_bucket': lambda window, burst: TokenBucketPolicy(window, burst),
+}
+
+
+def build_policy(name: str, window: float, burst: int = 1):
+    if name not in POLICIES:
+        raise ValueError(f"Невідома політика обмеження: {name}")
+    return POLICIES[name](window, max(1, burst))
+
+
+class RateLimiter:
+    def __init__(self, policy, max_users: int = 100_000):
+        self.policy = policy
+        self.max_users = max_users
+        # user_id -> (час останнього посту, стан політики); порядок = порядок постів
+        self._states = OrderedDict()
+        # True, коли в пам'яті є всі користувачі з постами в межах TTL політики
+        self.complete = False
+
+    def configure(self, policy):
+        """Змінити політику; при зміні типу накопичений стан відкидається"""
+        if policy == self.policy:
+            return
+        if type(policy) is not type(self.policy):
+            self._states.clear()
+            self.complete = False
+        elif policy.ttl > self.policy.ttl:
+            # Зі збільшенням вікна стають важливими вже видалені записи
+            self.complete = False
+        self.policy = policy
+
+    def purge(self, now: float = None):
+        """Видалити записи, старші за TTL політики"""
+        now = time.time() if now is None else now
+        expire_before = now - self.policy.ttl
+        while self._states:
+            user_id, (last_at, _) = next(iter(self._states.items()))
+            if last_at >= expire_before:
+                break
+            self._states.popitem(last=False)
+
+    def _store(self, user_id: int, last_at: float, state):
+        self._states.pop(user_id, None)
+        # Стан із БД буває старішим за вже наявні записи: ставимо його на місце за часом,
+        # переносячи новіші записи в кінець, бо purge() зупиняється на першому живому
+        newer = []
+        for other_id in reversed(self._states):
+            if self._states[other_id][0] <= last_at:
+                break
+            newer.append(other_id)
+        self._states[user_id] = (last_at, state)
+        for other_id in reversed(newer):
+            self._states.move_to_end(other_id)
+        while len(self._states) > self.max_users:
+            _, (evicted_at, _) = self._states.popitem(last=False)
+            if evicted_at >= time.time() - self.policy.ttl:
+                self.complete = False
+
+    def retry_after(self, user_id: int, now: float = None):
+        """Секунди до дозволеного посту, або None, якщо стан невідомий (треба БД)"""
+        now = time.time() if now is None else now
+        entry = self._states.get(user_id)
+        if entry is None:
+            return 0.0 if self.complete else None
+        last_at, state = entry
+        if last_at < now - self.policy.ttl:
+            del self._states[user_id]
+            return 0.0
+        return self.policy.retry_after(state, now)
+
+    def record(self, user_id: int, now: float = None):
+        """Врахувати новий пост користувача"""
+        now = time.time() if now is None else now
+        entry = self._states.get(user_id)
+        state = entry[1] if entry else self.policy.new_state()
+        self.policy.consume(state, now)
+        self._store(user_id, now, state)
+
+    def load(self, user_id: int, timestamps):
+        """Відновити стан користувача з часів його постів (з БД)"""
+        state = self.policy.new_state()
+        for posted_at in sorted(timestamps):
+            self.policy.consume(state, posted_at)
+        # Порожня історія теж запам'ятовується, щоб не питати БД повторно
+        self._store(user_id, max(timestamps) if timestamps else time.time(), state)
+
+    def stats(self) -> dict:
+        return {
+            'users': len(self._states),
+            'max_users': self.max_users,
+            'complete': self.complete,
+            'policy': type(self.policy).__name__,
+        }
@@ -0,0 +1,85 @@
+"""
+Обслуговування секцій таблиці posts.
+
+posts розбита на щомісячні секції за created_at (міграція 011), post_media —
+так само за post_created_at (012). Фонове завдання заздалегідь створює секції
+наступних місяців, а секції, старші за термін зберігання, від'єднує цілком:
+замість построкового DELETE — gzip CSV в каталозі архіву і DROP TABLE (або лише
+від'єднання, якщо архів вимкнено). Видалення вимкнене за замовчуванням і
+вимагає абсолютного шляху до архіву.
+"""
+
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+class PostsRetention:
+    def __init__(self, db, retention_months: int = 0, archive_dir: str = None,
+                 months_ahead: int = 3, interval: float = 6 * 3600):
+        """retention_months=0 — зберігати всі секції"""
+        self.db = db
+        self.retention_months = retention_months
+        self.archive_dir = archive_dir
+        self.months_ahead = months_ahead
+        self.interval = interval
+
+        self._task = None
+        self._created = 0
+        self._archived = 0
+        self._archived_rows = 0
+
+    async def run_once(self):
+        created = await self.db.ensure_posts_partitions(self.months_ahead)
+        if created:
+            self._created += created
+            logger.info(f"🗂 Створено {created} нових секцій posts")
+        if self.retention_months <= 0:
+            return
+        if self.archive_dir and not os.path.isabs(self.archive_dir):
+            # Відносний шлях залежить від робочого каталогу процесу: архів легко загубити
+            logger.error(f"Каталог архіву posts має бути абсолютним шляхом ({self.archive_dir}), "
+                         f"старі секції не від'єднуються")
+            return
+
+        for name in await self.db.get_expired_posts_partitions(self.retention_months):
+            path = None
+            if self.archive_dir:
+                os.makedirs(self.archive_dir, exist_ok=True)
+                path = os.path.join(self.archive_dir, f"{name}.csv.gz")
+            rows = await self.db.archive_posts_partition(name, path)
+            if rows is None:
+                continue
+            self._archived += 1
+            self._archived_rows += rows
+            where = f"у {path}" if path else f"як archived_{name}"
+            logger.info(f"📦 Секцію {name} ({rows} постів) від'єднано {where}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Помилка обслуговування секцій posts: {e}")
+
+    async def start(self):
+        """Одразу створити секції наперед, далі працювати у фоні"""
+        if self._task is None:
+            await self.run_once()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            'partitions_created': self._created,
+            'partitions_archived': self._archived,
+            'archived_posts': self._archived_rows,
+        }
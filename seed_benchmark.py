@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Заповнення схеми для бенчмарків database.py синтетичними даними.
+
+Скрипт створює окрему схему, застосовує в ній міграції і завантажує
+користувачів та пости через COPY порціями. Розподіл наближений до робочого:
+кілька каналів і користувачів мають більшість постів, старі заявки вже
+оброблені, нові чекають модерації, частина постів має фото й відео, а кілька
+заявок лишаються без каналу. Дані детерміновані для однакового --seed, тож
+звіти benchmark.py з різних запусків можна порівнювати. Робочі таблиці не
+зачіпаються.
+
+Приклад: python seed_benchmark.py --posts 10000000 --users 100000 --channels 500
+"""
+
+import argparse
+import asyncio
+import io
+import random
+import time
+from datetime import datetime, timedelta
+
+from config import DB_CONFIG
+from database import Database
+
+SCHEMA = 'benchmark'
+
+# Рядків в одному COPY
+CHUNK_ROWS = 200_000
+
+
+def pick(rng: random.Random, count: int, skew: float) -> int:
+    """Номер від 1 до count; чим більший skew, тим частіше випадають перші номери"""
+    return 1 + min(count - 1, int(count * rng.random() ** skew))
+
+
+def copy_rows(cursor, table: str, columns: tuple, buffer: io.StringIO):
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def write_users(cursor, users: int):
+    buffer = io.StringIO()
+    for user_id in range(1, users + 1):
+        buffer.write(f"{user_id},user_{user_id}\n")
+    copy_rows(cursor, 'users', ('user_id', 'username'), buffer)
+
+
+def write_posts(cursor, first_id: int, count: int, total: int, start: datetime, step: float,
+                args, rng: random.Random) -> int:
+    """Одна порція постів і їхніх файлів; повертає кількість файлів"""
+    posts = io.StringIO()
+    media = io.StringIO()
+    media_rows = 0
+    pending_from = total - int(total * args.pending)
+    for post_id in range(first_id, first_id + count):
+        created = start + timedelta(seconds=(post_id - 1) * step)
+        user_id = pick(rng, args.users, 3)
+        channel = '' if rng.random() < args.orphans else pick(rng, args.channels, 2)
+        if post_id > pending_from:
+            status, processed = 'pending', ''
+        else:
+            status = 'rejected' if post_id % 3 == 0 else 'approved'
+            processed = created + timedelta(seconds=rng.randint(60, 6 * 3600))
+        posts.write(f"{post_id},{user_id},user_{user_id},{channel},Пост {post_id},{status},{created},{processed}\n")
+
+        # Кожен 4-й пост з фото (частина файлів повторюється), кожен 20-й ще й з відео
+        if post_id % 4 == 0:
+            media.write(f"{post_id},{created},1,photo,photo_{post_id},u{rng.randint(1, total // 5 + 1)}\n")
+            media_rows += 1
+        if post_id % 20 == 0:
+            media.write(f"{post_id},{created},2,video,video_{post_id},v{post_id}\n")
+            media_rows += 1
+
+    copy_rows(cursor, 'posts', ('id', 'user_id', 'username', 'channel_ref', 'text', 'status',
+                                'created_at', 'processed_at'), posts)
+    copy_rows(cursor, 'post_media', ('post_id', 'post_created_at', 'ordinal', 'type',
+                                     'file_id', 'file_unique_id'), media)
+    return media_rows
+
+
+async def seed(args):
+    started = time.perf_counter()
+    admin = Database()
+    if args.reset:
+        # Не видаляти схему з робочими таблицями бота
+        row = await admin.fetchone("SELECT current_schema() AS name")
+        working = row['name'] if row else None
+        if args.schema in ('public', working):
+            await admin.close()
+            print(f"❌ Схема {args.schema} містить робочі таблиці; --reset дозволено лише для окремої схеми")
+            return False
+        await admin.execute(f"DROP SCHEMA IF EXISTS {args.schema} CASCADE")
+    exists = await admin.fetchone(
+        "SELECT 1 FROM information_schema.schemata WHERE schema_name = %s", (args.schema,)
+    )
+    if exists:
+        await admin.close()
+        print(f"❌ Схема {args.schema} уже існує; --reset перезаповнить її")
+        return False
+    await admin.execute(f"CREATE SCHEMA {args.schema}")
+    await admin.close()
+
+    db = Database({**DB_CONFIG, 'options': f'-c search_path={args.schema}'})
+    try:
+        await db.migrate()
+        rng = random.Random(args.seed)
+        now = datetime.now().replace(microsecond=0)
+        start = now - timedelta(days=30 * args.months)
+        step = (now - start).total_seconds() / max(1, args.posts)
+
+        def prepare(cursor):
+            write_users(cursor, args.users)
+            cursor.execute("""
+                INSERT INTO channels (channel_name, channel_id)
+                SELECT 'Канал ' || g, '@bench_' || g FROM generate_series(1, %s) g
+            """, (args.channels,))
+            cursor.execute("SELECT ensure_posts_partitions(%s, %s)", (start, now + timedelta(days=90)))
+
+        print(f"👥 {args.users} користувачів, {args.channels} каналів...")
+        await db.run(prepare)
+
+        media_rows = 0
+        for first_id in range(1, args.posts + 1, CHUNK_ROWS):
+            count = min(CHUNK_ROWS, args.posts - first_id + 1)
+            media_rows += await db.run(write_posts, first_id, count, args.posts, start, step, args, rng)
+            loaded = first_id + count - 1
+            print(f"  📥 {loaded}/{args.posts} постів ({time.perf_counter() - started:.0f} с)")
+
+        def finish(cursor):
+            cursor.execute("SELECT setval('posts_id_seq', GREATEST(%s, 1))", (args.posts,))
+            cursor.execute("ANALYZE")
+
+        print("📊 ANALYZE...")
+        await db.run(finish)
+    finally:
+        await db.close()
+
+    print(f"✅ Схема {args.schema}: {args.posts} постів, {media_rows} файлів "
+          f"за {time.perf_counter() - started:.0f} с")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--schema', default=SCHEMA)
+    parser.add_argument('--posts', type=int, default=10_000_000)
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--channels', type=int, default=500)
+    parser.add_argument('--months', type=int, default=12, help="за скільки місяців розподілені пости")
+    parser.add_argument('--pending', type=float, default=0.01, help="частка найновіших постів, що чекають модерації")
+    parser.add_argument('--orphans', type=float, default=0.0001, help="частка постів без каналу")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--reset', action='store_true', help="видалити схему, якщо вона вже є")
+    args = parser.parse_args()
+    raise SystemExit(0 if asyncio.run(seed(args)) else 1)
@@ -0,0 +1,201 @@
+"""
+Планувальник вихідних запитів до Telegram Bot API.
+
+Усі надсилання проходять через спільний кошик токенів (глобальний ліміт бота)
+і кошик конкретного чату. Коли токенів бракує, запити чекають у черзі за
+пріоритетом: публікації в канали йдуть раніше за відповіді, прев'ю та
+сповіщення. На RetryAfter чат призупиняється, а запит повторюється.
+"""
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import time
+from contextlib import contextmanager
+from enum import IntEnum
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendChatAction, SendMediaGroup
+
+logger = logging.getLogger(__name__)
+
+# Методи, що надсилають або змінюють повідомлення в чаті і підпадають під ліміти
+THROTTLED_PREFIXES = ('Send', 'Forward', 'Copy', 'Edit')
+
+
+class Priority(IntEnum):
+    """Менше значення обслуговується раніше"""
+    PUBLISH = 0
+    REPLY = 1
+    PREVIEW = 2
+    NOTIFY = 3
+
+
+_current_priority = contextvars.ContextVar('send_priority', default=Priority.REPLY)
+
+
+@contextmanager
+def send_priority(priority: Priority):
+    """Надсилання всередині блоку отримують вказаний пріоритет"""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+class PriorityTokenBucket:
+    """Кошик токенів, що видає токени чекаючим у порядку пріоритету"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._waiters = []
+        self._seq = itertools.count()
+        self._timer = None
+
+    def _refill(self, now: float):
+        if now > self._updated_at:
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+
+    def _need(self, cost: int) -> float:
+        # Дорожчий за весь кошик запит (альбом) чекає повного кошика і йде в борг
+        return min(cost, self.capacity)
+
+    @property
+    def idle(self) -> bool:
+        """Кошик без черги і повний: його можна забути без втрати стану"""
+        now = time.monotonic()
+        self._refill(now)
+        return not self._waiters and now >= self._paused_until and self.tokens >= self.capacity
+
+    async def acquire(self, cost: int = 1, priority: int = Priority.REPLY):
+        now = time.monotonic()
+        self._refill(now)
+        if not self._waiters and now >= self._paused_until and self.tokens >= self._need(cost):
+            self.tokens -= cost
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), cost, future))
+        # Новий запит може мати вищий пріоритет за поточну голову черги
+        if self._timer is not None:
+            self._timer.cancel()
+        self._serve()
+        await future
+
+    def pause(self, seconds: float):
+        """Не видавати токени seconds секунд (після RetryAfter)"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self.tokens = min(self.tokens, 0.0)
+        if self._timer is not None:
+            self._timer.cancel()
+            self._serve()
+
+    def _serve(self):
+        self._timer = None
+        now = time.monotonic()
+        self._refill(now)
+        delay = None
+        while self._waiters:
+            _, _, cost, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if now < self._paused_until:
+                delay = self._paused_until - now
+                break
+            need = self._need(cost)
+            if self.tokens < need:
+                delay = (need - self.tokens) / self.rate
+                break
+            heapq.heappop(self._waiters)
+            self.tokens -= cost
+            future.set_result(None)
+        if delay is not None:
+            self._timer = asyncio.get_running_loop().call_later(delay, self._serve)
+
+    def queued(self) -> dict:
+        counts = {}
+        for priority, _, _, future in self._waiters:
+            if not future.done():
+                name = Priority(priority).name
+                counts[name] = counts.get(name, 0) + 1
+        return counts
+
+
+class SendScheduler(BaseRequestMiddleware):
+    """Middleware сесії бота: bot.session.middleware(SendScheduler(...))"""
+
+    def __init__(self, global_rate: float = 30.0, private_rate: float = 1.0, private_burst: int = 3,
+                 group_per_minute: float = 20.0, group_burst: int = 3, max_retries: int = 5,
+                 backoff_base: float = 0.5, max_backoff: float = 30.0, max_chats: int = 10_000):
+        self.global_bucket = PriorityTokenBucket(global_rate, global_rate)
+        self.private_rate = private_rate
+        self.private_burst = private_burst
+        self.group_rate = group_per_minute / 60
+        self.group_burst = group_burst
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.max_backoff = max_backoff
+        self.max_chats = max_chats
+        self._chats = {}
+        self._sent = 0
+        self._retries = 0
+
+    def _chat_bucket(self, chat_id) -> PriorityTokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= self.max_chats:
+                self._chats = {key: b for key, b in self._chats.items() if not b.idle}
+            # Додатний ID — особистий чат; від'ємний або @username — група чи канал
+            if isinstance(chat_id, int) and chat_id > 0:
+                bucket = PriorityTokenBucket(self.private_rate, self.private_burst)
+            else:
+                bucket = PriorityTokenBucket(self.group_rate, self.group_burst)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    async def __call__(self, make_request, bot, method):
+        chat_id = getattr(method, 'chat_id', None)
+        if (chat_id is None or isinstance(method, SendChatAction)
+                or not type(method).__name__.startswith(THROTTLED_PREFIXES)):
+            return await make_request(bot, method)
+
+        priority = _current_priority.get()
+        cost = len(method.media) if isinstance(method, SendMediaGroup) else 1
+        attempt = 0
+        while True:
+            chat_bucket = self._chat_bucket(chat_id)
+            await chat_bucket.acquire(cost, priority)
+            await self.global_bucket.acquire(cost, priority)
+            try:
+                response = await make_request(bot, method)
+                self._sent += 1
+                return response
+            except TelegramRetryAfter as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                self._retries += 1
+                delay = e.retry_after + min(self.max_backoff, self.backoff_base * 2 ** (attempt - 1))
+                logger.warning(
+                    f"RetryAfter {e.retry_after} с для {type(method).__name__} у чаті {chat_id}, "
+                    f"повтор {attempt}/{self.max_retries} через {delay:.1f} с"
+                )
+                chat_bucket.pause(delay)
+
+    def stats(self) -> dict:
+        return {
+            'sent': self._sent,
+            'retries': self._retries,
+            'chats': len(self._chats),
+            'global_tokens': round(self.global_bucket.tokens, 2),
+            'queued': self.global_bucket.queued(),
+        }
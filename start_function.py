@@ -2,7 +2,7 @@
 async def cmd_start(message: Message, state: FSMContext, command: CommandObject):
     user_id = message.from_user.id
     username = message.from_user.username or "без_ніка"
-    db.add_user(user_id, username)
+    await db.add_user(user_id, username)
     
     # Перевіряємо чи є параметр з каналом
     if command.args:
@@ -2,10 +2,12 @@
 Скрипт для додавання каналів в базу даних
 """
 
+import asyncio
 from database import Database
 
-def add_channels():
+async def add_channels():
     db = Database()
+    await db.connect()
     
     # Приклади каналів - змініть на свої
     channels = {
@@ -29,17 +31,18 @@ def add_channels():
         if 't.me/' in channel_id:
             channel_id = '@' + channel_id.split('t.me/')[-1].strip('/')
         
-        if db.add_channel(channel_name, channel_id):
+        if await db.add_channel(channel_name, channel_id):
             print(f"✅ Додано: {channel_name} → {channel_id}")
         else:
             print(f"❌ Помилка: {channel_name}")
     
     print("\n📋 Всі канали в БД:")
-    all_channels = db.get_all_channels()
+    all_channels = await db.get_all_channels()
     for name, ch_id in all_channels.items():
         print(f"   • {name}: {ch_id}")
     
+    await db.close()
     print("\n✅ Готово!")
 
 if __name__ == "__main__":
-    add_channels()
+    asyncio.run(add_channels())
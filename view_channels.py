@@ -2,16 +2,19 @@
 Скрипт для перегляду всіх каналів у базі даних
 """
 
+import asyncio
 from database import Database
 
-def view_channels():
+async def view_channels():
     db = Database()
+    await db.connect()
     
     print("\n" + "="*60)
     print("📋 КАНАЛИ В БАЗІ ДАНИХ")
     print("="*60 + "\n")
     
-    channels = db.get_all_channels()
+    channels = await db.get_all_channels()
+    await db.close()
     
     if not channels:
         print("❌ База даних порожня. Немає жодного каналу.\n")
@@ -30,4 +33,4 @@ def view_channels():
     print("="*60 + "\n")
 
 if __name__ == "__main__":
-    view_channels()
+    asyncio.run(view_channels())
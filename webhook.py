@@ -0,0 +1,160 @@
+"""
+Отримання оновлень Telegram через webhook (альтернатива long polling).
+
+aiohttp-сервер лише перевіряє секрет, кладе оновлення в обмежену чергу і
+одразу відповідає 200; обробку виконує фіксована кількість воркерів. Коли
+черга заповнена або сервер зупиняється, відповідь 503 змушує Telegram
+повторити доставку (за балансувальником — на інший екземпляр).
+"""
+
+import asyncio
+import hmac
+import logging
+import signal
+import time
+from contextlib import suppress
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+class WebhookServer:
+    def __init__(self, dp: Dispatcher, bot: Bot, path: str = '/webhook', secret: str = None,
+                 queue_size: int = 1000, workers: int = 16, drain_timeout: float = 30.0,
+                 extra_stats: dict = None):
+        """extra_stats — {назва: функція без аргументів}, результати додаються до /health"""
+        self.dp = dp
+        self.bot = bot
+        self.path = path
+        self.secret = secret
+        self.workers = workers
+        self.drain_timeout = drain_timeout
+        self.extra_stats = extra_stats or {}
+        self.queue = asyncio.Queue(maxsize=queue_size)
+
+        self._accepting = False
+        self._tasks = []
+        self._received = 0
+        self._rejected = 0
+        self._processed = 0
+        self._failed = 0
+        self._busy = 0
+        self._started_at = time.monotonic()
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.path, self.handle_update)
+        app.router.add_get('/health', self.handle_health)
+        return app
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        if self.secret and not hmac.compare_digest(request.headers.get(SECRET_HEADER, ''), self.secret):
+            return web.Response(status=401)
+        if not self._accepting:
+            return web.Response(status=503)
+        try:
+            update = Update.model_validate(await request.json(), context={'bot': self.bot})
+        except Exception as e:
+            logger.warning(f"Webhook: некоректне оновлення: {e}")
+            return web.Response(status=400)
+        try:
+            self.queue.put_nowait(update)
+        except asyncio.QueueFull:
+            self._rejected += 1
+            return web.Response(status=503)
+        self._received += 1
+        return web.Response()
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        # Заповнена черга — сигнал балансувальнику тимчасово не слати сюди трафік
+        healthy = self._accepting and not self.queue.full()
+        return web.json_response(self.stats(), status=200 if healthy else 503)
+
+    async def _worker(self):
+        while True:
+            update = await self.queue.get()
+            self._busy += 1
+            try:
+                await self.dp.feed_update(self.bot, update)
+                self._processed += 1
+            except Exception as e:
+                self._failed += 1
+                logger.error(f"Помилка обробки оновлення {update.update_id}: {e}")
+            finally:
+                self._busy -= 1
+                self.queue.task_done()
+
+    async def start_workers(self):
+        self._accepting = True
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop_workers(self):
+        """Перестати приймати оновлення, дочекатись черги і зупинити воркерів"""
+        self._accepting = False
+        try:
+            await asyncio.wait_for(self.queue.join(), self.drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Webhook: у черзі лишилось {self.queue.qsize()} необроблених оновлень")
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            with suppress(asyncio.CancelledError):
+                await task
+        self._tasks = []
+
+    def stats(self) -> dict:
+        extra = {name: collect() for name, collect in self.extra_stats.items()}
+        return {
+            'accepting': self._accepting,
+            'queued': self.queue.qsize(),
+            'queue_size': self.queue.maxsize,
+            'workers': self.workers,
+            'busy_workers': self._busy,
+            'received': self._received,
+            'rejected': self._rejected,
+            'processed': self._processed,
+            'failed': self._failed,
+            'uptime_s': round(time.monotonic() - self._started_at),
+            **extra,
+        }
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot, host: str, port: int, base_url: str = None,
+                      **server_options):
+    """Запустити webhook-сервер до SIGINT/SIGTERM.
+    Якщо задано base_url, Telegram отримує адресу base_url + path."""
+    server = WebhookServer(dp, bot, **server_options)
+    runner = web.AppRunner(server.build_app())
+    await runner.setup()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    with suppress(NotImplementedError):
+        loop.add_signal_handler(signal.SIGTERM, stop.set)
+        loop.add_signal_handler(signal.SIGINT, stop.set)
+
+    await dp.emit_startup(bot=bot, dispatcher=dp, bots=[bot], **dp.workflow_data)
+    try:
+        await server.start_workers()
+        await web.TCPSite(runner, host, port).start()
+        if base_url:
+            await bot.set_webhook(
+                base_url.rstrip('/') + server.path,
+                secret_token=server.secret,
+                allowed_updates=dp.resolve_used_update_types()
+            )
+        logger.info(f"🌐 Webhook слухає {host}:{port}{server.path}")
+        await stop.wait()
+    finally:
+        logger.info("Webhook зупиняється")
+        await server.stop_workers()
+        await runner.cleanup()
+        try:
+            await dp.emit_shutdown(bot=bot, dispatcher=dp, bots=[bot], **dp.workflow_data)
+        finally:
+            await bot.session.close()
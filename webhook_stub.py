@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Локальна перевірка webhook-режиму: надсилає боту (BOT_MODE=webhook)
+синтетичні оновлення так, як це робить Telegram, і виводить коди відповідей,
+час прийому та стан /health.
+
+Приклад: python webhook_stub.py --count 100 --text "/start"
+"""
+
+import argparse
+import asyncio
+import time
+
+import aiohttp
+from yarl import URL
+
+from config import WEBHOOK_PATH, WEBHOOK_PORT, WEBHOOK_SECRET
+from webhook import SECRET_HEADER
+
+
+def make_update(update_id: int, user_id: int, text: str) -> dict:
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private', 'username': f'stub_{user_id}'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': 'Stub', 'username': f'stub_{user_id}'},
+            'text': text,
+        },
+    }
+
+
+async def send_updates(url: str, secret: str, count: int, users: int, text: str, concurrency: int):
+    statuses = {}
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    headers = {SECRET_HEADER: secret} if secret else {}
+
+    async with aiohttp.ClientSession() as session:
+        async def post(update_id: int):
+            update = make_update(update_id, 1_000_000 + update_id % users, text)
+            async with semaphore:
+                started = time.perf_counter()
+                async with session.post(url, json=update, headers=headers) as response:
+                    latencies.append(time.perf_counter() - started)
+                    statuses[response.status] = statuses.get(response.status, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(post(i) for i in range(1, count + 1)))
+        elapsed = time.perf_counter() - started
+
+        health_url = str(URL(url).with_path('/health'))
+        async with session.get(health_url) as response:
+            health = await response.json()
+
+    latencies.sort()
+    print(f"📤 Надіслано {count} оновлень за {elapsed:.2f} с ({count / elapsed:.0f}/с)")
+    print(f"  Коди відповідей: {statuses}")
+    print(f"  Прийом p50: {latencies[len(latencies) // 2] * 1000:.1f} мс, "
+          f"p99: {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f} мс")
+    print(f"❤️ /health: {health}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', default=f'http://127.0.0.1:{WEBHOOK_PORT}{WEBHOOK_PATH}')
+    parser.add_argument('--secret', default=WEBHOOK_SECRET)
+    parser.add_argument('--count', type=int, default=10, help="кількість оновлень")
+    parser.add_argument('--users', type=int, default=10, help="скільки різних користувачів")
+    parser.add_argument('--text', default='/start', help="текст повідомлень")
+    parser.add_argument('--concurrency', type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(send_updates(args.url, args.secret, args.count, args.users, args.text, args.concurrency))